@@ -12,21 +12,26 @@ It performs the following steps:
 The resulting chart helps explore potential associations between air quality and air traffic volume.
 """
 
+import sys
+from pathlib import Path
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# Load PurpleAir data
-purpleair = pd.read_csv('../data/clean_purpleair.csv')
-air_traffic = pd.read_csv('../data/air_traffic.csv')
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from preprocessing.sensor_store import load_readings  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Load PurpleAir data for Dec 2018 - Dec 2023
+purpleair = load_readings('purpleair', columns=['time', 'pm2_5_1h_mean'], start='2018-12-01', end='2023-12-31 23:59:59')
+air_traffic = pd.read_csv(ROOT / 'data' / 'air_traffic.csv')
 
 # Preprocess PurpleAir data
-purpleair['time'] = pd.to_datetime(purpleair['time'])
 purpleair['year_month'] = purpleair['time'].dt.to_period('M')
 monthly_pm25_purpleair = purpleair.groupby('year_month')['pm2_5_1h_mean'].mean().reset_index()
 
-# Filter PurpleAir for Dec 2018 - Dec 2023
-monthly_pm25_purpleair = monthly_pm25_purpleair[(monthly_pm25_purpleair['year_month'] >= '2018-12') & (monthly_pm25_purpleair['year_month'] <= '2023-12')]
-
 # Preprocess Air Traffic data
 air_traffic['activity_period_start_date'] = pd.to_datetime(air_traffic['activity_period_start_date'])
 air_traffic['year_month'] = air_traffic['activity_period_start_date'].dt.to_period('M')
@@ -0,0 +1,27 @@
+"""
+Daily Tract AQI Rollup Build
+
+This script brings the daily per-tract AQI rollup up to date with the sensor store.
+
+It performs the following steps:
+- Loads the census tracts.
+- Compares the sensor store's month partitions with the ones the stored rollup was counted from.
+- Recounts only the new, rewritten or removed months (everything if the tract geometries changed).
+- Saves the rollup to `data/tract_rollup.npz`.
+
+The dashboard's air quality date range picker reads the result, so rerun this script after adding readings to the store.
+"""
+
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from air_quality.tract_rollup import ROLLUP_PATH, refresh_rollup  # noqa: E402
+
+tracts = gpd.read_file(Path(__file__).resolve().parents[2] / "data" / "census.geojson")
+rollup = refresh_rollup(tracts)
+
+print(f"✅ Tract rollup ({rollup.days[0]} to {rollup.days[-1]}, {len(rollup.geoids)} tracts) is up to date in {ROLLUP_PATH}")
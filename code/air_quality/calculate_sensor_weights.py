@@ -0,0 +1,76 @@
+"""
+Sensor Data Weighting for Air Quality Risk Index
+
+This script loads and compares air pollution data from two monitoring sources: Clarity and PurpleAir.
+
+It performs the following steps:
+- Loads pre-cleaned PM2.5 data from both sources.
+- Merges data by timestamp and location to identify overlapping measurements.
+- Filters to rows with valid PM2.5 readings from both sources.
+- Calculates the variance of each source's PM2.5 measurements at overlapping points.
+- Computes inverse variance weights to quantify the relative reliability of each source.
+
+The weights are saved to `data/sensor_weights.json`, from which `combine_air_quality_data.py` and the dashboard
+combine the two networks' AQIs.
+
+Example:
+    python code/air_quality/calculate_sensor_weights.py
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from air_quality.tract_rollup import WEIGHTS_PATH  # noqa: E402
+from preprocessing.sensor_store import STORE_PATH, load_readings  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Compute inverse variance weights of the Clarity and PurpleAir networks.")
+parser.add_argument("--store", default=STORE_PATH, help="Sensor store root")
+parser.add_argument("--output", default=WEIGHTS_PATH, help="Destination JSON")
+args = parser.parse_args()
+
+# Load cleaned Clarity and PurpleAir data
+columns = ['time', 'location_name', 'pm2_5_24h_mean']
+clarity = load_readings("clarity", columns=columns, root=args.store)
+purpleair = load_readings("api_purpleair", columns=columns, root=args.store)
+
+# Merge on time + location_name to find overlapping locations + dates
+merged = pd.merge(
+    clarity,
+    purpleair,
+    on=['time', 'location_name'],
+    suffixes=('_clarity', '_purpleair')
+)
+
+# Filter to rows where both sources have data at the same time + location
+overlap = merged.dropna(subset=['pm2_5_24h_mean_clarity', 'pm2_5_24h_mean_purpleair'])
+
+# How many overlap points?
+print(f"Number of overlapping rows: {len(overlap)}")
+
+if len(overlap) == 0:
+    sys.exit("No overlapping data found. Cannot compute weights.")
+
+# Calculate variance
+clarity_var = overlap['pm2_5_24h_mean_clarity'].var()
+purpleair_var = overlap['pm2_5_24h_mean_purpleair'].var()
+
+# Inverse variance weighting
+clarity_weight = (1 / clarity_var) / ((1 / clarity_var) + (1 / purpleair_var))
+purpleair_weight = (1 / purpleair_var) / ((1 / clarity_var) + (1 / purpleair_var))
+
+print(f"Clarity weight:    {clarity_weight:.2f}")
+print(f"PurpleAir weight:  {purpleair_weight:.2f}")
+
+# Save the weights (rounded as they were when hard-coded)
+temporary = f"{args.output}.tmp"
+with open(temporary, "w") as f:
+    json.dump({"clarity": round(clarity_weight, 2), "purpleair": round(purpleair_weight, 2)}, f, indent=2)
+os.replace(temporary, args.output)
+print(f"✅ Saved the weights to {args.output}")
@@ -0,0 +1,145 @@
+"""
+Census Tract-Level AQI Aggregation from Clarity and PurpleAir Data
+
+This script calculates median air quality index (AQI) values for each census tract using PM2.5 data from Clarity and PurpleAir sensors.
+
+It performs the following steps:
+- Loads cleaned PM2.5 and census tract data.
+- Filters sensor data to a defined date range.
+- Assigns each sensor reading to its census tract through the cached sensor location lookup.
+- Computes median AQI per tract from each sensor network.
+- Combines AQIs using the inverse variance weights saved by `calculate_sensor_weights.py`.
+- Outputs both a GeoJSON and CSV with tract-level AQI estimates.
+
+With `--windows`, it instead computes the AQIs for many periods in one pass over all stored readings (every calendar
+month, trailing 30/90/365-day windows ending on each day, and any `--window START:END` ranges) and writes them to one
+tract × window table in `data/tract_aqi_windows.parquet`. The windows are computed from the daily tract rollup
+(`data/tract_rollup.npz`), which is brought up to date first.
+
+The result supports spatial analysis of air quality across South San Francisco and San Bruno.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+import geopandas as gpd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from air_quality.tract_lookup import assign_tracts  # noqa: E402
+from air_quality.tract_rollup import (  # noqa: E402
+    COLUMNS, FILL_IN_NEIGHBORS, SOURCES, WEIGHTS_PATH, combine_aqi, custom_windows, load_sensor_weights, month_windows,
+    refresh_rollup, rolling_windows, window_table
+)
+from preprocessing.sensor_store import load_readings  # noqa: E402
+
+# Time range for analysis
+DATE_START = '2024-03-30'
+DATE_END = '2025-03-31'
+
+# Trailing window lengths (days) for --windows
+ROLLING_DAYS = [30, 90, 365]
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def write_window_table(tracts, ranges, rolling_days, weights, output):
+    """
+    Compute tract AQIs for every month, trailing window and custom range, and save them as one table.
+
+    Parameters:
+    tracts (gpd.GeoDataFrame): Census tracts.
+    ranges (list): (first day, last day) pairs for custom windows.
+    rolling_days (list): Trailing window lengths in days.
+    weights (tuple): Clarity and PurpleAir weights of the combined AQI.
+    output (str): Path of the Parquet table.
+    """
+    # The daily rollup is recounted only for sensor store months that changed since the last run
+    rollup = refresh_rollup(tracts)
+
+    windows = pd.concat(
+        [month_windows(rollup.days)]
+        + [rolling_windows(rollup.days, days) for days in rolling_days]
+        + ([custom_windows(ranges)] if ranges else []),
+        ignore_index=True
+    )
+    table = window_table(rollup, windows, weights)
+    table.to_parquet(output)
+    print(f"✅ Saved {len(windows)} windows for {table.index.get_level_values('geoid').nunique()} tracts to {output}")
+
+
+parser = argparse.ArgumentParser(description="Aggregate sensor AQIs by census tract.")
+parser.add_argument("--windows", action="store_true", help="Write the tract × window table instead")
+parser.add_argument("--window", action="append", default=[], metavar="START:END",
+                    help="Extra inclusive date range for --windows, e.g. 2024-03-30:2025-03-31 (repeatable)")
+parser.add_argument("--rolling", type=int, nargs="*", default=ROLLING_DAYS, help="Trailing window lengths in days")
+parser.add_argument("--output", default=str(ROOT / "data" / "tract_aqi_windows.parquet"),
+                    help="Table path for --windows")
+parser.add_argument("--census", default=str(ROOT / "data" / "census.geojson"), help="Census tract GeoJSON")
+parser.add_argument("--weights", default=WEIGHTS_PATH, help="Sensor weights JSON from calculate_sensor_weights.py")
+args = parser.parse_args()
+
+tracts = gpd.read_file(args.census)
+weights = load_sensor_weights(args.weights)
+
+if args.windows:
+    write_window_table(tracts, [tuple(window.split(":")) for window in args.window], args.rolling, weights,
+                       args.output)
+    sys.exit(0)
+
+# Load data for the desired date range (only the months in range are read)
+clarity = load_readings(SOURCES["clarity"], columns=COLUMNS, start=DATE_START, end=DATE_END)
+purpleair = load_readings(SOURCES["purpleair"], columns=COLUMNS, start=DATE_START, end=DATE_END)
+
+# Assign census tract to each sensor reading (only sensor locations not seen before are spatially joined)
+clarity_joined = assign_tracts(clarity, tracts)
+purpleair_joined = assign_tracts(purpleair, tracts)
+
+# Compute median AQI per tract
+clarity_tract_aqi = (
+    clarity_joined.groupby("geoid")["pm2_5_24h_mean_aqi"]
+    .median()
+    .reset_index(name="clarity_aqi")
+)
+purpleair_tract_aqi = (
+    purpleair_joined.groupby("geoid")["pm2_5_24h_mean_aqi"]
+    .median()
+    .reset_index(name="purpleair_aqi")
+)
+
+# Merge clarity + purpleair AQIs per tract
+aqi_merged = pd.merge(clarity_tract_aqi, purpleair_tract_aqi, on="geoid", how="outer")
+
+# Compute combined AQI
+aqi_merged['combined_aqi'] = combine_aqi(aqi_merged['clarity_aqi'], aqi_merged['purpleair_aqi'], weights)
+
+# Merge back with census tract geometries
+tracts_with_combined = tracts.merge(
+    aqi_merged[['geoid', 'clarity_aqi', 'purpleair_aqi', 'combined_aqi']],
+    on="geoid",
+    how="left"
+)
+
+# Keep only tracts with data
+tracts_with_combined = tracts_with_combined[
+    tracts_with_combined[['clarity_aqi', 'purpleair_aqi', 'combined_aqi']].notnull().any(axis=1)
+]
+
+# Fill in AQI for tracts where there are no sensors
+mean_aqi = lambda neighbors: tracts_with_combined.loc[tracts_with_combined["geoid"].isin(neighbors), "combined_aqi"].mean()
+
+fillin_df = gpd.GeoDataFrame({
+    "geoid": list(FILL_IN_NEIGHBORS),
+    "combined_aqi": [mean_aqi(neighbors) for neighbors in FILL_IN_NEIGHBORS.values()],
+    "geometry": [tracts.loc[tracts["geoid"] == geoid, "geometry"].values[0] for geoid in FILL_IN_NEIGHBORS]
+})
+tracts_with_combined = pd.concat([tracts_with_combined, fillin_df])
+
+# Save outputs
+tracts_with_combined.to_file(ROOT / "data" / "tracts_with_combined_aqi.geojson", driver="GeoJSON")
+tracts_with_combined[['geoid', 'clarity_aqi', 'purpleair_aqi', 'combined_aqi']].to_csv(
+    ROOT / "data" / "tracts_with_combined_aqi.csv", index=False
+)
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Fake PurpleAir Server
+
+Serves a local stand-in for the PurpleAir sensors endpoints, so the live polling service, the history backfill and the
+dashboard can run and be load-tested without an API key or network access.
+
+It provides:
+- `GET /v1/sensors` with the `fields` and bounding box (`nwlat`, `nwlng`, `selat`, `selng`) parameters, answering in
+  PurpleAir's `{"fields": [...], "data": [[...], ...]}` format.
+- `GET /v1/sensors/<index>/history` with the `fields`, `start_timestamp`, `end_timestamp` and `average` parameters,
+  returning one deterministic row per averaging period.
+- Synthetic sensors scattered over a bounding box, whose PM2.5 follows a random walk around a per-sensor baseline.
+- A replaceable clock, so tests can fast-forward through hours of readings.
+- A `X-API-Key` header check, and a switch to answer with a given error status, for every request or the next few.
+
+Run it from the command line and point the dashboard at it:
+    python code/air_quality/fake_purpleair.py --port 8765
+    PURPLE_AIR_API_KEY=test PURPLE_AIR_BASE_URL=http://localhost:8765/v1/ streamlit run code/streamlit_app.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# Default area: South San Francisco and San Bruno, as (west, south, east, north)
+DEFAULT_BOUNDS: Tuple[float, float, float, float] = (-122.47, 37.61, -122.37, 37.68)
+
+# Seconds between two readings of a sensor, as on real PurpleAir sensors
+REPORT_INTERVAL = 120
+
+
+class FakePurpleAir:
+    def __init__(self, sensors: int = 50, bounds: Tuple[float, float, float, float] = DEFAULT_BOUNDS,
+                 seed: int = 0, clock: Callable[[], float] = time.time) -> None:
+        """
+        Initialize the FakePurpleAir class.
+
+        Parameters:
+        sensors (int): Number of synthetic sensors.
+        bounds (Tuple[float, float, float, float]): (west, south, east, north) the sensors are scattered over.
+        seed (int): Seed of the sensor locations and readings.
+        clock (Callable[[], float]): Returns the current UNIX time; readings advance once per `REPORT_INTERVAL` of it.
+        """
+        rng = np.random.default_rng(seed)
+        west, south, east, north = bounds
+        self.sensor_index = np.arange(100000, 100000 + sensors)
+        self.latitude = rng.uniform(south, north, sensors).round(5)
+        self.longitude = rng.uniform(west, east, sensors).round(5)
+        self.baseline = rng.gamma(2.0, 4.0, sensors)
+
+        self.clock = clock
+        self.rng = rng
+        self.pm2_5 = self.baseline.copy()
+        self.report_time = int(clock()) // REPORT_INTERVAL * REPORT_INTERVAL
+
+        # Status code to answer with instead of data (e.g. 429 or 503), for failure tests; with `error_count` set, only
+        # that many requests fail
+        self.error_status: Optional[int] = None
+        self.error_count: Optional[int] = None
+        self.requests = 0
+
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _update(self) -> None:
+        # One random-walk step per report interval elapsed, pulled back toward each sensor's baseline
+        now = int(self.clock()) // REPORT_INTERVAL * REPORT_INTERVAL
+        for _ in range(min((now - self.report_time) // REPORT_INTERVAL, 24 * 3600 // REPORT_INTERVAL)):
+            noise = self.rng.normal(0, 0.6, len(self.pm2_5))
+            self.pm2_5 = np.maximum(self.pm2_5 + 0.1 * (self.baseline - self.pm2_5) + noise, 0)
+        self.report_time = max(self.report_time, now)
+
+    def sensors(self, fields, bounds: Optional[Tuple[float, float, float, float]] = None) -> dict:
+        """
+        Build the sensors endpoint response.
+
+        Parameters:
+        fields (List[str]): Requested fields among sensor_index, latitude, longitude, last_seen and pm2.5_atm.
+        bounds (Optional[Tuple[float, float, float, float]]): (west, south, east, north) filter, or None for all.
+
+        Returns:
+        dict: The response body.
+        """
+        with self._lock:
+            self._update()
+            columns = {
+                "sensor_index": self.sensor_index.tolist(),
+                "latitude": self.latitude.tolist(),
+                "longitude": self.longitude.tolist(),
+                "last_seen": [self.report_time] * len(self.sensor_index),
+                "pm2.5_atm": self.pm2_5.round(1).tolist(),
+            }
+
+        keep = np.ones(len(self.sensor_index), dtype=bool)
+        if bounds is not None:
+            west, south, east, north = bounds
+            keep = ((self.longitude >= west) & (self.longitude <= east)
+                    & (self.latitude >= south) & (self.latitude <= north))
+
+        fields = [field for field in fields if field in columns]
+        rows = [[columns[field][i] for field in fields] for i in np.flatnonzero(keep)]
+        return {"api_version": "fake", "time_stamp": int(self.clock()), "fields": fields, "data": rows}
+
+    def history(self, sensor_index: int, fields, start: int, end: int, average: int) -> Optional[dict]:
+        """
+        Build the sensor history endpoint response.
+
+        Parameters:
+        sensor_index (int): Sensor index.
+        fields (List[str]): Requested fields among time_stamp, pm2.5_atm, humidity and temperature.
+        start (int): First UNIX time of the range.
+        end (int): UNIX time the range ends before.
+        average (int): Averaging period in minutes; 0 returns one row per `REPORT_INTERVAL`.
+
+        Returns:
+        Optional[dict]: The response body, or None for an unknown sensor.
+        """
+        position = np.flatnonzero(self.sensor_index == sensor_index)
+        if len(position) == 0:
+            return None
+
+        interval = average * 60 if average else REPORT_INTERVAL
+        times = np.arange(-(-start // interval) * interval, end, interval)
+
+        # A daily cycle around the sensor's baseline, so every period has a distinct, reproducible value
+        baseline = self.baseline[position[0]]
+        columns = {
+            "time_stamp": times.tolist(),
+            "pm2.5_atm": (baseline * (1 + 0.5 * np.sin(2 * np.pi * times / 86400))).round(1).tolist(),
+            "humidity": np.full(len(times), 60).tolist(),
+            "temperature": np.full(len(times), 65).tolist(),
+        }
+
+        fields = [field for field in fields if field in columns]
+        rows = [[columns[field][i] for field in fields] for i in range(len(times))]
+        return {"api_version": "fake", "time_stamp": int(self.clock()), "sensor_index": int(sensor_index),
+                "fields": fields, "data": rows}
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start serving in a daemon thread.
+
+        Parameters:
+        host (str): Interface to listen on.
+        port (int): Port to listen on; 0 picks a free one.
+
+        Returns:
+        str: Base URL to give `PurpleAirAPI`, e.g. "http://127.0.0.1:8765/v1/".
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                    failing = fake.error_status is not None and fake.error_count != 0
+                    if failing and fake.error_count is not None:
+                        fake.error_count -= 1
+
+                url = urlparse(self.path)
+                if not self.headers.get("X-API-Key"):
+                    return self._send(403, {"error": "ApiKeyMissingError"})
+                if failing:
+                    return self._send(fake.error_status, {"error": "FakeError"})
+
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                fields = query.get("fields", "sensor_index").split(",")
+                parts = url.path.strip("/").split("/")
+                if len(parts) == 4 and parts[:2] == ["v1", "sensors"] and parts[3] == "history":
+                    body = fake.history(int(parts[2]), fields, int(query["start_timestamp"]),
+                                        int(query["end_timestamp"]), int(query.get("average", 10)))
+                    return self._send(200, body) if body else self._send(404, {"error": "NotFoundError"})
+                if url.path.rstrip("/") != "/v1/sensors":
+                    return self._send(404, {"error": "NotFoundError"})
+
+                bounds = None
+                if all(key in query for key in ("nwlat", "nwlng", "selat", "selng")):
+                    bounds = (float(query["nwlng"]), float(query["selat"]), float(query["selng"]),
+                              float(query["nwlat"]))
+                self._send(200, fake.sensors(fields, bounds))
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="fake-purpleair", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/v1/"
+
+    def stop(self) -> None:
+        """
+        Stop serving.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake PurpleAir sensors endpoints.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--sensors", type=int, default=50, help="Number of synthetic sensors")
+    args = parser.parse_args()
+
+    base_url = FakePurpleAir(sensors=args.sensors).start(port=args.port)
+    print(f"✅ Fake PurpleAir API at {base_url} (any API key works); press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
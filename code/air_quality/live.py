@@ -0,0 +1,359 @@
+"""
+Live PurpleAir Air Quality
+
+Polls the PurpleAir sensors in the dashboard's area in the background and keeps a short in-memory history per sensor,
+from which it maintains the EPA PM2.5 NowCast and AQI.
+
+It provides:
+- A ring buffer of hourly PM2.5 sums and counts per sensor, in fixed-size NumPy arrays covering the last 12 to 24 hours.
+- The EPA NowCast (12 hours, weight factor floored at 0.5, at least 2 of the 3 latest hours required) and its AQI,
+  updated for each new reading with a fixed 12-hour computation whatever the buffer holds.
+- A polling service that calls `PurpleAirAPI.get_sensors_data` for a bounding box on a schedule, in a daemon thread.
+- Snapshots of the live sensor AQIs and of the median live AQI per census tract, read from memory.
+
+The running mean of the current hour counts as its hourly average, so the NowCast follows readings as they come in
+rather than once an hour. Point the API at a local stand-in (see `fake_purpleair.py`) to run the service offline.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from preprocessing.aqi import pm2_5_aqi
+from preprocessing.purpleair_wrapper import PurpleAirAPI
+
+# Hours of history kept per sensor, and hours the NowCast looks back
+BUFFER_HOURS = 24
+NOWCAST_HOURS = 12
+
+# Lowest NowCast weight factor, and how many of the 3 latest hours must have readings
+MIN_WEIGHT = 0.5
+MIN_RECENT_HOURS = 2
+
+# Seconds between polls (PurpleAir sensors report every 2 minutes)
+POLL_INTERVAL = 120
+
+# Fields requested from the sensors endpoint
+FIELDS: List[str] = ["sensor_index", "latitude", "longitude", "last_seen", "pm2.5_atm"]
+
+
+def nowcast(hourly: np.ndarray) -> np.ndarray:
+    """
+    Compute the EPA PM2.5 NowCast from hourly averages.
+
+    Parameters:
+    hourly (np.ndarray): Hourly PM2.5 averages of shape (sensors, hours), latest hour first; NaN for hours without
+        readings. Only the first `NOWCAST_HOURS` columns are used.
+
+    Returns:
+    np.ndarray: NowCast concentration per sensor, NaN if fewer than `MIN_RECENT_HOURS` of the 3 latest hours have
+    readings.
+    """
+    hourly = hourly[:, :NOWCAST_HOURS]
+    valid = ~np.isnan(hourly)
+
+    highest = np.where(valid, hourly, -np.inf).max(axis=1)
+    lowest = np.where(valid, hourly, np.inf).min(axis=1)
+    ratio = np.divide(lowest, highest, out=np.ones_like(highest), where=highest > 0)
+    weight = np.maximum(ratio, MIN_WEIGHT)
+
+    powers = weight[:, None] ** np.arange(hourly.shape[1])
+    numerator = (powers * np.where(valid, hourly, 0)).sum(axis=1)
+    denominator = (powers * valid).sum(axis=1)
+
+    result = np.full(len(hourly), np.nan)
+    enough = valid[:, :3].sum(axis=1) >= MIN_RECENT_HOURS
+    result[enough] = numerator[enough] / denominator[enough]
+    return result
+
+
+class NowCastBuffer:
+    def __init__(self, hours: int = BUFFER_HOURS) -> None:
+        """
+        Hourly PM2.5 ring buffer with the live NowCast of every sensor.
+
+        All sensors share one clock: column `hour % hours` holds the sums and counts of that hour, and moving to a new
+        hour clears the columns it reuses. Rows are added as new sensors appear, doubling the arrays when full.
+
+        Parameters:
+        hours (int): Hours of history kept, at least `NOWCAST_HOURS`.
+        """
+        if hours < NOWCAST_HOURS:
+            raise ValueError(f"The buffer must hold at least {NOWCAST_HOURS} hours.")
+
+        self.hours: int = hours
+        self.rows: Dict[int, int] = {}
+        self.current_hour: int = -1
+
+        # Absolute hour held by each column; -1 marks a column that was never used
+        self.column_hours: np.ndarray = np.full(hours, -1, dtype=np.int64)
+
+        capacity = 64
+        self.sums: np.ndarray = np.zeros((capacity, hours))
+        self.counts: np.ndarray = np.zeros((capacity, hours), dtype=np.int32)
+        self.sensor_index: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.latitude: np.ndarray = np.full(capacity, np.nan)
+        self.longitude: np.ndarray = np.full(capacity, np.nan)
+        self.last_seen: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.latest: np.ndarray = np.full(capacity, np.nan)
+        self.nowcast: np.ndarray = np.full(capacity, np.nan)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self.sensor_index)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+
+        def grown(array: np.ndarray, fill) -> np.ndarray:
+            out = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            out[:len(array)] = array
+            return out
+
+        self.sums = grown(self.sums, 0)
+        self.counts = grown(self.counts, 0)
+        self.sensor_index = grown(self.sensor_index, 0)
+        self.latitude = grown(self.latitude, np.nan)
+        self.longitude = grown(self.longitude, np.nan)
+        self.last_seen = grown(self.last_seen, 0)
+        self.latest = grown(self.latest, np.nan)
+        self.nowcast = grown(self.nowcast, np.nan)
+
+    def _row_positions(self, sensor_index: np.ndarray) -> np.ndarray:
+        # Row of each sensor, adding rows for sensors seen for the first time
+        new = [int(sensor) for sensor in dict.fromkeys(sensor_index.tolist()) if sensor not in self.rows]
+        if new:
+            self._grow(len(self.rows) + len(new))
+            for sensor in new:
+                self.sensor_index[len(self.rows)] = sensor
+                self.rows[sensor] = len(self.rows)
+        return np.array([self.rows[int(sensor)] for sensor in sensor_index], dtype=np.intp)
+
+    def _hourly(self, rows: np.ndarray) -> np.ndarray:
+        # Hourly means of the NowCast window, latest hour first
+        window = self.current_hour - np.arange(NOWCAST_HOURS)
+        columns = window % self.hours
+        current = self.column_hours[columns] == window
+
+        counts = self.counts[np.ix_(rows, columns)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums[np.ix_(rows, columns)] / counts
+        means[(counts == 0) | ~current[None, :]] = np.nan
+        return means
+
+    def advance(self, timestamp: float) -> None:
+        """
+        Move the clock to the hour of a timestamp, clearing the columns of hours that fell out of the buffer.
+
+        Parameters:
+        timestamp (float): UNIX timestamp; earlier than the current hour does nothing.
+        """
+        hour = int(timestamp // 3600)
+        if hour <= self.current_hour:
+            return
+
+        for h in range(max(self.current_hour + 1, hour - self.hours + 1), hour + 1):
+            column = h % self.hours
+            self.sums[:, column] = 0
+            self.counts[:, column] = 0
+            self.column_hours[column] = h
+        self.current_hour = hour
+
+        # Every sensor's window moved
+        rows = np.arange(len(self.rows))
+        self.nowcast[rows] = nowcast(self._hourly(rows))
+
+    def add(self, sensor_index, pm2_5, timestamps, latitudes=None, longitudes=None) -> int:
+        """
+        Add readings, skipping those a sensor already reported (same or older `last_seen`).
+
+        Parameters:
+        sensor_index (array-like): Sensor of each reading.
+        pm2_5 (array-like): PM2.5 concentration in µg/m³; NaN readings are skipped.
+        timestamps (array-like): UNIX time of each reading.
+        latitudes (Optional[array-like]): Sensor latitudes, stored for new and moved sensors.
+        longitudes (Optional[array-like]): Sensor longitudes.
+
+        Returns:
+        int: Number of readings added.
+        """
+        sensor_index = np.asarray(sensor_index, dtype=np.int64)
+        pm2_5 = np.asarray(pm2_5, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(sensor_index) == 0:
+            return 0
+
+        self.advance(timestamps.max())
+        rows = self._row_positions(sensor_index)
+        if latitudes is not None:
+            self.latitude[rows] = np.asarray(latitudes, dtype=float)
+            self.longitude[rows] = np.asarray(longitudes, dtype=float)
+
+        # Readings newer than the sensor's last one and recent enough for the buffer
+        hours = timestamps // 3600
+        keep = (timestamps > self.last_seen[rows]) & ~np.isnan(pm2_5) & (hours > self.current_hour - self.hours)
+        rows, hours, values, timestamps = rows[keep], hours[keep], pm2_5[keep], timestamps[keep]
+
+        columns = hours % self.hours
+        np.add.at(self.sums, (rows, columns), values)
+        np.add.at(self.counts, (rows, columns), 1)
+        self.last_seen[rows] = np.maximum(self.last_seen[rows], timestamps)
+        self.latest[rows] = values
+
+        # Only the sensors that got a reading need a new NowCast
+        touched = np.unique(rows)
+        self.nowcast[touched] = nowcast(self._hourly(touched))
+        return int(keep.sum())
+
+    def snapshot(self) -> pd.DataFrame:
+        """
+        Return the live state of every sensor.
+
+        Returns:
+        pd.DataFrame: `sensor_index`, `latitude`, `longitude`, `last_seen` (UNIX time), `pm2_5` (latest reading),
+        `nowcast` and `aqi` (NowCast AQI) per sensor.
+        """
+        n = len(self.rows)
+        return pd.DataFrame({
+            "sensor_index": self.sensor_index[:n].copy(),
+            "latitude": self.latitude[:n].copy(),
+            "longitude": self.longitude[:n].copy(),
+            "last_seen": self.last_seen[:n].copy(),
+            "pm2_5": self.latest[:n].copy(),
+            "nowcast": self.nowcast[:n].round(1),
+            "aqi": pm2_5_aqi(self.nowcast[:n]),
+        })
+
+
+class LiveAirQuality:
+    def __init__(self, api: PurpleAirAPI, bounds: Tuple[float, float, float, float],
+                 tracts: Optional[gpd.GeoDataFrame] = None, interval: float = POLL_INTERVAL,
+                 hours: int = BUFFER_HOURS) -> None:
+        """
+        Initialize the LiveAirQuality class.
+
+        Parameters:
+        api (PurpleAirAPI): Client of the PurpleAir API (or of a local stand-in).
+        bounds (Tuple[float, float, float, float]): (west, south, east, north) of the area to poll, in degrees.
+        tracts (Optional[gpd.GeoDataFrame]): Census tracts with a `geoid` column, for the live tract AQI.
+        interval (float): Seconds between polls.
+        hours (int): Hours of history kept per sensor.
+        """
+        self.api = api
+        self.bounds = bounds
+        self.interval = interval
+        self.buffer = NowCastBuffer(hours)
+
+        self.geoids: Optional[np.ndarray] = None
+        self._tracts: Optional[shapely.STRtree] = None
+        if tracts is not None:
+            tracts = tracts.to_crs("EPSG:4326")
+            self.geoids = tracts["geoid"].astype(str).to_numpy()
+            self._tracts = shapely.STRtree(tracts.geometry.values)
+
+        # Tract of each sensor, resolved once per sensor location
+        self._sensor_tracts: Dict[Tuple[int, float, float], Optional[str]] = {}
+
+        self.last_poll: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self, now: Optional[float] = None) -> int:
+        """
+        Fetch the current readings of the sensors in the area and add them to the buffer.
+
+        Parameters:
+        now (Optional[float]): UNIX time of the poll, which moves the buffer's clock; defaults to the current time.
+
+        Returns:
+        int: Number of new readings.
+        """
+        west, south, east, north = self.bounds
+        readings = self.api.get_sensors_data(FIELDS, nw_lat=north, nw_lng=west, se_lat=south, se_lng=east)
+        now = time.time() if now is None else now
+
+        with self._lock:
+            self.buffer.advance(now)
+            added = 0
+            if not readings.empty:
+                added = self.buffer.add(readings["sensor_index"], readings["pm2.5_atm"], readings["last_seen"],
+                                        readings["latitude"], readings["longitude"])
+            self.last_poll = now
+        return added
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                # Keep polling through outages; the last error is available to callers
+                self.last_error = e
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        """
+        Start polling in a daemon thread (does nothing if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="live-purpleair", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop polling and wait for the thread to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def sensors(self) -> pd.DataFrame:
+        """
+        Return the live state of every sensor seen so far.
+
+        Returns:
+        pd.DataFrame: See `NowCastBuffer.snapshot`, plus the sensor's `geoid` when tracts were given.
+        """
+        with self._lock:
+            sensors = self.buffer.snapshot()
+            if self._tracts is not None:
+                sensors["geoid"] = self._sensor_geoids(sensors)
+        return sensors
+
+    def _sensor_geoids(self, sensors: pd.DataFrame) -> List[Optional[str]]:
+        # Tract of each sensor, joining only the locations not seen before
+        keys = list(zip(sensors["sensor_index"].tolist(), sensors["latitude"].tolist(),
+                        sensors["longitude"].tolist()))
+        new = [key for key in keys if key not in self._sensor_tracts]
+        if new:
+            points = shapely.points([key[2] for key in new], [key[1] for key in new])
+            point_rows, tract_rows = self._tracts.query(points, predicate="within")
+            found = dict(zip(point_rows.tolist(), self.geoids[tract_rows].tolist()))
+            self._sensor_tracts.update((key, found.get(i)) for i, key in enumerate(new))
+        return [self._sensor_tracts[key] for key in keys]
+
+    def tract_aqi(self) -> pd.DataFrame:
+        """
+        Return the live AQI of every tract with at least one sensor that has a NowCast.
+
+        Returns:
+        pd.DataFrame: `geoid`, `aqi` (median NowCast AQI of the tract's sensors) and `sensors` (how many).
+        """
+        if self._tracts is None:
+            raise ValueError("The service was created without tracts.")
+
+        sensors = self.sensors().dropna(subset=["geoid", "aqi"])
+        return (sensors.groupby("geoid")["aqi"].agg(aqi="median", sensors="size").reset_index()
+                .astype({"aqi": float, "sensors": int}))
@@ -0,0 +1,169 @@
+"""
+Sensor-to-Tract Lookup
+
+Assigns census tracts to sensor readings through a persistent lookup keyed by sensor location.
+
+It provides:
+- A spatial join over the distinct (location_id, latitude, longitude) locations only, instead of every reading.
+- A JSON lookup file reused across runs, extended only with locations it has not seen before.
+- Invalidation of the whole lookup when the tract geometries change.
+- A plain key join that broadcasts tract ids back to the readings.
+
+A multi-year history has millions of readings but only a few dozen sensor locations, so the spatial work no longer
+grows with the length of the history.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+# Lookup file, anchored to the repository so scripts run from any directory share it
+LOOKUP_PATH = str(Path(__file__).resolve().parents[2] / "data" / "sensor_tracts.json")
+
+# Columns identifying a sensor location
+KEY_COLUMNS: List[str] = ["location_id", "latitude", "longitude"]
+
+
+def tracts_hash(tracts: gpd.GeoDataFrame) -> str:
+    """
+    Fingerprint tract ids, geometries and CRS, so the lookup is rebuilt whenever any of them changes.
+
+    Parameters:
+    tracts (gpd.GeoDataFrame): Census tracts with a `geoid` column.
+
+    Returns:
+    str: Hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256(str(tracts.crs).encode())
+    for geoid, wkb in zip(tracts["geoid"].astype(str), tracts.geometry.to_wkb()):
+        digest.update(geoid.encode())
+        digest.update(wkb or b"")
+    return digest.hexdigest()
+
+
+def _location_keys(df: pd.DataFrame) -> pd.DataFrame:
+    # Ids are compared as strings so Clarity (text) and PurpleAir (integer) ids can share one lookup
+    keys = df[KEY_COLUMNS].copy()
+    keys["location_id"] = keys["location_id"].astype(str)
+    return keys.astype({"latitude": float, "longitude": float})
+
+
+def resolve_tracts(locations: pd.DataFrame, tracts: gpd.GeoDataFrame) -> pd.DataFrame:
+    """
+    Find the tract containing each sensor location.
+
+    Parameters:
+    locations (pd.DataFrame): Distinct `location_id`, `latitude`, `longitude` rows.
+    tracts (gpd.GeoDataFrame): Census tracts with a `geoid` column.
+
+    Returns:
+    pd.DataFrame: One row per location and containing tract (NaN `geoid` if it is outside every tract or has no
+    coordinates).
+    """
+    # Points with missing coordinates are left out of the join: besides matching nothing, they can stop the spatial
+    # index from matching the other points
+    located = locations["latitude"].notna() & locations["longitude"].notna()
+    points = gpd.GeoDataFrame(
+        locations[located],
+        geometry=gpd.points_from_xy(locations.loc[located, "longitude"], locations.loc[located, "latitude"]),
+        crs="EPSG:4326"
+    )
+    if tracts.crs is not None and points.crs != tracts.crs:
+        points = points.to_crs(tracts.crs)
+
+    joined = gpd.sjoin(points, tracts[["geoid", "geometry"]], how="left", predicate="within")
+    unlocated = locations[~located].assign(geoid=np.nan)
+    return pd.concat([pd.DataFrame(joined[KEY_COLUMNS + ["geoid"]]), unlocated], ignore_index=True)
+
+
+def load_lookup(tracts: gpd.GeoDataFrame, path: str = LOOKUP_PATH) -> pd.DataFrame:
+    """
+    Read the stored lookup if it was built from the same tract geometries.
+
+    Parameters:
+    tracts (gpd.GeoDataFrame): Census tracts with a `geoid` column.
+    path (str): Path of the lookup file.
+
+    Returns:
+    pd.DataFrame: Stored `location_id`, `latitude`, `longitude`, `geoid` rows; empty if missing or stale.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+        if stored.get("tracts") == tracts_hash(tracts):
+            return pd.DataFrame(stored["locations"], columns=KEY_COLUMNS + ["geoid"])
+    return pd.DataFrame(columns=KEY_COLUMNS + ["geoid"])
+
+
+def save_lookup(lookup: pd.DataFrame, tracts: gpd.GeoDataFrame, path: str = LOOKUP_PATH) -> None:
+    """
+    Write the lookup along with the fingerprint of the tracts it was built from.
+
+    Parameters:
+    lookup (pd.DataFrame): `location_id`, `latitude`, `longitude`, `geoid` rows.
+    tracts (gpd.GeoDataFrame): Census tracts the lookup was resolved against.
+    path (str): Path of the lookup file.
+    """
+    records = lookup[KEY_COLUMNS + ["geoid"]].astype(object).where(lookup.notna(), None)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Stages run in parallel may save the lookup at the same time, so each process writes its own temporary file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump({"tracts": tracts_hash(tracts), "locations": records.to_dict(orient="records")}, f, indent=1)
+    os.replace(temporary, path)
+
+
+def assign_tracts(readings: pd.DataFrame, tracts: gpd.GeoDataFrame, path: str = LOOKUP_PATH) -> pd.DataFrame:
+    """
+    Add the containing tract's `geoid` to every reading.
+
+    Locations missing from the stored lookup (new sensors or moved coordinates) are resolved and saved; if the tract
+    geometries changed, every location is resolved again.
+
+    Parameters:
+    readings (pd.DataFrame): Readings with `location_id`, `latitude` and `longitude` columns.
+    tracts (gpd.GeoDataFrame): Census tracts with a `geoid` column.
+    path (str): Path of the lookup file.
+
+    Returns:
+    pd.DataFrame: The readings with a `geoid` column, NaN for readings outside every tract. As with a spatial join,
+    a reading on the shared edge of several tracts appears once per tract.
+    """
+    # Number the distinct locations; all further work is per location
+    codes = readings.groupby(KEY_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+    first_rows = np.unique(codes, return_index=True)[1]
+    locations = _location_keys(readings.iloc[first_rows]).reset_index(drop=True)
+
+    lookup = load_lookup(tracts, path)
+    lookup["location_id"] = lookup["location_id"].astype(str)
+    lookup = lookup.astype({"latitude": float, "longitude": float})
+
+    # Resolve only the locations the lookup has not seen
+    known = pd.MultiIndex.from_frame(lookup[KEY_COLUMNS])
+    missing = locations[~pd.MultiIndex.from_frame(locations).isin(known)]
+
+    if not missing.empty:
+        lookup = pd.concat([lookup, resolve_tracts(missing, tracts)], ignore_index=True)
+        save_lookup(lookup, tracts, path)
+
+    # Tracts per location, grouped by location number (a location on a shared edge has several)
+    matches = locations.assign(_location=np.arange(len(locations))).merge(lookup, on=KEY_COLUMNS, how="left")
+    matches = matches.sort_values("_location", kind="stable")
+    counts = np.bincount(matches["_location"], minlength=len(locations))
+    starts = np.cumsum(counts) - counts
+
+    # Broadcast back to the readings, repeating a reading once per tract it falls in
+    per_row = counts[codes]
+    rows = np.repeat(np.arange(len(readings)), per_row)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+
+    result = readings.copy() if len(rows) == len(readings) else readings.iloc[rows].copy()
+    result["geoid"] = matches["geoid"].to_numpy()[starts[codes[rows]] + within]
+    return result
@@ -0,0 +1,475 @@
+"""
+Daily Tract AQI Rollup
+
+Aggregates sensor readings into per-tract, per-day AQI histograms, from which tract-level AQIs for any date window
+are computed without re-reading or re-joining the readings.
+
+It provides:
+- A rollup holding, for each sensor network, the number of readings at each whole AQI value per tract and day, stored
+  as sparse rows for the tract, day and AQI values that have readings.
+- Exact window medians (the same values as `groupby("geoid").median()` over the readings in the window), computed for
+  many windows at once from prefix sums taken at the window bounds only, over the tracts and AQI values present.
+- A compressed NPZ artifact, refreshed for only the sensor store months that changed since it was built.
+- Calendar-month, rolling and custom window definitions.
+- The inverse variance combination of Clarity and PurpleAir AQIs, with the weights saved by
+  `calculate_sensor_weights.py`, and the neighbor fill-in for tracts without sensors.
+- A tract × window table with the per-source and combined AQI of every window.
+
+AQI values are whole numbers by construction (see `preprocessing/aqi.py`), so counting readings per AQI value loses
+nothing.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from air_quality.tract_lookup import LOOKUP_PATH, assign_tracts, tracts_hash
+from preprocessing.sensor_store import STORE_PATH, load_readings, partition_signatures
+
+# Rollup artifact, anchored to the repository so scripts run from any directory share it
+ROLLUP_PATH = str(Path(__file__).resolve().parents[2] / "data" / "tract_rollup.npz")
+
+# Sensor networks in the rollup and the sensor store source each one is read from
+SOURCES: Dict[str, str] = {"clarity": "clarity", "purpleair": "api_purpleair"}
+
+# Reading columns the rollup needs
+COLUMNS = ["time", "location_id", "latitude", "longitude", "pm2_5_24h_mean_aqi"]
+
+# Inverse variance weights written by calculate_sensor_weights.py, anchored to the repository
+WEIGHTS_PATH = str(Path(__file__).resolve().parents[2] / "data" / "sensor_weights.json")
+
+# Weights used while calculate_sensor_weights.py has not written any
+CLARITY_WEIGHT = 0.76
+PURPLEAIR_WEIGHT = 0.24
+
+# Tracts without sensors take the mean combined AQI of these neighboring tracts
+FILL_IN_NEIGHBORS: Dict[str, Tuple[str, ...]] = {
+    "06081604104": ("06081604200", "06081604102", "06081604000"),
+    "06081604103": ("06081604104", "06081603900", "06081604200"),
+}
+
+# Windows are evaluated in batches to bound the size of the intermediate histograms
+WINDOW_BATCH = 64
+
+# Columns of the rows counting the readings of a network: tract index, day (since 1970-01-01), AQI value and count
+CELL_COLUMNS = ("tract", "day", "aqi", "count")
+TRACT, DAY, AQI, COUNT = range(len(CELL_COLUMNS))
+
+# Layout of the NPZ artifact; artifacts of another layout are recounted
+ROLLUP_FORMAT = 2
+
+WINDOW_COLUMNS = ["window", "start", "end"]
+
+# (tract index, day, AQI) of each reading of one network
+Located = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+@dataclass
+class TractRollup:
+    """
+    Per-tract, per-day AQI histograms for each sensor network.
+
+    Attributes:
+    geoids (np.ndarray): Tract ids, indexed by the `tract` column of the cells.
+    days (np.ndarray): Consecutive days (datetime64[D]) from the first to the last day with readings.
+    cells (Dict[str, np.ndarray]): Per network, int32 rows of `CELL_COLUMNS` with one row per tract, day and AQI value
+        that has readings, sorted by day.
+    tracts (str): Fingerprint of the tract geometries the readings were assigned with (see `tracts_hash`).
+    partitions (Dict[str, Dict[str, List[int]]]): Per network, the sensor store signature of each month counted.
+    """
+    geoids: np.ndarray
+    days: np.ndarray
+    cells: Dict[str, np.ndarray]
+    tracts: str = ""
+    partitions: Dict[str, Dict[str, List[int]]] = field(default_factory=dict)
+
+    def window_medians(self, source: str, starts, ends) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the median AQI of every tract over many date windows.
+
+        Parameters:
+        source (str): Sensor network, a key of `cells`.
+        starts (array-like): First day of each window.
+        ends (array-like): Last day of each window (inclusive).
+
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: (tract, window) arrays of median AQI (NaN without readings) and reading counts.
+        """
+        cells = self.cells[source]
+
+        # Inclusive date windows to [lo, hi) positions in the day-sorted cells
+        day = cells[:, DAY]
+        lo = np.searchsorted(day, np.asarray(starts, dtype="datetime64[D]").astype(np.int64), side="left")
+        hi = np.searchsorted(day, np.asarray(ends, dtype="datetime64[D]").astype(np.int64), side="right")
+        hi = np.maximum(hi, lo)
+
+        medians = np.full((len(self.geoids), len(lo)), np.nan)
+        readings = np.zeros((len(self.geoids), len(lo)), dtype=np.int64)
+        for batch in range(0, len(lo), WINDOW_BATCH):
+            window = slice(batch, batch + WINDOW_BATCH)
+            tracts, histograms = _window_histograms(cells, lo[window], hi[window])
+            medians[tracts, window], readings[tracts, window] = histogram_medians(histograms)
+        return medians, readings
+
+    def save(self, path: str = ROLLUP_PATH) -> None:
+        """
+        Write the rollup to a compressed NPZ file.
+
+        Parameters:
+        path (str): Destination path.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        metadata = {"format": ROLLUP_FORMAT, "tracts": self.tracts, "partitions": self.partitions,
+                    "sources": list(self.cells)}
+
+        # np.savez appends .npz to names without it, so write through an open file for the atomic rename
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, geoids=self.geoids.astype(str), days=self.days,
+                                metadata=np.array(json.dumps(metadata, sort_keys=True)),
+                                **{f"cells_{source}": cells for source, cells in self.cells.items()})
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = ROLLUP_PATH) -> "TractRollup":
+        """
+        Read a rollup written by `save`.
+
+        Parameters:
+        path (str): Path of the NPZ file.
+
+        Returns:
+        TractRollup: The stored rollup.
+
+        Raises:
+        ValueError: If the file was written in an older layout; `build_tract_rollup.py` recounts it.
+        """
+        with np.load(path) as artifact:
+            metadata = json.loads(str(artifact["metadata"]))
+            if metadata.get("format") != ROLLUP_FORMAT:
+                raise ValueError(f"{path} has an older layout; rebuild it with build_tract_rollup.py.")
+            return cls(geoids=artifact["geoids"].astype(object), days=artifact["days"],
+                       cells={source: artifact[f"cells_{source}"] for source in metadata["sources"]},
+                       tracts=metadata["tracts"], partitions=metadata["partitions"])
+
+
+def histogram_medians(histograms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute medians from histograms over whole AQI values.
+
+    Parameters:
+    histograms (np.ndarray): Reading counts with the AQI value on the last axis.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Medians (the mean of the two middle values for even counts, NaN for empty
+    histograms) and reading counts, both shaped like `histograms` without its last axis.
+    """
+    cumulative = np.cumsum(histograms, axis=-1)
+    n = cumulative[..., -1]
+
+    # The k-th smallest value (from 0) is the number of AQI values with at most k readings at or below them
+    lower = (cumulative <= ((n - 1) // 2)[..., None]).sum(axis=-1)
+    upper = (cumulative <= (n // 2)[..., None]).sum(axis=-1)
+
+    medians = (lower + upper) / 2
+    medians[n == 0] = np.nan
+    return medians, n
+
+
+def _window_histograms(cells: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Histograms of the cells in [lo, hi) of each window, over only the tracts and AQI values found in the windows.
+    # The cells between consecutive window bounds are counted once and accumulated, so each window is the difference
+    # of the prefix sums at its two bounds.
+    bounds, position = np.unique(np.concatenate([lo, hi]), return_inverse=True)
+    rows = cells[bounds[0]:bounds[-1]]
+    tracts, tract = np.unique(rows[:, TRACT], return_inverse=True)
+    values = int(rows[:, AQI].max()) + 1 if len(rows) else 1
+
+    segment = np.searchsorted(bounds, np.arange(bounds[0], bounds[-1]), side="right") - 1
+    size = len(tracts) * values
+    counted = np.bincount(segment * size + tract * values + rows[:, AQI], weights=rows[:, COUNT],
+                          minlength=(len(bounds) - 1) * size)
+
+    prefix = np.zeros((len(bounds), len(tracts), values), dtype=np.int64)
+    prefix[1:] = np.cumsum(counted.reshape(len(bounds) - 1, len(tracts), values), axis=0)
+    histograms = prefix[position[len(lo):]] - prefix[position[:len(lo)]]
+    return tracts, histograms.transpose(1, 0, 2)
+
+
+def _locate(readings: pd.DataFrame, geoids: np.ndarray, tracts: gpd.GeoDataFrame, lookup_path: str,
+            source: str) -> Located:
+    # Tract, day and AQI of each reading inside a tract and with an AQI
+    readings = assign_tracts(readings, tracts, lookup_path)
+    tract = pd.Index(geoids).get_indexer(readings["geoid"])
+    day = readings["time"].to_numpy().astype("datetime64[D]")
+    aqi = readings["pm2_5_24h_mean_aqi"].to_numpy(dtype=float, na_value=np.nan)
+
+    keep = (tract >= 0) & ~np.isnat(day) & np.isfinite(aqi)
+    aqi = aqi[keep]
+    if (aqi < 0).any() or (aqi != np.round(aqi)).any():
+        raise ValueError(f"{source} AQI values must be whole non-negative numbers.")
+    return tract[keep], day[keep], aqi.astype(np.int64)
+
+
+def _assemble(geoids: np.ndarray, located: Dict[str, Located], base: Optional[TractRollup] = None,
+              cleared: Optional[Dict[str, List[str]]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    # Count located readings into cells, on top of the cells of `base` outside the `cleared` months of each network
+    cells = {}
+    for source in SOURCES:
+        parts = []
+        if base is not None and source in base.cells:
+            stored = base.cells[source].astype(np.int64)
+            months = stored[:, DAY].astype("datetime64[D]").astype("datetime64[M]")
+            parts.append(stored[~np.isin(months, np.array((cleared or {}).get(source, []), dtype="datetime64[M]"))])
+        if source in located:
+            tract, day, aqi = located[source]
+            parts.append(np.column_stack([tract, day.astype(np.int64), aqi, np.ones(len(tract), dtype=np.int64)]))
+        rows = np.concatenate(parts) if parts else np.zeros((0, len(CELL_COLUMNS)), dtype=np.int64)
+
+        # One cell per tract, day and AQI value, with the key ordered by day first
+        first = rows[:, DAY].min() if len(rows) else 0
+        values = rows[:, AQI].max() + 1 if len(rows) else 1
+        keys, cell = np.unique(((rows[:, DAY] - first) * len(geoids) + rows[:, TRACT]) * values + rows[:, AQI],
+                               return_inverse=True)
+        count = np.bincount(cell, weights=rows[:, COUNT], minlength=len(keys))
+
+        day, rest = np.divmod(keys, len(geoids) * values)
+        cells[source] = np.column_stack([rest // values, day + first, rest % values, count]).astype(np.int32)
+
+    # Days from the first to the last reading of any network (e.g. after months were removed from the store)
+    used = [source_cells[[0, -1], DAY] for source_cells in cells.values() if len(source_cells)]
+    if not used:
+        raise ValueError("No readings fall within the census tracts.")
+    days = np.arange(min(span[0] for span in used), max(span[1] for span in used) + 1).astype("datetime64[D]")
+    return days, cells
+
+
+def build_rollup(readings: Dict[str, pd.DataFrame], tracts: gpd.GeoDataFrame,
+                 lookup_path: str = LOOKUP_PATH) -> TractRollup:
+    """
+    Aggregate sensor readings into daily per-tract AQI histograms.
+
+    Parameters:
+    readings (Dict[str, pd.DataFrame]): Per network, readings with the `COLUMNS` columns.
+    tracts (gpd.GeoDataFrame): Census tracts with a `geoid` column.
+    lookup_path (str): Sensor-to-tract lookup file.
+
+    Returns:
+    TractRollup: Histograms over every tract and every day from the first to the last reading of any network.
+    """
+    geoids = tracts["geoid"].astype(str).to_numpy(dtype=object)
+    located = {source: _locate(df, geoids, tracts, lookup_path, source) for source, df in readings.items()}
+    days, cells = _assemble(geoids, located)
+    return TractRollup(geoids=geoids, days=days, cells=cells, tracts=tracts_hash(tracts))
+
+
+def refresh_rollup(tracts: gpd.GeoDataFrame, path: str = ROLLUP_PATH, root: str = STORE_PATH,
+                   lookup_path: str = LOOKUP_PATH) -> TractRollup:
+    """
+    Bring the stored rollup up to date with the sensor store, recounting only the months that changed.
+
+    New, rewritten and removed month partitions are detected from their signatures. Everything is recounted if there
+    is no stored rollup or the tract geometries changed.
+
+    Parameters:
+    tracts (gpd.GeoDataFrame): Census tracts with a `geoid` column.
+    path (str): Path of the NPZ artifact.
+    root (str): Sensor store directory.
+    lookup_path (str): Sensor-to-tract lookup file.
+
+    Returns:
+    TractRollup: The current rollup, saved to `path` if anything changed.
+    """
+    geoids = tracts["geoid"].astype(str).to_numpy(dtype=object)
+    fingerprint = tracts_hash(tracts)
+    current = {source: {month: list(signature) for month, signature in partition_signatures(store, root).items()}
+               for source, store in SOURCES.items()}
+
+    try:
+        base = TractRollup.load(path) if os.path.exists(path) else None
+    except ValueError:
+        base = None
+    if base is not None and (base.tracts != fingerprint or list(base.geoids) != list(geoids)):
+        base = None
+    stored = base.partitions if base is not None else {}
+
+    # Months whose partition is new or rewritten, and months no longer in the store
+    changed = {source: [month for month, signature in months.items() if stored.get(source, {}).get(month) != signature]
+               for source, months in current.items()}
+    removed = {source: [month for month in stored.get(source, {}) if month not in current[source]]
+               for source in SOURCES}
+    if base is not None and not any(changed.values()) and not any(removed.values()):
+        return base
+
+    located = {}
+    for source, months in changed.items():
+        frames = [load_readings(SOURCES[source], columns=COLUMNS, root=root,
+                                start=pd.Period(month, "M").start_time, end=pd.Period(month, "M").end_time)
+                  for month in months]
+        if frames:
+            located[source] = _locate(pd.concat(frames, ignore_index=True), geoids, tracts, lookup_path, source)
+
+    cleared = {source: changed[source] + removed[source] for source in SOURCES}
+    days, cells = _assemble(geoids, located, base=base, cleared=cleared)
+
+    rollup = TractRollup(geoids=geoids, days=days, cells=cells, tracts=fingerprint, partitions=current)
+    rollup.save(path)
+    return rollup
+
+
+def month_windows(days: np.ndarray) -> pd.DataFrame:
+    """
+    Define one window per calendar month touched by `days`.
+
+    Parameters:
+    days (np.ndarray): Days covered (datetime64[D]).
+
+    Returns:
+    pd.DataFrame: `window` (e.g. "2024-03"), `start` and `end` (inclusive) columns.
+    """
+    months = np.arange(days[0].astype("datetime64[M]"), days[-1].astype("datetime64[M]") + 1)
+    return pd.DataFrame({
+        "window": months.astype(str),
+        "start": months.astype("datetime64[D]"),
+        "end": (months + 1).astype("datetime64[D]") - 1,
+    })
+
+
+def rolling_windows(days: np.ndarray, length: int) -> pd.DataFrame:
+    """
+    Define one trailing window of `length` days ending on each day, starting once a full window is available.
+
+    Parameters:
+    days (np.ndarray): Days covered (datetime64[D]).
+    length (int): Window length in days.
+
+    Returns:
+    pd.DataFrame: `window` (e.g. "30d:2024-05-01"), `start` and `end` (inclusive) columns.
+    """
+    ends = days[length - 1:]
+    return pd.DataFrame({
+        "window": [f"{length}d:{end}" for end in ends.astype(str)],
+        "start": ends - (length - 1),
+        "end": ends,
+    })
+
+
+def custom_windows(ranges: Sequence[Tuple[str, str]]) -> pd.DataFrame:
+    """
+    Define windows from explicit date ranges.
+
+    Parameters:
+    ranges (Sequence[Tuple[str, str]]): (first day, last day) pairs, both inclusive.
+
+    Returns:
+    pd.DataFrame: `window` (e.g. "2024-03-30:2025-03-31"), `start` and `end` columns.
+    """
+    starts = np.array([start for start, _ in ranges], dtype="datetime64[D]")
+    ends = np.array([end for _, end in ranges], dtype="datetime64[D]")
+    return pd.DataFrame({
+        "window": [f"{start}:{end}" for start, end in zip(starts.astype(str), ends.astype(str))],
+        "start": starts,
+        "end": ends,
+    })
+
+
+def load_sensor_weights(path: str = WEIGHTS_PATH) -> Tuple[float, float]:
+    """
+    Read the Clarity and PurpleAir weights saved by `calculate_sensor_weights.py`.
+
+    Parameters:
+    path (str): Path of the weights JSON.
+
+    Returns:
+    Tuple[float, float]: Clarity and PurpleAir weights; `CLARITY_WEIGHT` and `PURPLEAIR_WEIGHT` if the file is missing.
+    """
+    if not os.path.exists(path):
+        return CLARITY_WEIGHT, PURPLEAIR_WEIGHT
+    with open(path) as f:
+        weights = json.load(f)
+    return float(weights["clarity"]), float(weights["purpleair"])
+
+
+def combine_aqi(clarity_aqi, purpleair_aqi,
+                weights: Tuple[float, float] = (CLARITY_WEIGHT, PURPLEAIR_WEIGHT)) -> np.ndarray:
+    """
+    Combine Clarity and PurpleAir AQIs with inverse variance weights, falling back to whichever one is available.
+
+    Parameters:
+    clarity_aqi (array-like): Clarity AQIs, NaN where missing.
+    purpleair_aqi (array-like): PurpleAir AQIs, NaN where missing.
+    weights (Tuple[float, float]): Clarity and PurpleAir weights, e.g. from `load_sensor_weights`.
+
+    Returns:
+    np.ndarray: Combined AQIs, NaN where both are missing.
+    """
+    clarity_aqi = np.asarray(clarity_aqi, dtype=float)
+    purpleair_aqi = np.asarray(purpleair_aqi, dtype=float)
+    weighted = clarity_aqi * weights[0] + purpleair_aqi * weights[1]
+    return np.where(np.isnan(clarity_aqi), purpleair_aqi, np.where(np.isnan(purpleair_aqi), clarity_aqi, weighted))
+
+
+def fill_in_neighbors(geoids: np.ndarray, combined: np.ndarray) -> np.ndarray:
+    """
+    Give tracts without sensors the mean combined AQI of their neighbors.
+
+    Parameters:
+    geoids (np.ndarray): Tract ids, one per row of `combined`.
+    combined (np.ndarray): Combined AQIs with tracts on the first axis.
+
+    Returns:
+    np.ndarray: A copy of `combined` with the `FILL_IN_NEIGHBORS` tracts filled where they have no AQI.
+    """
+    filled = combined.copy()
+    rows = pd.Index(geoids)
+    for target, neighbors in FILL_IN_NEIGHBORS.items():
+        if target not in rows:
+            continue
+
+        # Neighbors are averaged as measured, before any of them is filled in itself
+        values = combined[[rows.get_loc(g) for g in neighbors if g in rows]]
+        present = np.isfinite(values)
+        with np.errstate(invalid="ignore"):
+            mean = np.where(present, values, 0).sum(axis=0) / present.sum(axis=0)
+
+        row = rows.get_loc(target)
+        filled[row] = np.where(np.isnan(combined[row]), mean, combined[row])
+    return filled
+
+
+def window_table(rollup: TractRollup, windows: pd.DataFrame,
+                 weights: Tuple[float, float] = (CLARITY_WEIGHT, PURPLEAIR_WEIGHT)) -> pd.DataFrame:
+    """
+    Compute per-source and combined AQIs for every tract and window.
+
+    Parameters:
+    rollup (TractRollup): Daily histograms with `clarity` and `purpleair` networks.
+    windows (pd.DataFrame): `window`, `start` and `end` columns, e.g. from `month_windows`.
+    weights (Tuple[float, float]): Clarity and PurpleAir weights of the combined AQI.
+
+    Returns:
+    pd.DataFrame: Indexed by (`window`, `geoid`), with `start`, `end`, `clarity_aqi`, `purpleair_aqi`,
+    `combined_aqi`, `clarity_readings` and `purpleair_readings` columns. Tract-windows without any AQI are left out.
+    """
+    columns: Dict[str, np.ndarray] = {}
+    for source in SOURCES:
+        columns[f"{source}_aqi"], columns[f"{source}_readings"] = rollup.window_medians(
+            source, windows["start"], windows["end"])
+    columns["combined_aqi"] = fill_in_neighbors(
+        rollup.geoids, combine_aqi(columns["clarity_aqi"], columns["purpleair_aqi"], weights))
+
+    # (tract, window) arrays to one row per window and tract
+    order: List[str] = ["clarity_aqi", "purpleair_aqi", "combined_aqi", "clarity_readings", "purpleair_readings"]
+    table = pd.DataFrame({name: columns[name].T.ravel() for name in order})
+    table.insert(0, "geoid", np.tile(rollup.geoids, len(windows)))
+    for column in reversed(WINDOW_COLUMNS):
+        table.insert(0, column, np.repeat(windows[column].to_numpy(), len(rollup.geoids)))
+
+    table = table[table[["clarity_aqi", "purpleair_aqi", "combined_aqi"]].notna().any(axis=1)]
+    return table.set_index(["window", "geoid"])
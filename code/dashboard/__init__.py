@@ -0,0 +1,5 @@
+"""
+Dashboard Support Package
+
+Helpers used by streamlit_app.py to load, cache, and prepare the data shown on the dashboard.
+"""
@@ -0,0 +1,55 @@
+"""
+Dashboard Bundle Build
+
+This script compiles the dashboard's input files into the memory-mapped bundle the app opens at start.
+
+It performs the following steps:
+- Loads the tracts with combined AQI and merges the Health Risk Index and normalized scores into them.
+- Prepares the display shapes, the predictability surface and the monitor scores, along with the tract rollup and
+  sensor weights when present.
+- Saves them as Arrow and NPY files with a manifest of the source hashes in a new version folder of
+  `data/dashboard_bundle/` (or `--bundle`), which becomes the current one once complete.
+
+The sources are read from the repository root whatever the working directory, and recorded in the manifest by their
+paths relative to it, so the dashboard recognises the bundle when it runs from the root.
+
+Source files whose modification time and size match the manifest are not hashed again, so checking an up-to-date
+bundle is quick.
+
+The dashboard also rebuilds the bundle on its own when a source file changes, so this script is only needed to prepare
+it ahead of time, e.g. while building a container image so that new replicas start without compiling anything.
+
+Example:
+    python code/dashboard/build_bundle.py --bundle /srv/dashboard_bundle
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from dashboard.bundle import BUNDLE_PATH, current_version, read_manifest  # noqa: E402
+from dashboard.data import build_bundle, same_sources, source_hashes  # noqa: E402
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+parser = argparse.ArgumentParser(description="Compile the dashboard bundle from its source files.")
+parser.add_argument("--bundle", default=str(ROOT / BUNDLE_PATH), help="Bundle folder")
+args = parser.parse_args()
+
+start = time.perf_counter()
+manifest = read_manifest(args.bundle)
+sources = source_hashes(known=None if manifest is None else manifest["sources"], root=str(ROOT))
+if manifest is not None and same_sources(manifest["sources"], sources):
+    print(f"✅ Dashboard bundle in {args.bundle} is up to date")
+    sys.exit()
+
+build_bundle(args.bundle, sources, root=str(ROOT))
+
+size = sum(entry.stat().st_size for entry in os.scandir(current_version(args.bundle)))
+print(f"✅ Built the dashboard bundle in {time.perf_counter() - start:.2f}s and saved it to {args.bundle} "
+      f"({size / 2 ** 20:.1f} MB)")
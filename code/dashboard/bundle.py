@@ -0,0 +1,318 @@
+"""
+Dashboard Bundle
+
+Stores everything the dashboard reads at start in one folder of files that can be memory-mapped, so a new process
+skips parsing the GeoJSON and CSV files, decompressing the tract rollup and unpickling the model before the first
+paint.
+
+It provides:
+- A writer for the compiled inputs: tract properties and risk components and the monitor scores as Arrow IPC files,
+  tract geometry as WKB and as pre-serialised GeoJSON (the display shapes), and the predictability surface and the
+  sparse tract rollup cells as uncompressed NPY arrays.
+- A manifest with the bundle format version, the modification time, size and content hash of every source file and the
+  small values (map center, surface georeferencing, sensor weights), so a bundle built from other sources or by an older
+  version is rebuilt.
+- A reader that memory-maps the Arrow files and arrays, and unpickles the model and parses the tract geometries only
+  when they are first used, so scikit-learn is not imported and no polygon is parsed before the first paint.
+
+Each build is written to a new version folder inside the bundle folder, and a `CURRENT` file naming it is replaced once
+the build is complete. Readers resolve `CURRENT` once when they open the bundle and keep reading that version, so a
+reader never sees a partly written bundle or mixes files of two builds. A build removes the versions older than the one
+it replaces.
+"""
+
+import json
+import os
+import pickle
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from air_quality.tract_rollup import TractRollup
+from predictability.surface import PredictabilitySurface
+
+# Folder of the compiled bundle (relative to the repository root)
+BUNDLE_PATH = "data/dashboard_bundle"
+
+# Format version of the bundle; bumping it makes every process rebuild bundles written by older code
+BUNDLE_VERSION = 3
+
+MANIFEST_NAME = "manifest.json"
+
+# File in the bundle folder naming the version folder of the latest complete build
+CURRENT_NAME = "CURRENT"
+
+# Age after which the temporary folder of an unfinished build is removed by the next build, in seconds
+STALE_BUILD_AGE = 3600
+
+
+def _write_table(frame: pd.DataFrame, path: str) -> None:
+    # Uncompressed so that the reader can map the buffers instead of decoding them
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_table(path: str) -> pa.Table:
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def current_version(path: str = BUNDLE_PATH) -> Optional[str]:
+    """
+    Find the version folder of the latest complete build.
+
+    Parameters:
+    path (str): Bundle folder.
+
+    Returns:
+    Optional[str]: Path of the version folder named by `CURRENT`, or None if no build completed.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_NAME)) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(path, name) if name else None
+
+
+def _remove_old_versions(path: str, keep: Tuple[str, ...]) -> None:
+    # Unfinished builds of other processes are left alone unless they were abandoned long ago
+    for entry in os.scandir(path):
+        if entry.name in keep or entry.name == CURRENT_NAME:
+            continue
+        if entry.name.endswith(".tmp") and time.time() - entry.stat().st_mtime < STALE_BUILD_AGE:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def write_bundle(path: str, sources: Dict[str, Optional[List]], tracts: gpd.GeoDataFrame, shapes: Dict[str, Dict],
+                 monitors: pd.DataFrame, model_path: str, surface: PredictabilitySurface,
+                 rollup: Optional[TractRollup], sensor_weights: Tuple[float, float],
+                 map_center: Tuple[float, float]) -> str:
+    """
+    Write the compiled dashboard inputs to a new version of a bundle folder and make it the current one.
+
+    Parameters:
+    path (str): Bundle folder.
+    sources (Dict[str, Optional[List]]): [mtime_ns, size, hash] of each source file the inputs were built from (None
+        if missing).
+    tracts (gpd.GeoDataFrame): Tracts with combined AQI, Health Risk Index, `air_norm` and `health_norm`.
+    shapes (Dict[str, Dict]): GeoJSON geometry drawn for each tract id.
+    monitors (pd.DataFrame): Monitor locations with predictability and consistency scores.
+    model_path (str): Path of the pickled predictability model, copied as is.
+    surface (PredictabilitySurface): Predicted predictability over a grid covering the tracts.
+    rollup (Optional[TractRollup]): Daily per-tract AQI histograms, None if not built.
+    sensor_weights (Tuple[float, float]): Clarity and PurpleAir weights of the combined AQI of date ranges.
+    map_center (Tuple[float, float]): Latitude and longitude of the centroid of all tracts.
+
+    Returns:
+    str: Path of the new version folder.
+    """
+    name = f"build-{time.time_ns()}-{os.getpid()}"
+    version = os.path.join(path, name)
+    temporary = f"{version}.tmp"
+    os.makedirs(temporary)
+
+    properties = pd.DataFrame(tracts.drop(columns=tracts.geometry.name))
+    _write_table(properties.assign(geometry=tracts.geometry.to_wkb()), os.path.join(temporary, "tracts.arrow"))
+    _write_table(monitors, os.path.join(temporary, "monitors.arrow"))
+
+    with open(os.path.join(temporary, "shapes.json"), "w") as f:
+        json.dump(shapes, f, separators=(",", ":"))
+    shutil.copyfile(model_path, os.path.join(temporary, "model.pkl"))
+
+    np.save(os.path.join(temporary, "surface.npy"), surface.values)
+    if rollup is not None:
+        np.save(os.path.join(temporary, "rollup_geoids.npy"), rollup.geoids.astype(str))
+        np.save(os.path.join(temporary, "rollup_days.npy"), rollup.days)
+        for source, cells in rollup.cells.items():
+            np.save(os.path.join(temporary, f"rollup_cells_{source}.npy"), cells)
+
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "sources": sources,
+        "crs": tracts.crs.to_string(),
+        "map_center": list(map_center),
+        "sensor_weights": list(sensor_weights),
+        "surface": {"south": surface.south, "west": surface.west, "step": surface.step, "sources": surface.sources},
+        "rollup": None if rollup is None else {"tracts": rollup.tracts, "partitions": rollup.partitions,
+                                               "sources": list(rollup.cells)},
+    }
+    with open(os.path.join(temporary, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    os.replace(temporary, version)
+
+    # Processes that opened the replaced version keep reading it, so only the versions before it are removed
+    previous = current_version(path)
+    pointer = os.path.join(path, f"{CURRENT_NAME}.tmp")
+    with open(pointer, "w") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(path, CURRENT_NAME))
+    _remove_old_versions(path, keep=(name,) if previous is None else (name, os.path.basename(previous)))
+    return version
+
+
+def _read_version_manifest(version: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(version, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == BUNDLE_VERSION else None
+
+
+def read_manifest(path: str = BUNDLE_PATH) -> Optional[Dict]:
+    """
+    Read the manifest of the current version of a bundle.
+
+    Parameters:
+    path (str): Bundle folder.
+
+    Returns:
+    Optional[Dict]: The manifest, or None if there is no complete bundle of the current format at `path`.
+    """
+    version = current_version(path)
+    return None if version is None else _read_version_manifest(version)
+
+
+@dataclass(frozen=True)
+class DashboardBundle:
+    """
+    A compiled bundle opened for reading.
+
+    Every file is read from the version folder resolved when the bundle was opened. The tract table is memory-mapped
+    and the model file read at open, so the parts used later still come from that build after newer builds removed it.
+
+    Attributes:
+    path (str): Version folder of the bundle.
+    manifest (Dict): The bundle's manifest (see `write_bundle`).
+    tract_table (pa.Table): The memory-mapped tract properties, risk components and WKB geometry.
+    model_pickle (bytes): The pickled predictability model.
+    """
+    path: str
+    manifest: Dict
+    tract_table: pa.Table = field(repr=False)
+    model_pickle: bytes = field(repr=False)
+
+    @classmethod
+    def open(cls, path: str = BUNDLE_PATH) -> "DashboardBundle":
+        """
+        Open the current version of a bundle written by `write_bundle`.
+
+        Parameters:
+        path (str): Bundle folder.
+
+        Returns:
+        DashboardBundle: The opened bundle.
+        """
+        version = current_version(path)
+        manifest = None if version is None else _read_version_manifest(version)
+        if manifest is None:
+            raise FileNotFoundError(f"No dashboard bundle of version {BUNDLE_VERSION} in {path}")
+        with open(os.path.join(version, "model.pkl"), "rb") as f:
+            model_pickle = f.read()
+        return cls(path=version, manifest=manifest, tract_table=_read_table(os.path.join(version, "tracts.arrow")),
+                   model_pickle=model_pickle)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def tracts(self) -> pd.DataFrame:
+        """
+        Read the tract properties and risk components, without geometry.
+
+        Returns:
+        pd.DataFrame: Tracts with combined AQI, Health Risk Index, `air_norm` and `health_norm`.
+        """
+        return self.tract_table.drop_columns(["geometry"]).to_pandas()
+
+    def tract_geometries(self) -> gpd.GeoDataFrame:
+        """
+        Read the tract geometries.
+
+        Returns:
+        gpd.GeoDataFrame: `geoid` and geometry of every tract, in the order of `tracts`.
+        """
+        table = self.tract_table.select(["geoid", "geometry"])
+        geometry = gpd.GeoSeries.from_wkb(table.column("geometry").to_numpy(), crs=self.manifest["crs"])
+        return gpd.GeoDataFrame({"geoid": table.column("geoid").to_pylist()}, geometry=geometry)
+
+    def shapes(self) -> Dict[str, Dict]:
+        """
+        Read the pre-serialised GeoJSON geometry of every tract.
+
+        Returns:
+        Dict[str, Dict]: GeoJSON geometry per tract id.
+        """
+        with open(self._file("shapes.json")) as f:
+            return json.load(f)
+
+    def monitors(self) -> pd.DataFrame:
+        """
+        Read the monitor scores.
+
+        Returns:
+        pd.DataFrame: Monitor locations with predictability and consistency scores.
+        """
+        return _read_table(self._file("monitors.arrow")).to_pandas()
+
+    def model(self):
+        """
+        Unpickle the predictability model, which imports scikit-learn.
+
+        Returns:
+        RandomForestRegressor: Model predicting predictability from the nearest monitors.
+        """
+        return pickle.loads(self.model_pickle)
+
+    def surface(self) -> PredictabilitySurface:
+        """
+        Map the predictability surface.
+
+        Returns:
+        PredictabilitySurface: The stored surface, with its values memory-mapped.
+        """
+        georef = self.manifest["surface"]
+        return PredictabilitySurface(values=np.load(self._file("surface.npy"), mmap_mode="r"), south=georef["south"],
+                                     west=georef["west"], step=georef["step"], sources=georef["sources"])
+
+    def rollup(self) -> Optional[TractRollup]:
+        """
+        Map the daily tract AQI rollup.
+
+        Returns:
+        Optional[TractRollup]: The stored rollup, with its cells memory-mapped, or None if it was not built.
+        """
+        metadata = self.manifest["rollup"]
+        if metadata is None:
+            return None
+        return TractRollup(geoids=np.load(self._file("rollup_geoids.npy")).astype(object),
+                           days=np.load(self._file("rollup_days.npy")),
+                           cells={source: np.load(self._file(f"rollup_cells_{source}.npy"), mmap_mode="r")
+                                   for source in metadata["sources"]},
+                           tracts=metadata["tracts"], partitions=metadata["partitions"])
+
+    @property
+    def sensor_weights(self) -> Tuple[float, float]:
+        """Clarity and PurpleAir weights of the combined AQI of date ranges."""
+        return tuple(self.manifest["sensor_weights"])
+
+    @property
+    def map_center(self) -> Tuple[float, float]:
+        """Latitude and longitude of the centroid of all tracts."""
+        return tuple(self.manifest["map_center"])
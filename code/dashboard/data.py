@@ -0,0 +1,339 @@
+"""
+Dashboard Data Layer
+
+Loads everything the Streamlit dashboard reads from disk once per process and shares it across sessions.
+
+It provides:
+- A single read-only bundle with the tract table, monitor scores, and the predictability model.
+- The health risk merge, geoid construction, and score normalization, compiled ahead of time into the memory-mapped
+  dashboard bundle (see `dashboard/bundle.py`), which is rebuilt when a source file's content changes. Only source
+  files whose modification time or size changed since the build are hashed to check it.
+- The composite risk layer, drawn with simplified tract shapes, with the preset balances prepared ahead of the first
+  request.
+- A spatial index over monitor coordinates for nearest-monitor lookups, built with the model on first use.
+- The precomputed predictability surface, rebuilt only when the model or monitor scores change.
+- The daily tract AQI rollup, when present, with composite risk layers for any date range cached per range.
+- File signatures (modification time and size) so the bundle is reloaded only when a source file changes.
+- The live PurpleAir polling service, started once per process when an API key is configured.
+
+Widget interactions rerun the app script, but they reuse the cached bundle instead of re-reading and re-parsing the files.
+scikit-learn is imported and tract geometry is parsed only by the features that need them, so neither slows the cold
+start.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import date
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import geopandas as gpd
+import pandas as pd
+import streamlit as st
+from shapely.geometry import mapping
+
+from air_quality.live import LiveAirQuality
+from air_quality.tract_rollup import TractRollup, custom_windows, load_sensor_weights, window_table
+from dashboard.bundle import BUNDLE_PATH, DashboardBundle, read_manifest, write_bundle
+from dashboard.risk import RiskLayer
+from fingerprint import ContentHashes
+from predictability.neighbors import MonitorIndex
+from predictability.surface import SURFACE_PATH, PredictabilitySurface, ensure_surface, padded_bounds
+from preprocessing.purpleair_wrapper import DEFAULT_BASE_URL, PurpleAirAPI
+from preprocessing.tract_shapes import SHAPES_PATH, ensure_display_shapes
+
+# Source files read by the dashboard (paths are relative to the repository root)
+SOURCES: Dict[str, str] = {
+    "tracts": "data/tracts_with_combined_aqi.geojson",
+    "health_risk": "data/health_risk_index.csv",
+    "monitors": "data/combined_scores.csv",
+    "model": "data/rf_predictability_model.pkl",
+}
+
+# Optional source files; the features that read them are hidden when they are missing
+OPTIONAL_SOURCES: Dict[str, str] = {
+    "rollup": "data/tract_rollup.npz",
+    "sensor_weights": "data/sensor_weights.json",
+}
+
+# Period of the AQIs stored in the tracts GeoJSON (DATE_START and DATE_END in combine_air_quality_data.py)
+AQI_PERIOD: Tuple[date, date] = (date(2024, 3, 30), date(2025, 3, 31))
+
+# Number of date ranges whose risk layers are kept in memory
+RANGE_CACHE_SIZE = 16
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+@dataclass(frozen=True)
+class DashboardData:
+    """
+    Read-only inputs shared by every dashboard session.
+
+    The same instance is handed to all reruns, so callers must not modify the frames in place. Use `.copy()` or
+    `.assign()` to derive per-session data.
+
+    Attributes:
+    tracts (pd.DataFrame): Census tracts with combined AQI, Health Risk Index, `air_norm` and `health_norm`, without
+        geometry (see `tract_geometries`).
+    shapes (Dict[str, Dict]): GeoJSON geometry drawn for each tract id, simplified where a display shape exists.
+    monitors (pd.DataFrame): Monitor locations with predictability and consistency scores.
+    risk (RiskLayer): Composite risk choropleth payloads for the tracts.
+    surface (PredictabilitySurface): Predicted predictability over a grid covering the tracts.
+    rollup (Optional[TractRollup]): Daily per-tract AQI histograms for date range queries, None if not built.
+    sensor_weights (Tuple[float, float]): Clarity and PurpleAir weights of the combined AQI of date ranges.
+    map_center (Tuple[float, float]): Latitude and longitude of the centroid of all tracts.
+    signature (Signature): File signatures of the sources this bundle was built from.
+    bundle (DashboardBundle): The compiled bundle the data was read from.
+    """
+    tracts: pd.DataFrame
+    shapes: Dict[str, Dict]
+    monitors: pd.DataFrame
+    risk: RiskLayer
+    surface: PredictabilitySurface
+    rollup: Optional[TractRollup]
+    sensor_weights: Tuple[float, float]
+    map_center: Tuple[float, float]
+    signature: Signature
+    bundle: DashboardBundle
+
+    @cached_property
+    def monitor_index(self) -> MonitorIndex:
+        """Spatial index over `monitors`, returning row positions in that frame."""
+        return MonitorIndex(self.monitors["latitude"], self.monitors["longitude"])
+
+    @cached_property
+    def model(self) -> Any:
+        """Model predicting predictability from the nearest monitors (a RandomForestRegressor)."""
+        return self.bundle.model()
+
+    @cached_property
+    def tract_geometries(self) -> gpd.GeoDataFrame:
+        """`geoid` and geometry of every tract as a GeoDataFrame, in the order of `tracts`."""
+        return self.bundle.tract_geometries()
+
+
+def source_signature(paths: Dict[str, str] = SOURCES, optional: Dict[str, str] = OPTIONAL_SOURCES) -> Signature:
+    """
+    Build a cheap fingerprint of the source files from their modification time and size.
+
+    Parameters:
+    paths (Dict[str, str]): Mapping of source names to file paths.
+    optional (Dict[str, str]): Mapping of source names to file paths that may be missing.
+
+    Returns:
+    Signature: One (path, mtime_ns, size) entry per source file; missing optional files are recorded with -1.
+    """
+    signature = []
+    for path in paths.values():
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    for path in optional.values():
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        else:
+            signature.append((path, -1, -1))
+    return tuple(signature)
+
+
+def load_tracts(tracts_path: str, health_risk_path: str) -> gpd.GeoDataFrame:
+    """
+    Load tract geometries and attach the normalized air quality and health risk scores.
+
+    Parameters:
+    tracts_path (str): Path to the GeoJSON with combined AQI per tract.
+    health_risk_path (str): Path to the CSV with the Health Risk Index per tract.
+
+    Returns:
+    gpd.GeoDataFrame: Tracts with `air_norm` and `health_norm`, dropping tracts missing either score.
+    """
+    tracts = gpd.read_file(tracts_path)
+    health_risk = pd.read_csv(health_risk_path)
+
+    # Merge health risk data into tracts GeoDataFrame
+    health_risk["geoid"] = "06081" + (health_risk["tract"] * 100).astype(int).astype(str)
+    tracts = tracts.merge(health_risk, on="geoid")
+
+    # Normalize air quality; health risk is already 0-1
+    tracts["air_norm"] = tracts["combined_aqi"] / tracts["combined_aqi"].max()
+    tracts["health_norm"] = tracts["Health Risk Index"]
+
+    # Drop any rows with missing data
+    return tracts.dropna(subset=["air_norm", "health_norm"]).reset_index(drop=True)
+
+
+def source_hashes(paths: Dict[str, str] = SOURCES, optional: Dict[str, str] = OPTIONAL_SOURCES,
+                  known: Optional[Dict[str, Optional[List]]] = None, root: str = ".") -> Dict[str, Optional[List]]:
+    """
+    Hash the content of the source files, as recorded in the bundle manifest.
+
+    Parameters:
+    paths (Dict[str, str]): Mapping of source names to file paths, relative to `root`.
+    optional (Dict[str, str]): Mapping of source names to file paths that may be missing, relative to `root`.
+    known (Optional[Dict[str, Optional[List]]]): Records of an earlier call (e.g. the bundle manifest's `sources`),
+        whose hashes are reused for files with the same modification time and size.
+    root (str): Repository root the paths are relative to.
+
+    Returns:
+    Dict[str, Optional[List]]: [mtime_ns, size, SHA-256] per source path (as given, so the manifest does not depend
+        on where the repository is); missing optional files map to None.
+    """
+    hashes = ContentHashes(Path(root), {path: record for path, record in (known or {}).items() if record})
+    present = list(paths.values()) + [path for path in optional.values() if os.path.exists(os.path.join(root, path))]
+    for path in present:
+        hashes.file(path)
+    return {path: hashes.known[path] if path in present else None for path in [*paths.values(), *optional.values()]}
+
+
+def same_sources(recorded: Dict[str, Optional[List]], current: Dict[str, Optional[List]]) -> bool:
+    """
+    Check whether two sets of source records (see `source_hashes`) describe the same file contents.
+
+    Parameters:
+    recorded (Dict[str, Optional[List]]): Records of the sources a bundle was built from.
+    current (Dict[str, Optional[List]]): Records of the current source files.
+
+    Returns:
+    bool: True if every source has the same content hash, or is missing in both, regardless of modification times.
+    """
+    def contents(records):
+        return {path: record and record[2] for path, record in records.items()}
+
+    return contents(recorded) == contents(current)
+
+
+def build_bundle(path: str = BUNDLE_PATH, sources: Optional[Dict[str, Optional[List]]] = None,
+                 root: str = ".") -> None:
+    """
+    Compile the source files into the dashboard bundle.
+
+    Parameters:
+    path (str): Bundle folder.
+    sources (Optional[Dict[str, Optional[List]]]): Records of the source files (see `source_hashes`), if already
+        computed.
+    root (str): Repository root the source and artifact paths are relative to.
+    """
+    sources = source_hashes(root=root) if sources is None else sources
+    source = {name: os.path.join(root, file) for name, file in {**SOURCES, **OPTIONAL_SOURCES}.items()}
+    tracts = load_tracts(source["tracts"], source["health_risk"])
+    monitors = pd.read_csv(source["monitors"])
+
+    # Tracts without a display shape are drawn in full, so every tract's GeoJSON is serialised here
+    shapes = ensure_display_shapes(source["tracts"], os.path.join(root, SHAPES_PATH))
+    for geoid, geometry in zip(tracts["geoid"], tracts.geometry.to_crs("EPSG:4326")):
+        if geoid not in shapes:
+            shapes[geoid] = mapping(geometry)
+
+    surface = ensure_surface(padded_bounds(tracts.total_bounds), path=os.path.join(root, SURFACE_PATH),
+                             model_path=source["model"], monitors_path=source["monitors"], monitors=monitors)
+
+    rollup = TractRollup.load(source["rollup"]) if os.path.exists(source["rollup"]) else None
+
+    # Set map center based on tract centroids
+    center = tracts.geometry.centroid.unary_union.centroid
+
+    write_bundle(path, sources, tracts, shapes, monitors, source["model"], surface, rollup,
+                 load_sensor_weights(source["sensor_weights"]), (center.y, center.x))
+
+
+def ensure_bundle(path: str = BUNDLE_PATH) -> DashboardBundle:
+    """
+    Open the dashboard bundle, compiling it first if it is missing, of an older version or built from other sources.
+
+    Parameters:
+    path (str): Bundle folder.
+
+    Returns:
+    DashboardBundle: A bundle consistent with the current source files.
+    """
+    manifest = read_manifest(path)
+    sources = source_hashes(known=None if manifest is None else manifest["sources"])
+    if manifest is None or not same_sources(manifest["sources"], sources):
+        build_bundle(path, sources)
+    return DashboardBundle.open(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_dashboard_data(signature: Signature) -> DashboardData:
+    # The signature is only used as the cache key; max_entries=1 evicts the stale bundle after a reload
+    bundle = ensure_bundle()
+    tracts = bundle.tracts()
+    shapes = bundle.shapes()
+
+    # The shapes cover every tract, so the layer needs no geometry
+    risk = RiskLayer(tracts, shapes=shapes)
+    risk.prewarm()
+
+    return DashboardData(
+        tracts=tracts,
+        shapes=shapes,
+        monitors=bundle.monitors(),
+        risk=risk,
+        surface=bundle.surface(),
+        rollup=bundle.rollup(),
+        sensor_weights=bundle.sensor_weights,
+        map_center=bundle.map_center,
+        signature=signature,
+        bundle=bundle,
+    )
+
+
+def get_dashboard_data() -> DashboardData:
+    """
+    Return the shared data bundle, reloading it only if a source file changed on disk.
+
+    Returns:
+    DashboardData: The bundle for the current versions of the source files.
+    """
+    return _load_dashboard_data(source_signature())
+
+
+@st.cache_resource(show_spinner=False, max_entries=RANGE_CACHE_SIZE)
+def _range_risk(_data: DashboardData, signature: Signature, start: date, end: date) -> RiskLayer:
+    # The bundle is not hashed; its signature keys the cache, so layers of a stale bundle are never reused
+    table = window_table(_data.rollup, custom_windows([(start, end)]), _data.sensor_weights)
+    combined_aqi = table["combined_aqi"].droplevel("window")
+
+    # Same normalization as load_tracts, over the AQIs of the chosen days
+    tracts = _data.tracts.assign(combined_aqi=_data.tracts["geoid"].map(combined_aqi))
+    tracts["air_norm"] = tracts["combined_aqi"] / tracts["combined_aqi"].max()
+    return RiskLayer(tracts.dropna(subset=["air_norm"]).reset_index(drop=True), shapes=_data.shapes)
+
+
+def range_risk(data: DashboardData, start: date, end: date) -> RiskLayer:
+    """
+    Return the composite risk layer with air quality computed from the readings of a date range.
+
+    Parameters:
+    data (DashboardData): The shared bundle; its `rollup` must not be None.
+    start (date): First day of the range.
+    end (date): Last day of the range (inclusive).
+
+    Returns:
+    RiskLayer: Risk layer over the tracts with readings in the range (and the neighbor fill-in tracts).
+    """
+    return _range_risk(data, data.signature, start, end)
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_air_quality() -> Optional[LiveAirQuality]:
+    """
+    Return the live PurpleAir service shared by every session, starting it on first use.
+
+    The service polls the tracts' area with the key in the `PURPLE_AIR_API_KEY` environment variable, against
+    `PURPLE_AIR_BASE_URL` if set (e.g. a local fake server).
+
+    Returns:
+    Optional[LiveAirQuality]: The running service, or None if no API key is configured.
+    """
+    if not os.getenv("PURPLE_AIR_API_KEY"):
+        return None
+
+    data = get_dashboard_data()
+    api = PurpleAirAPI(base_url=os.getenv("PURPLE_AIR_BASE_URL", DEFAULT_BASE_URL))
+    tracts = data.tract_geometries
+    live = LiveAirQuality(api, padded_bounds(tracts.total_bounds), tracts=tracts)
+    live.start()
+    return live
@@ -0,0 +1,405 @@
+"""
+Address Geocoding
+
+Resolves the dashboard's address searches through a persistent cache in front of Nominatim, with an optional offline
+geocoder over local address points.
+
+It provides:
+- Address normalization, so spelling variants of the same address (case, punctuation, "Street" vs "St") share a key.
+- A SQLite geocode cache shared by every dashboard process and kept across restarts. Addresses that were not found are
+  remembered for a day, so repeated searches for them do not reach Nominatim either.
+- An offline geocoder over an address point file for South San Francisco and San Bruno, which answers searches with no
+  network access (and makes local load tests possible).
+- Lookups of the city variants of a search in order of preference, so Nominatim is asked about a city only after the
+  preferred ones missed.
+- Batch geocoding that answers everything it can from the address points and the cache in bulk, and sends the rest to
+  Nominatim from parallel workers.
+- Spacing of Nominatim requests to respect its rate limit, kept in the cache database so every process sharing it
+  takes turns.
+
+A search is answered from the address points first, then from the cache, and only then from Nominatim. Set the
+environment variable `GEOCODER_OFFLINE=1` to never call Nominatim.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+import streamlit as st
+from geopy.geocoders import Nominatim
+
+# Default cache and address point paths (relative to the repository root)
+CACHE_PATH = "data/geocode_cache.sqlite"
+ADDRESS_POINTS_PATH = "data/address_points.csv"
+
+# Cities a search is tried in, in order of preference, and their state
+CITIES = ("South San Francisco", "San Bruno")
+STATE = "CA"
+
+# How long an address that was not found stays cached, in seconds
+NOT_FOUND_TTL = 24 * 60 * 60
+
+# Nominatim settings; its usage policy allows one request per second
+USER_AGENT = "rise-south-city"
+TIMEOUT = 5
+NOMINATIM_INTERVAL = 1.0
+
+# Parallel workers for batch geocoding
+GEOCODE_WORKERS = 8
+
+# Keys per cache query, below SQLite's limit on query parameters
+CACHE_QUERY_SIZE = 500
+
+# Spelled-out words mapped to the abbreviations used in keys
+ABBREVIATIONS: Dict[str, str] = {
+    "street": "st", "avenue": "ave", "boulevard": "blvd", "drive": "dr", "road": "rd", "lane": "ln",
+    "court": "ct", "place": "pl", "circle": "cir", "terrace": "ter", "highway": "hwy", "parkway": "pkwy",
+    "square": "sq", "north": "n", "south": "s", "east": "e", "west": "w", "california": "ca",
+}
+
+
+def normalize_address(address: str) -> str:
+    """
+    Reduce an address to the key it is cached and indexed under.
+
+    Parameters:
+    address (str): Free-form address, e.g. "123 Main Street, South San Francisco".
+
+    Returns:
+    str: Lowercase words without punctuation, with common street words abbreviated, e.g. "123 main st s san francisco".
+    """
+    return " ".join(ABBREVIATIONS.get(word, word) for word in re.findall(r"[a-z0-9]+", address.lower()))
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    """
+    Location of an address.
+
+    Attributes:
+    latitude (float): Latitude in degrees.
+    longitude (float): Longitude in degrees.
+    address (str): Address as the geocoder returned it.
+    source (str): "nominatim" or "address_points".
+    """
+    latitude: float
+    longitude: float
+    address: str
+    source: str
+
+
+class GeocodeCache:
+    """
+    Geocode results stored in SQLite, safe to share between threads and processes.
+
+    Every call opens its own connection, and the database runs in WAL mode so readers never wait for a writer.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, not_found_ttl: float = NOT_FOUND_TTL):
+        """
+        Open the cache, creating the database if needed.
+
+        Parameters:
+        path (str): Database path.
+        not_found_ttl (float): Seconds an address that was not found stays cached.
+        """
+        self.path = path
+        self.not_found_ttl = not_found_ttl
+
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                "key TEXT PRIMARY KEY, latitude REAL, longitude REAL, address TEXT, source TEXT, stored REAL NOT NULL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS throttle (service TEXT PRIMARY KEY, next REAL NOT NULL)")
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, keys: Sequence[str]) -> Dict[str, Optional[GeocodeResult]]:
+        """
+        Look up cached results.
+
+        Parameters:
+        keys (Sequence[str]): Normalized addresses.
+
+        Returns:
+        Dict[str, Optional[GeocodeResult]]: Result per cached key, None for addresses cached as not found. Keys that
+            are not cached (or whose not-found entry expired) are left out.
+        """
+        keys = list(keys)
+        rows = []
+        with self._connection() as connection:
+            for start in range(0, len(keys), CACHE_QUERY_SIZE):
+                chunk = keys[start:start + CACHE_QUERY_SIZE]
+                rows += connection.execute(
+                    f"SELECT key, latitude, longitude, address, source, stored FROM geocodes "
+                    f"WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+
+        expired = time.time() - self.not_found_ttl
+        return {
+            key: GeocodeResult(latitude, longitude, address, source) if latitude is not None else None
+            for key, latitude, longitude, address, source, stored in rows
+            if latitude is not None or stored >= expired
+        }
+
+    def put(self, results: Dict[str, Optional[GeocodeResult]]):
+        """
+        Store results, replacing earlier entries for the same keys.
+
+        Parameters:
+        results (Dict[str, Optional[GeocodeResult]]): Result per normalized address, None if it was not found.
+        """
+        now = time.time()
+        rows = [
+            (key, None, None, None, None, now) if result is None else
+            (key, result.latitude, result.longitude, result.address, result.source, now)
+            for key, result in results.items()
+        ]
+        with self._connection() as connection:
+            connection.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def reserve_request(self, interval: float, service: str = "nominatim") -> float:
+        """
+        Reserve the next request slot of a rate-limited service, shared by every process using this database.
+
+        Parameters:
+        interval (float): Minimum seconds between the starts of two requests.
+        service (str): Name of the service the slots are counted for.
+
+        Returns:
+        float: Seconds to wait before sending the request.
+        """
+        with self._connection() as connection:
+            # Takes the write lock before reading, so two processes cannot reserve the same slot
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT next FROM throttle WHERE service = ?", (service,)).fetchone()
+            now = time.time()
+            start = now if row is None else max(now, row[0])
+            connection.execute("INSERT OR REPLACE INTO throttle VALUES (?, ?)", (service, start + interval))
+        return start - now
+
+
+class OfflineGeocoder:
+    """
+    Exact-match geocoder over local address points.
+    """
+
+    def __init__(self, points: pd.DataFrame):
+        """
+        Index address points by normalized address.
+
+        Parameters:
+        points (pd.DataFrame): Address points with `address` (e.g. "123 Main St"), `city`, `latitude` and `longitude`
+            columns.
+        """
+        labels = points["address"].astype(str) + ", " + points["city"].astype(str)
+        self.points: Dict[str, GeocodeResult] = {
+            normalize_address(label): GeocodeResult(float(latitude), float(longitude), label, "address_points")
+            for label, latitude, longitude in zip(labels, points["latitude"], points["longitude"])
+        }
+
+    @classmethod
+    def from_file(cls, path: str = ADDRESS_POINTS_PATH) -> "OfflineGeocoder":
+        """
+        Load address points from a CSV file.
+
+        Parameters:
+        path (str): CSV with `address`, `city`, `latitude` and `longitude` columns.
+
+        Returns:
+        OfflineGeocoder: Geocoder over the points.
+        """
+        return cls(pd.read_csv(path, usecols=["address", "city", "latitude", "longitude"]))
+
+    def lookup(self, key: str) -> Optional[GeocodeResult]:
+        """
+        Find a normalized address.
+
+        Parameters:
+        key (str): Normalized address, including the city.
+
+        Returns:
+        Optional[GeocodeResult]: The address point, or None if there is none with this address.
+        """
+        return self.points.get(key)
+
+
+class Geocoder:
+    """
+    Geocodes searches in the dashboard's cities through the address points, the cache and Nominatim, in that order.
+    """
+
+    def __init__(self, cache: Optional[GeocodeCache] = None, local: Optional[OfflineGeocoder] = None,
+                 offline: bool = False, cities: Sequence[str] = CITIES, timeout: float = TIMEOUT,
+                 min_interval: float = 0.0):
+        """
+        Set up the geocoder.
+
+        Parameters:
+        cache (Optional[GeocodeCache]): Persistent cache for Nominatim results, or None to not cache them.
+        local (Optional[OfflineGeocoder]): Local address points, or None.
+        offline (bool): Never call Nominatim; addresses missing from the address points and the cache are not found.
+        cities (Sequence[str]): Cities a search is tried in, in order of preference.
+        timeout (float): Nominatim request timeout in seconds.
+        min_interval (float): Minimum seconds between the starts of two Nominatim requests, e.g. `NOMINATIM_INTERVAL`
+            for anything using the public Nominatim service. With a cache, the spacing holds across every process
+            sharing it; without one, across the threads of this geocoder. 0 sends requests as they come.
+        """
+        self.cache = cache
+        self.local = local
+        self.cities = tuple(cities)
+        self.nominatim = None if offline else Nominatim(user_agent=USER_AGENT, timeout=timeout)
+        self.min_interval = min_interval
+
+        # Time before which the next request must not start, shared by all threads when there is no cache
+        self._throttle = threading.Lock()
+        self._next_request = 0.0
+
+    def _wait_turn(self):
+        if self.cache is not None:
+            time.sleep(self.cache.reserve_request(self.min_interval))
+            return
+        with self._throttle:
+            now = time.monotonic()
+            if self._next_request > now:
+                time.sleep(self._next_request - now)
+                now = self._next_request
+            self._next_request = now + self.min_interval
+
+    def _query(self, query: str) -> Optional[GeocodeResult]:
+        if self.min_interval > 0:
+            self._wait_turn()
+        location = self.nominatim.geocode(query)
+        if location is None:
+            return None
+        return GeocodeResult(location.latitude, location.longitude, location.address, "nominatim")
+
+    def _queries(self, search: str) -> Dict[str, str]:
+        # Nominatim query per city, keyed by normalized address
+        return {normalize_address(f"{search}, {city}"): f"{search}, {city}, {STATE}" for city in self.cities}
+
+    def _known(self, keys: Sequence[str]) -> Dict[str, Optional[GeocodeResult]]:
+        # Results available without Nominatim: address points first, then the cache
+        known: Dict[str, Optional[GeocodeResult]] = {}
+        if self.local is not None:
+            known.update((key, result) for key in keys if (result := self.local.lookup(key)) is not None)
+        if self.cache is not None:
+            known.update(self.cache.get([key for key in keys if key not in known]))
+        return known
+
+    def geocode(self, search: str) -> Optional[GeocodeResult]:
+        """
+        Geocode an address search.
+
+        The cities are tried in order, and Nominatim is asked about a city only if the address was not already found
+        in a preferred one, so a search sends as few requests as possible.
+
+        Parameters:
+        search (str): Address as typed, e.g. "123 Main St".
+
+        Returns:
+        Optional[GeocodeResult]: Location of the address in the first city (in the order of `cities`) where it was
+            found, or None if it was found in none of them.
+
+        Raises:
+        geopy.exc.GeopyError: If Nominatim failed for a city and the address was not found in any other.
+        """
+        queries = self._queries(search)
+        known = self._known(list(queries))
+
+        errors = []
+        for key, query in queries.items():
+            if key not in known and self.nominatim is not None:
+                try:
+                    known[key] = self._query(query)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if self.cache is not None:
+                    self.cache.put({key: known[key]})
+            if known.get(key) is not None:
+                return known[key]
+
+        if errors:
+            raise errors[0]
+        return None
+
+    def geocode_many(self, searches: Sequence[str], workers: int = GEOCODE_WORKERS
+                     ) -> Tuple[Dict[str, Optional[GeocodeResult]], Dict[str, Exception]]:
+        """
+        Geocode many address searches, as `geocode` would one by one.
+
+        Searches whose result is settled by the address points and the cache are answered in bulk; the others are
+        geocoded by parallel workers.
+
+        Parameters:
+        searches (Sequence[str]): Addresses as typed; duplicates are geocoded once.
+        workers (int): Number of parallel workers for the searches that need Nominatim.
+
+        Returns:
+        Tuple[Dict[str, Optional[GeocodeResult]], Dict[str, Exception]]: Result per search (None if not found), and the
+            error per search that failed.
+        """
+        queries = {search: list(self._queries(search)) for search in dict.fromkeys(searches)}
+        known = self._known([key for keys in queries.values() for key in keys])
+
+        results: Dict[str, Optional[GeocodeResult]] = {}
+        pending = []
+        for search, keys in queries.items():
+            # Settled once a city is found with every preferred city known not to have it, or all are known missing
+            for key in keys:
+                if key not in known:
+                    if self.nominatim is None:
+                        continue
+                    pending.append(search)
+                    break
+                if known[key] is not None:
+                    results[search] = known[key]
+                    break
+            else:
+                results[search] = None
+
+        errors: Dict[str, Exception] = {}
+        if pending:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {search: pool.submit(self.geocode, search) for search in pending}
+            for search, future in futures.items():
+                try:
+                    results[search] = future.result()
+                except Exception as e:
+                    errors[search] = e
+
+        return results, errors
+
+
+@st.cache_resource(show_spinner=False)
+def get_geocoder() -> Geocoder:
+    """
+    Return the dashboard's geocoder, shared by every session.
+
+    The address points are used when `data/address_points.csv` exists, and Nominatim is skipped when the
+    `GEOCODER_OFFLINE` environment variable is set to anything but "" or "0". Nominatim requests from every session and
+    every process sharing the cache are spaced `NOMINATIM_INTERVAL` apart, as its usage policy requires.
+
+    Returns:
+    Geocoder: Geocoder with the persistent cache.
+    """
+    local = OfflineGeocoder.from_file(ADDRESS_POINTS_PATH) if os.path.exists(ADDRESS_POINTS_PATH) else None
+    offline = os.getenv("GEOCODER_OFFLINE", "") not in ("", "0")
+    return Geocoder(GeocodeCache(CACHE_PATH), local, offline=offline, min_interval=NOMINATIM_INTERVAL)
@@ -0,0 +1,232 @@
+"""
+Map Layers
+
+Builds Folium layers for the dashboard map from precomputed data.
+
+It provides:
+- Vectorized step colormap lookups, as RGBA arrays or hex strings.
+- The predictability surface as a heatmap image.
+- All monitors as one GeoJSON layer with data-driven styling, clustered client-side at low zoom levels.
+- Live NowCast AQI of PurpleAir sensors and tracts, in the EPA category colors.
+"""
+
+from typing import Dict
+
+import branca.colormap as cm
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import MarkerCluster
+from folium.utilities import JsCode
+
+from predictability.surface import PredictabilitySurface
+
+# Zoom level from which monitors are always drawn individually (address search results zoom to 14)
+CLUSTER_UNTIL_ZOOM = 14
+
+# Monitor marker style shared by every monitor; only the color varies
+MONITOR_MARKER = {"radius": 5, "fill": True, "fill_opacity": 0.7}
+
+# EPA AQI categories: Good, Moderate, Unhealthy for Sensitive Groups, Unhealthy, Very Unhealthy, Hazardous
+AQI_COLORMAP = cm.StepColormap(["#00e400", "#ffff00", "#ff7e00", "#ff0000", "#8f3f97", "#7e0023"],
+                               index=[0, 51, 101, 151, 201, 301, 501], vmin=0, vmax=500)
+
+# Live sensor marker style; only the color varies
+LIVE_MARKER = {"radius": 6, "fill": True, "fill_opacity": 0.9, "weight": 1}
+
+
+def _step_positions(values: np.ndarray, colormap: cm.StepColormap) -> np.ndarray:
+    # Index of the color step each value falls in, as in StepColormap.rgba_floats_tuple
+    index = np.asarray(colormap.index, dtype=float)
+    return np.clip(np.searchsorted(index, values, side="right") - 1, 0, len(colormap.colors) - 1)
+
+
+def step_colors(values: np.ndarray, colormap: cm.StepColormap) -> np.ndarray:
+    """
+    Color many values at once with a step colormap, matching `colormap(value)` for each of them.
+
+    Parameters:
+    values (np.ndarray): Values to color; NaN values become transparent.
+    colormap (cm.StepColormap): Colormap to apply.
+
+    Returns:
+    np.ndarray: RGBA floats between 0 and 1, with one extra trailing dimension of size 4.
+    """
+    rgba = np.asarray(colormap.colors, dtype=float)[_step_positions(values, colormap)]
+    rgba[np.isnan(values)] = 0
+    return rgba
+
+
+def step_hex_colors(values: np.ndarray, colormap: cm.StepColormap) -> np.ndarray:
+    """
+    Color many values at once with a step colormap, as the "#RRGGBBAA" strings `colormap(value)` returns.
+
+    Parameters:
+    values (np.ndarray): Values to color; NaN values become transparent.
+    colormap (cm.StepColormap): Colormap to apply.
+
+    Returns:
+    np.ndarray: One hex color string per value.
+    """
+    palette = np.array([colormap.rgba_hex_str(bound) for bound in colormap.index[:-1]] + ["#00000000"])
+    positions = _step_positions(values, colormap)
+    positions[np.isnan(values)] = len(palette) - 1
+    return palette[positions]
+
+
+def predictability_overlay(surface: PredictabilitySurface, colormap: cm.StepColormap, name: str,
+                           opacity: float = 0.5) -> folium.raster_layers.ImageOverlay:
+    """
+    Draw the predictability surface as a semi-transparent heatmap image.
+
+    Parameters:
+    surface (PredictabilitySurface): Precomputed predictability grid.
+    colormap (cm.StepColormap): Colormap used for the monitor markers, so both share one legend.
+    name (str): Layer name shown in layer controls.
+    opacity (float): Opacity of the image.
+
+    Returns:
+    folium.raster_layers.ImageOverlay: The overlay, with each pixel centered on its grid node.
+    """
+    (south, west), (north, east) = surface.bounds
+    half = surface.step / 2
+
+    return folium.raster_layers.ImageOverlay(
+        image=step_colors(surface.values, colormap),
+        bounds=[[south - half, west - half], [north + half, east + half]],
+        origin="lower",
+        opacity=opacity,
+        name=name
+    )
+
+
+def monitor_features(monitors: pd.DataFrame, colormap: cm.StepColormap, predictability_label: str,
+                     consistency_label: str) -> Dict:
+    """
+    Build one GeoJSON point feature per monitor, with its marker color and tooltip precomputed.
+
+    Parameters:
+    monitors (pd.DataFrame): Monitors with `location_id`, coordinates, `predictability` and `consistency`.
+    colormap (cm.StepColormap): Colormap for the predictability score.
+    predictability_label (str): Tooltip label of the predictability score.
+    consistency_label (str): Tooltip label of the consistency score.
+
+    Returns:
+    Dict: A GeoJSON FeatureCollection, Clarity monitors (text ids) first and PurpleAir monitors (numeric ids) after.
+    """
+    purpleair = monitors["location_id"].astype(str).str.isnumeric().to_numpy()
+    order = np.argsort(purpleair, kind="stable")
+    monitors = monitors.iloc[order]
+    network = pd.Series(np.where(purpleair[order], "PurpleAir", "Clarity"))
+
+    # Scores are rounded like Python's round(), then shown as whole percentages
+    predictability = np.round(monitors["predictability"].to_numpy(dtype=float))
+    consistency = pd.Series(np.round(monitors["consistency"].to_numpy(dtype=float)))
+    consistency_text = (consistency.astype("Int64").astype(str) + "%").where(consistency.notna(), "N/A")
+
+    tooltips = (network + f" Monitor<br>{predictability_label}: "
+                + pd.Series(predictability).astype("Int64").astype(str) + f"%<br>{consistency_label}: "
+                + consistency_text)
+    colors = step_hex_colors(predictability, colormap)
+
+    rows = zip(monitors["latitude"].tolist(), monitors["longitude"].tolist(), colors.tolist(), tooltips.tolist())
+    features = [
+        {
+            "type": "Feature",
+            "id": i,
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {"color": color, "tooltip": tooltip},
+        }
+        for i, (lat, lon, color, tooltip) in enumerate(rows)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def monitor_layer(monitors: pd.DataFrame, colormap: cm.StepColormap, name: str, predictability_label: str,
+                  consistency_label: str) -> MarkerCluster:
+    """
+    Draw all monitors as one GeoJSON layer of circle markers, clustered below `CLUSTER_UNTIL_ZOOM`.
+
+    Parameters:
+    monitors (pd.DataFrame): Monitors with `location_id`, coordinates, `predictability` and `consistency`.
+    colormap (cm.StepColormap): Colormap for the predictability score, shared with the legend.
+    name (str): Layer name shown in layer controls.
+    predictability_label (str): Tooltip label of the predictability score.
+    consistency_label (str): Tooltip label of the consistency score.
+
+    Returns:
+    MarkerCluster: The cluster group holding the monitor layer.
+    """
+    cluster = MarkerCluster(name=name, options={"disableClusteringAtZoom": CLUSTER_UNTIL_ZOOM})
+
+    folium.GeoJson(
+        monitor_features(monitors, colormap, predictability_label, consistency_label),
+        marker=folium.CircleMarker(**MONITOR_MARKER),
+        style_function=lambda feature: {"color": feature["properties"]["color"],
+                                        "fillColor": feature["properties"]["color"]},
+        # Tooltips are bound to each marker rather than the layer, so they keep working inside clusters
+        on_each_feature=JsCode("function(feature, layer) { layer.bindTooltip(feature.properties.tooltip); }"),
+    ).add_to(cluster)
+    return cluster
+
+
+def live_layer(sensors: pd.DataFrame, tract_aqi: pd.DataFrame, shapes: Dict[str, Dict], name: str,
+               aqi_label: str, sensors_label: str) -> folium.FeatureGroup:
+    """
+    Draw the live NowCast AQI of the tracts and of the sensors, colored by AQI category.
+
+    Parameters:
+    sensors (pd.DataFrame): Live sensors with coordinates and `aqi` (see `LiveAirQuality.sensors`).
+    tract_aqi (pd.DataFrame): `geoid`, `aqi` and `sensors` per tract (see `LiveAirQuality.tract_aqi`).
+    shapes (Dict[str, Dict]): GeoJSON geometry per tract id.
+    name (str): Layer name shown in layer controls.
+    aqi_label (str): Tooltip label of the AQI.
+    sensors_label (str): Tooltip label of a tract's number of sensors.
+
+    Returns:
+    folium.FeatureGroup: Group with the tract layer under the sensor layer.
+    """
+    group = folium.FeatureGroup(name=name)
+
+    tract_aqi = tract_aqi[tract_aqi["geoid"].isin(shapes)]
+    tract_colors = step_hex_colors(tract_aqi["aqi"].to_numpy(dtype=float), AQI_COLORMAP)
+    tracts = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": shapes[geoid],
+                "properties": {"color": color, "tooltip": f"{aqi_label}: {aqi:.0f}<br>{sensors_label}: {count}"},
+            }
+            for geoid, aqi, count, color in zip(tract_aqi["geoid"], tract_aqi["aqi"], tract_aqi["sensors"],
+                                                tract_colors.tolist())
+        ],
+    }
+    folium.GeoJson(
+        tracts,
+        style_function=lambda feature: {"fillColor": feature["properties"]["color"], "color": "#555555",
+                                        "weight": 0.5, "fillOpacity": 0.5},
+        on_each_feature=JsCode("function(feature, layer) { layer.bindTooltip(feature.properties.tooltip); }"),
+    ).add_to(group)
+
+    sensors = sensors.dropna(subset=["aqi", "latitude", "longitude"])
+    sensor_colors = step_hex_colors(sensors["aqi"].to_numpy(dtype=float), AQI_COLORMAP)
+    points = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"color": color, "tooltip": f"PurpleAir {sensor}<br>{aqi_label}: {aqi:.0f}"},
+            }
+            for sensor, lat, lon, aqi, color in zip(sensors["sensor_index"], sensors["latitude"],
+                                                    sensors["longitude"], sensors["aqi"], sensor_colors.tolist())
+        ],
+    }
+    folium.GeoJson(
+        points,
+        marker=folium.CircleMarker(**LIVE_MARKER),
+        style_function=lambda feature: {"color": "#333333", "fillColor": feature["properties"]["color"]},
+        on_each_feature=JsCode("function(feature, layer) { layer.bindTooltip(feature.properties.tooltip); }"),
+    ).add_to(group)
+    return group
@@ -0,0 +1,138 @@
+"""
+Composite Risk Layer
+
+Builds the GeoJSON payload for the composite risk choropleth.
+
+It provides:
+- Tract geometry converted to GeoJSON once, shared by every payload, using simplified display shapes when given (with
+  shapes for every tract, no geometry is needed at all).
+- The composite risk score for a given air quality weight as one vectorized operation.
+- A bounded LRU cache of payloads keyed by air quality weight, prewarmed with the preset balances.
+- Payload features carrying only the tract id and the rounded score; colors are derived from the score when styling.
+
+Moving the balance slider therefore only recomputes a vector of scores instead of merging and re-serialising tract polygons.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import branca.colormap as cm
+import numpy as np
+import pandas as pd
+from shapely.geometry import mapping
+
+# Air quality weights (%) for the Even, More Air, and More Health balances
+PRESET_AIR_WEIGHTS = (50, 70, 30)
+
+# Default air quality weight (%) of the custom balance slider
+DEFAULT_AIR_WEIGHT = 50
+
+# Number of weight settings kept in the payload cache (the slider has 101 positions)
+PAYLOAD_CACHE_SIZE = 32
+
+# Continuous color scale for the composite risk score
+RISK_COLORMAP = cm.linear.YlOrRd_09.scale(0, 1)
+
+# Decimals of the risk score sent to the map (the tooltip shows at most three)
+RISK_DECIMALS = 3
+
+
+def composite_risk(air_norm, health_norm, air_weight: int):
+    """
+    Combine normalized air quality and health risk into the composite risk score.
+
+    Parameters:
+    air_norm (array-like): Normalized air quality score (0-1).
+    health_norm (array-like): Health Risk Index (0-1).
+    air_weight (int): Weight of air quality in percent; health risk gets the remainder.
+
+    Returns:
+    array-like: Composite risk score, with the shape of the inputs.
+    """
+    air_frac = air_weight / 100
+    health_frac = (100 - air_weight) / 100
+    return air_frac * air_norm + health_frac * health_norm
+
+
+class RiskLayer:
+    def __init__(self, tracts: pd.DataFrame, cache_size: int = PAYLOAD_CACHE_SIZE,
+                 shapes: Optional[Dict[str, Dict]] = None) -> None:
+        """
+        Initialize the RiskLayer class.
+
+        Parameters:
+        tracts (pd.DataFrame): Tracts with `geoid`, `air_norm` and `health_norm`, without missing scores; a
+            GeoDataFrame with their geometry unless `shapes` covers every tract.
+        cache_size (int): Maximum number of weight settings whose payloads are kept in memory.
+        shapes (Optional[Dict[str, Dict]]): Simplified GeoJSON geometry per tract id to draw instead of the full
+            geometry (see `preprocessing/tract_shapes.py`); tracts without one are drawn in full.
+        """
+        self.geoids: List[str] = tracts["geoid"].tolist()
+        self.air_norm: np.ndarray = tracts["air_norm"].to_numpy(dtype=float)
+        self.health_norm: np.ndarray = tracts["health_norm"].to_numpy(dtype=float)
+
+        # Convert geometry to GeoJSON once; every cached payload references these same objects
+        shapes = shapes or {}
+        if all(geoid in shapes for geoid in self.geoids):
+            self.geometries: List[Dict] = [shapes[geoid] for geoid in self.geoids]
+        else:
+            self.geometries = [
+                shapes[geoid] if geoid in shapes else mapping(geom)
+                for geoid, geom in zip(self.geoids, tracts.geometry.to_crs("EPSG:4326"))
+            ]
+
+        # GeoJSON FeatureCollection per air quality weight; returned dicts are shared and must not be modified
+        self.payload = lru_cache(maxsize=cache_size)(self._build_payload)
+
+    def risk_index(self, air_weight: int) -> np.ndarray:
+        """
+        Compute the composite risk score of every tract.
+
+        Parameters:
+        air_weight (int): Weight of air quality in percent; health risk gets the remainder.
+
+        Returns:
+        np.ndarray: Composite risk score per tract, in the order of `geoids`.
+        """
+        return composite_risk(self.air_norm, self.health_norm, air_weight)
+
+    def _build_payload(self, air_weight: int) -> Dict:
+        risk = np.round(self.risk_index(air_weight), RISK_DECIMALS)
+
+        features = [
+            {
+                "type": "Feature",
+                "properties": {"geoid": geoid, "risk_index": r},
+                "geometry": geometry,
+            }
+            for geoid, r, geometry in zip(self.geoids, risk.tolist(), self.geometries)
+        ]
+        return {"type": "FeatureCollection", "features": features}
+
+    def prewarm(self, air_weights=PRESET_AIR_WEIGHTS + (DEFAULT_AIR_WEIGHT,)) -> None:
+        """
+        Build and cache the payloads of the given weight settings.
+
+        Parameters:
+        air_weights (Iterable[int]): Air quality weights to prepare, defaulting to the preset balances.
+        """
+        for air_weight in air_weights:
+            self.payload(air_weight)
+
+
+def style_function(feature: Dict) -> Dict:
+    """
+    Style a tract by coloring its risk score.
+
+    Parameters:
+    feature (Dict): A GeoJSON feature produced by `RiskLayer.payload`.
+
+    Returns:
+    Dict: Leaflet path options for the feature.
+    """
+    return {
+        "fillOpacity": 0.8,
+        "weight": 0.5,
+        "color": "black",
+        "fillColor": RISK_COLORMAP(feature["properties"]["risk_index"])
+    }
@@ -0,0 +1,208 @@
+"""
+Batch Address Scoring
+
+Scores many addresses or coordinates at once with the dashboard's data: census tract, composite risk score, nearest
+monitors and predicted predictability.
+
+It provides:
+- Batched geocoding through the dashboard's geocoder (address points, then the SQLite cache, then parallel Nominatim
+  workers).
+- A vectorized point-in-tract join against the census tracts through a spatial index.
+- One nearest-monitor query and one predictability model call per batch.
+- Streaming scoring of CSV files in fixed-size batches, so memory stays flat however many rows the file has.
+
+The single-address search on the dashboard and this module give the same results, except that the predicted
+predictability comes straight from the model instead of the precomputed surface.
+"""
+
+import os
+import pickle
+from typing import Dict, Iterator, Optional
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from sklearn.ensemble import RandomForestRegressor
+
+from dashboard.data import SOURCES, load_tracts
+from dashboard.geocode import GEOCODE_WORKERS, Geocoder
+from dashboard.risk import DEFAULT_AIR_WEIGHT, composite_risk
+from predictability.neighbors import N_NEIGHBORS, MonitorIndex, feature_table
+
+# Census tracts points are matched against (relative to the repository root)
+CENSUS_PATH = "data/census.geojson"
+
+# Rows scored together when streaming a CSV
+BATCH_SIZE = 10_000
+
+# Columns added to every scored row, in output order
+SCORE_COLUMNS = [
+    "latitude", "longitude", "matched_address", "location_source", "geoid", "risk_index",
+    "nearest_monitor", "nearest_monitor_miles", "nearest_monitors", "predicted_predictability",
+]
+
+
+class AddressScorer:
+    def __init__(self, census: gpd.GeoDataFrame, risk_tracts: pd.DataFrame, monitors: pd.DataFrame,
+                 model: RandomForestRegressor, geocoder: Optional[Geocoder] = None,
+                 air_weight: int = DEFAULT_AIR_WEIGHT) -> None:
+        """
+        Initialize the AddressScorer class.
+
+        Parameters:
+        census (gpd.GeoDataFrame): Census tracts with a `geoid` column, which points are matched against.
+        risk_tracts (pd.DataFrame): Tracts with `geoid`, `air_norm` and `health_norm` (see `dashboard.data.load_tracts`).
+        monitors (pd.DataFrame): Monitors with `location_name`, coordinates, `predictability` and `consistency`.
+        model (RandomForestRegressor): Model predicting predictability from the nearest monitors.
+        geocoder (Optional[Geocoder]): Geocoder for rows given by address; None scores coordinates only.
+        air_weight (int): Weight of air quality in the composite risk score, in percent.
+        """
+        census = census.to_crs("EPSG:4326")
+        self.geoids: np.ndarray = census["geoid"].astype(str).to_numpy()
+        self._tracts = shapely.STRtree(census.geometry.values)
+
+        self.risk: Dict[str, float] = dict(zip(
+            risk_tracts["geoid"].astype(str),
+            composite_risk(risk_tracts["air_norm"].to_numpy(dtype=float),
+                           risk_tracts["health_norm"].to_numpy(dtype=float), air_weight)
+        ))
+
+        self.monitors = monitors
+        self.monitor_names: np.ndarray = monitors["location_name"].astype(str).to_numpy()
+        self.monitor_index = MonitorIndex(monitors["latitude"], monitors["longitude"])
+        self.model = model
+        self.geocoder = geocoder
+
+    @classmethod
+    def from_files(cls, root: str = ".", geocoder: Optional[Geocoder] = None, air_weight: int = DEFAULT_AIR_WEIGHT,
+                   census_path: str = CENSUS_PATH) -> "AddressScorer":
+        """
+        Load the scorer from the dashboard's source files.
+
+        Parameters:
+        root (str): Repository root the source paths are relative to.
+        geocoder (Optional[Geocoder]): Geocoder for rows given by address.
+        air_weight (int): Weight of air quality in the composite risk score, in percent.
+        census_path (str): Census tracts, relative to `root`.
+
+        Returns:
+        AddressScorer: Scorer over the current source files.
+        """
+        census = gpd.read_file(os.path.join(root, census_path))
+        risk_tracts = load_tracts(os.path.join(root, SOURCES["tracts"]), os.path.join(root, SOURCES["health_risk"]))
+        monitors = pd.read_csv(os.path.join(root, SOURCES["monitors"]))
+        with open(os.path.join(root, SOURCES["model"]), "rb") as f:
+            model = pickle.load(f)
+        return cls(census, risk_tracts, monitors, model, geocoder=geocoder, air_weight=air_weight)
+
+    def containing_tracts(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Find the census tract containing each point.
+
+        Parameters:
+        latitudes (array-like): Latitudes in degrees.
+        longitudes (array-like): Longitudes in degrees.
+
+        Returns:
+        np.ndarray: Tract id per point (the first tract for points on a shared edge), None outside every tract.
+        """
+        points = shapely.points(np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float))
+        point_rows, tract_rows = self._tracts.query(points, predicate="within")
+
+        geoids = np.full(len(points), None, dtype=object)
+        first = np.unique(point_rows, return_index=True)[1]
+        geoids[point_rows[first]] = self.geoids[tract_rows[first]]
+        return geoids
+
+    def score_points(self, latitudes, longitudes) -> pd.DataFrame:
+        """
+        Score locations given by coordinates.
+
+        Parameters:
+        latitudes (array-like): Latitudes in degrees; NaN rows are left unscored.
+        longitudes (array-like): Longitudes in degrees.
+
+        Returns:
+        pd.DataFrame: `geoid`, `risk_index`, `nearest_monitor`, `nearest_monitor_miles`, `nearest_monitors` (the
+            monitors the prediction uses, nearest first, separated by ";") and `predicted_predictability` per location.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        located = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+
+        scores = pd.DataFrame(index=range(len(latitudes)), columns=SCORE_COLUMNS[4:], dtype=object)
+        if len(located):
+            geoids = self.containing_tracts(latitudes[located], longitudes[located])
+            scores.loc[located, "geoid"] = geoids
+            scores.loc[located, "risk_index"] = [self.risk.get(geoid, np.nan) for geoid in geoids]
+
+            # One nearest-monitor query and one model call for the whole batch
+            distances, positions = self.monitor_index.query(latitudes[located], longitudes[located], k=N_NEIGHBORS)
+            names = self.monitor_names[positions]
+            scores.loc[located, "nearest_monitor"] = names[:, 0]
+            scores.loc[located, "nearest_monitor_miles"] = distances[:, 0].round(3)
+            scores.loc[located, "nearest_monitors"] = [";".join(row) for row in names]
+            scores.loc[located, "predicted_predictability"] = self.model.predict(
+                feature_table(self.monitors, distances, positions)
+            ).round(2)
+
+        return scores.astype({"risk_index": float, "nearest_monitor_miles": float, "predicted_predictability": float})
+
+    def score(self, rows: pd.DataFrame, address_column: str = "address",
+              workers: int = GEOCODE_WORKERS) -> pd.DataFrame:
+        """
+        Score rows given by address, by coordinates, or both.
+
+        Rows with `latitude` and `longitude` are scored at those coordinates; the others are geocoded from
+        `address_column` first.
+
+        Parameters:
+        rows (pd.DataFrame): Rows with an address column, `latitude` / `longitude` columns, or both.
+        address_column (str): Column holding the addresses.
+        workers (int): Parallel workers for the addresses that need Nominatim.
+
+        Returns:
+        pd.DataFrame: The rows with the `SCORE_COLUMNS` added (replacing any columns of the same names).
+            `location_source` is "input", the geocoder that found the address, "not_found" or "error: <message>".
+        """
+        n = len(rows)
+        latitudes = rows["latitude"].to_numpy(dtype=float, copy=True) if "latitude" in rows else np.full(n, np.nan)
+        longitudes = rows["longitude"].to_numpy(dtype=float, copy=True) if "longitude" in rows else np.full(n, np.nan)
+        matched = np.full(n, None, dtype=object)
+        sources = np.where(np.isfinite(latitudes) & np.isfinite(longitudes), "input", None).astype(object)
+
+        if address_column in rows and self.geocoder is not None:
+            addresses = rows[address_column].astype("string")
+            pending = np.flatnonzero(pd.isna(sources) & addresses.notna().to_numpy())
+            results, errors = self.geocoder.geocode_many(addresses.iloc[pending].tolist(), workers=workers)
+
+            for row, address in zip(pending, addresses.iloc[pending]):
+                result = results.get(address)
+                if result is not None:
+                    latitudes[row], longitudes[row] = result.latitude, result.longitude
+                    matched[row], sources[row] = result.address, result.source
+                else:
+                    sources[row] = f"error: {errors[address]}" if address in errors else "not_found"
+
+        scored = rows.drop(columns=[column for column in SCORE_COLUMNS if column in rows]).reset_index(drop=True)
+        located = pd.DataFrame({"latitude": latitudes, "longitude": longitudes, "matched_address": matched,
+                                "location_source": sources})
+        return pd.concat([scored, located, self.score_points(latitudes, longitudes)], axis=1)
+
+    def score_csv(self, path: str, address_column: str = "address", batch_size: int = BATCH_SIZE,
+                  workers: int = GEOCODE_WORKERS) -> Iterator[pd.DataFrame]:
+        """
+        Score a CSV file batch by batch.
+
+        Parameters:
+        path (str): CSV with an address column, `latitude` / `longitude` columns, or both.
+        address_column (str): Column holding the addresses.
+        batch_size (int): Rows read and scored at a time.
+        workers (int): Parallel workers for the addresses that need Nominatim.
+
+        Returns:
+        Iterator[pd.DataFrame]: The scored rows of each batch, in file order.
+        """
+        for batch in pd.read_csv(path, chunksize=batch_size, dtype={address_column: "string"}):
+            yield self.score(batch, address_column=address_column, workers=workers)
@@ -0,0 +1,99 @@
+"""
+File Fingerprints
+
+Helpers to tell when input files have changed, so derived data (caches, models, rasters) is rebuilt only when needed.
+`ContentHashes` reuses the hash recorded for a file whose modification time and size are unchanged, so unchanged files
+are not read again.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+
+    Parameters:
+    path (str): Path of the file to hash.
+    chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+    str: Hexadecimal digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_hashes(paths: Iterable[str]) -> Dict[str, str]:
+    """
+    Hash several files.
+
+    Parameters:
+    paths (Iterable[str]): Paths of the files to hash.
+
+    Returns:
+    Dict[str, str]: Hexadecimal digest of each file, keyed by path.
+    """
+    return {path: file_hash(path) for path in paths}
+
+
+class ContentHashes:
+    def __init__(self, root: Path, known: Optional[Dict[str, List]] = None):
+        """
+        Initialize the ContentHashes class.
+
+        Parameters:
+        root (Path): Directory the paths are relative to.
+        known (Optional[Dict[str, List]]): [mtime_ns, size, hash] of files hashed on earlier runs, keyed by path.
+        """
+        self.root = root
+        self.known: Dict[str, List] = dict(known or {})
+
+    def file(self, path: str) -> str:
+        """
+        Hash a file, reusing the hash of an earlier run if its modification time and size are unchanged.
+
+        Parameters:
+        path (str): File path relative to the root.
+
+        Returns:
+        str: Hexadecimal SHA-256 digest of the file.
+        """
+        stat = os.stat(self.root / path)
+        known = self.known.get(path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+
+        digest = file_hash(str(self.root / path))
+        self.known[path] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+    def path(self, path: str) -> str:
+        """
+        Hash a file, or a folder from the names and hashes of the files under it.
+
+        Parameters:
+        path (str): File or folder path relative to the root.
+
+        Returns:
+        str: Hexadecimal SHA-256 digest.
+        """
+        if not (self.root / path).is_dir():
+            return self.file(path)
+
+        digest = hashlib.sha256()
+        for directory, folders, files in os.walk(self.root / path):
+            folders.sort()
+            for name in sorted(files):
+                # Partially written files are replaced atomically and never read
+                if name.endswith(".tmp"):
+                    continue
+                relative = os.path.relpath(os.path.join(directory, name), self.root)
+                digest.update(f"{os.path.relpath(relative, path)}\0{self.file(relative)}\n".encode())
+        return digest.hexdigest()
@@ -0,0 +1,44 @@
+"""
+Health Risk Index Build
+
+This script writes the Health Risk Index of every tract from the health indicators, replacing the last cells of
+`health.ipynb`.
+
+It performs the following steps:
+- Loads the indicators from `data/all_indicators.csv`.
+- Fills missing indicator values with indicator means, or with the cached iterative imputer fit (`--fill iterative`).
+- Computes the Respiratory Risk Index with the notebook's weights, or with weights from a JSON file (`--weights`).
+- Saves the Health Risk Index per tract to `data/health_risk_index.csv`, which the dashboard reads.
+
+Example:
+    python code/health/build_health_risk_index.py --weights weights.json
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from health.hri import (FILL_METHODS, HRI_PATH, IMPUTED_PATH, INDICATORS_PATH, RRI_WEIGHTS,  # noqa: E402
+                        HealthRiskIndex, load_weights)
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+parser = argparse.ArgumentParser(description="Compute the Health Risk Index of every tract.")
+parser.add_argument("--indicators", default=str(ROOT / INDICATORS_PATH), help="Indicator CSV")
+parser.add_argument("--output", default=str(ROOT / HRI_PATH), help="Destination CSV")
+parser.add_argument("--fill", choices=FILL_METHODS, default="mean", help="How missing indicator values are filled")
+parser.add_argument("--weights", help="JSON object of RRI weight per indicator (default: the notebook's weights)")
+args = parser.parse_args()
+
+weights = load_weights(args.weights) if args.weights else RRI_WEIGHTS
+index = HealthRiskIndex.from_file(args.indicators, fill=args.fill, imputed_path=str(ROOT / IMPUTED_PATH))
+hri = index.table(weights)
+
+temporary = f"{args.output}.tmp"
+hri.to_csv(temporary)
+os.replace(temporary, args.output)
+print(f"✅ Saved the Health Risk Index of {hri['Health Risk Index'].notna().sum()} tracts to {args.output}")
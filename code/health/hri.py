@@ -0,0 +1,232 @@
+"""
+Health Risk Index
+
+Computes the Health Risk Index (HRI) of each tract from the health indicators (`data/all_indicators.csv`), as
+`health.ipynb` does, fast enough to recompute for other indicator weightings on demand.
+
+It provides:
+- The notebook's Respiratory Risk Index (RRI) weights as the default configuration, replaceable by any mapping of
+  indicator to weight.
+- The indicators held as one matrix whose missing values are filled once, either with indicator means (as in the
+  notebook) or with an iterative imputer whose fit is cached next to the data.
+- The RRI of every tract as a single matrix-vector product over the weighted indicators.
+- The HRI as the harmonic mean of the Health Equity Index and the RRI, each normalized by its maximum.
+
+With the indicators loaded, a new weighting costs a few microseconds instead of a rerun of the notebook.
+"""
+
+import json
+import os
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from fingerprint import file_hash
+
+# Default source and artifact paths (relative to the repository root)
+INDICATORS_PATH = "data/all_indicators.csv"
+HRI_PATH = "data/health_risk_index.csv"
+IMPUTED_PATH = "data/imputed_indicators.npz"
+
+# Weight of each indicator in the Respiratory Risk Index, as chosen in health.ipynb
+RRI_WEIGHTS: Dict[str, float] = {
+    "Asthma": 0.8,
+    "Adults who are Sedentary": 0.5,
+    "Cardiovascular Disease": 0.2,
+    "Tox. Release": 0.05,
+    "Lead": 0.05,
+    "Housing Burden": 0.03,
+    "Pollution Burden": 0.01,
+    "Pesticides": 0.01,
+}
+
+# Indicator combined with the RRI into the HRI
+EQUITY_INDICATOR = "Health Equity Index"
+
+# Ways of filling missing indicator values
+FILL_METHODS = ("mean", "iterative")
+
+# Iterative imputer settings, as in health.ipynb
+IMPUTER_SEED = 100
+IMPUTER_MAX_ITER = 10
+
+
+def impute_indicators(values: np.ndarray) -> np.ndarray:
+    """
+    Fill missing indicator values by modelling each indicator from the others.
+
+    Parameters:
+    values (np.ndarray): Indicators of shape (tracts, indicators), with NaN for missing values.
+
+    Returns:
+    np.ndarray: The indicators with every missing value filled; indicators missing everywhere are filled with 0.
+    """
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+
+    imputer = IterativeImputer(random_state=IMPUTER_SEED, max_iter=IMPUTER_MAX_ITER, keep_empty_features=True)
+    return imputer.fit_transform(values)
+
+
+def ensure_imputed(indicators: pd.DataFrame, indicators_path: str = INDICATORS_PATH,
+                   path: str = IMPUTED_PATH) -> np.ndarray:
+    """
+    Load the imputed indicators, refitting the imputer and saving its output first if the indicator file changed.
+
+    Parameters:
+    indicators (pd.DataFrame): The indicators read from `indicators_path`.
+    indicators_path (str): Path of the indicator CSV, whose hash keys the cache.
+    path (str): Path of the NPZ cache.
+
+    Returns:
+    np.ndarray: Imputed values of the numeric indicators, in the column order of `indicator_columns`.
+    """
+    columns = indicator_columns(indicators)
+    source = file_hash(indicators_path)
+
+    if os.path.exists(path):
+        with np.load(path) as artifact:
+            if str(artifact["source"]) == source and artifact["columns"].tolist() == columns:
+                return artifact["values"]
+
+    values = impute_indicators(indicators[columns].to_numpy(dtype=float))
+    np.savez(path, values=values, columns=np.array(columns), source=np.array(source))
+    return values
+
+
+def indicator_columns(indicators: pd.DataFrame) -> List[str]:
+    """
+    List the numeric indicator columns, leaving out the tract number.
+
+    Parameters:
+    indicators (pd.DataFrame): Indicators with a `tract` column.
+
+    Returns:
+    List[str]: Names of the numeric indicators, in table order.
+    """
+    return [column for column in indicators.select_dtypes("number").columns if column != "tract"]
+
+
+class HealthRiskIndex:
+    def __init__(self, indicators: pd.DataFrame, fill: str = "mean", imputed: Optional[np.ndarray] = None) -> None:
+        """
+        Initialize the HealthRiskIndex class.
+
+        Parameters:
+        indicators (pd.DataFrame): Indicators per tract with a `tract` column (see `health_preproc.ipynb`).
+        fill (str): "mean" to fill missing values with the indicator mean, as the notebook does, or "iterative" to use
+            the iterative imputer.
+        imputed (Optional[np.ndarray]): Already imputed values (see `ensure_imputed`), used when `fill` is "iterative";
+            the imputer is fitted here when missing.
+        """
+        if fill not in FILL_METHODS:
+            raise ValueError(f"Invalid fill method. Must be one of the following: {', '.join(FILL_METHODS)}")
+
+        self.tracts: pd.Series = indicators["tract"].reset_index(drop=True)
+        self.columns: List[str] = indicator_columns(indicators)
+        self.positions: Dict[str, int] = {column: i for i, column in enumerate(self.columns)}
+
+        values = indicators[self.columns].to_numpy(dtype=float)
+        if fill == "iterative":
+            self.values: np.ndarray = impute_indicators(values) if imputed is None else np.asarray(imputed, dtype=float)
+        else:
+            self.values = np.where(np.isnan(values), indicators[self.columns].mean().to_numpy(dtype=float), values)
+
+        # The equity side of the HRI does not depend on the weights; it is left unfilled, as in the notebook
+        equity = indicators[EQUITY_INDICATOR].to_numpy(dtype=float)
+        self.equity_norm: np.ndarray = equity / np.nanmax(equity)
+
+    @classmethod
+    def from_file(cls, path: str = INDICATORS_PATH, fill: str = "mean",
+                  imputed_path: str = IMPUTED_PATH) -> "HealthRiskIndex":
+        """
+        Load the indicators from their CSV, using the cached imputer fit when `fill` is "iterative".
+
+        Parameters:
+        path (str): Path of the indicator CSV.
+        fill (str): "mean" or "iterative" (see `__init__`).
+        imputed_path (str): Path of the imputed indicator cache.
+
+        Returns:
+        HealthRiskIndex: The index over the indicators in `path`.
+        """
+        indicators = pd.read_csv(path)
+        imputed = ensure_imputed(indicators, path, imputed_path) if fill == "iterative" else None
+        return cls(indicators, fill=fill, imputed=imputed)
+
+    def weight_vector(self, weights: Mapping[str, float] = RRI_WEIGHTS) -> np.ndarray:
+        """
+        Spread indicator weights over the indicator columns.
+
+        Parameters:
+        weights (Mapping[str, float]): Weight per indicator name; unlisted indicators get no weight.
+
+        Returns:
+        np.ndarray: Weight per indicator column.
+        """
+        unknown = [indicator for indicator in weights if indicator not in self.positions]
+        if unknown:
+            raise ValueError(f"Unknown indicators: {', '.join(unknown)}")
+
+        vector = np.zeros(len(self.columns))
+        for indicator, weight in weights.items():
+            vector[self.positions[indicator]] = weight
+        return vector
+
+    def rri(self, weights: Mapping[str, float] = RRI_WEIGHTS) -> np.ndarray:
+        """
+        Compute the Respiratory Risk Index of every tract.
+
+        Parameters:
+        weights (Mapping[str, float]): Weight per indicator.
+
+        Returns:
+        np.ndarray: Weighted sum of the filled indicators per tract.
+        """
+        # Only the listed indicators are read, as in the notebook; an unlisted indicator missing everywhere is NaN
+        # after the mean fill and would turn every sum into NaN even with a weight of 0
+        vector = self.weight_vector(weights)
+        used = [self.positions[indicator] for indicator in weights]
+        return self.values[:, used] @ vector[used]
+
+    def hri(self, weights: Mapping[str, float] = RRI_WEIGHTS) -> np.ndarray:
+        """
+        Compute the Health Risk Index of every tract.
+
+        Parameters:
+        weights (Mapping[str, float]): Weight per indicator in the RRI.
+
+        Returns:
+        np.ndarray: Harmonic mean of the normalized Health Equity Index and RRI per tract, NaN where the Health Equity
+            Index is missing.
+        """
+        rri = self.rri(weights)
+        rri_norm = rri / rri.max()
+        return 2 * self.equity_norm * rri_norm / (self.equity_norm + rri_norm)
+
+    def table(self, weights: Mapping[str, float] = RRI_WEIGHTS) -> pd.DataFrame:
+        """
+        Tabulate the Health Risk Index in the layout of `data/health_risk_index.csv`.
+
+        Parameters:
+        weights (Mapping[str, float]): Weight per indicator in the RRI.
+
+        Returns:
+        pd.DataFrame: `Health Risk Index` indexed by `tract`.
+        """
+        return pd.DataFrame({"tract": self.tracts, "Health Risk Index": self.hri(weights)}).set_index("tract")
+
+
+def load_weights(path: str) -> Dict[str, float]:
+    """
+    Read RRI weights from a JSON object of indicator names to weights.
+
+    Parameters:
+    path (str): Path of the JSON file.
+
+    Returns:
+    Dict[str, float]: Weight per indicator.
+    """
+    with open(path) as f:
+        return {indicator: float(weight) for indicator, weight in json.load(f).items()}
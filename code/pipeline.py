@@ -0,0 +1,538 @@
+"""
+Data Pipeline
+
+Rebuilds the data files the dashboard reads from the raw exports, running the processing scripts as a graph of stages
+instead of by hand in an undocumented order.
+
+It provides:
+- `STAGES`, every processing script with the files and folders it reads and writes (relative to the repository root).
+  The order of the stages follows from those paths, so a stage runs after every stage writing one of its inputs.
+- Content-hash caching: a stage is rerun only when the hash of its script, the repository modules the script imports
+  (found by parsing the imports, directly or through other modules), its arguments or one of its inputs changed since
+  it last succeeded, or when one of its outputs is missing. A change to one raw file reruns only the stages downstream
+  of it, and a rerun stage whose outputs come out unchanged does not rerun the stages after it.
+- Parallel runs of independent stages (e.g. the air quality and health branches), each in its own Python process.
+- A report of the wall time and cache status of every stage.
+
+Hashes are kept in `data/pipeline_state.json`, along with the modification time and size of every hashed file so
+unchanged files are not read again. Stages run from the repository root; a stage whose inputs are missing fails, and
+the stages depending on it are skipped.
+
+Some raw inputs are not in the repository (`EXTERNAL_INPUTS` says where to get each one). A stage missing one of them is
+reported as unavailable rather than failed, and the stages after it use the committed copies of its outputs, so the
+remaining branches still run and the dashboard bundle is still built. Optional inputs (`Stage.optional`) may be missing
+altogether; the script then runs without them.
+
+Example:
+    python code/pipeline.py
+    python code/pipeline.py --only build_health_risk_index --force
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fingerprint import ContentHashes
+
+# Repository root; stage paths are relative to it and stages run from it
+ROOT = Path(__file__).resolve().parents[1]
+
+# Stage hashes of the last successful runs
+STATE_PATH = "data/pipeline_state.json"
+
+# Folder the scripts' package imports resolve against (the scripts add it to sys.path)
+CODE_DIR = "code"
+
+# Stages run at the same time (each in its own process)
+STAGE_WORKERS = 4
+
+# Lines of a failed stage's output shown in the report
+ERROR_LINES = 10
+
+STORE_CLARITY = "data/sensor_store/source=clarity"
+STORE_PURPLEAIR = "data/sensor_store/source=purpleair"
+STORE_API_PURPLEAIR = "data/sensor_store/source=api_purpleair"
+
+# Raw inputs that are not in the repository, and where to get them (see also data/README.md)
+EXTERNAL_INPUTS: Dict[str, str] = {
+    "data/purpleair_additional_data.csv": "PurpleAir API history of the sensors missing from the ASDS exports, e.g. "
+                                          "from PurpleAirAPI.get_sensor_history (optional)",
+    "data/calenviroscreen40resultsdatadictionary_F_2021.xlsx": "CalEnviroScreen 4.0 results from OEHHA, "
+                                                               "https://oehha.ca.gov/calenviroscreen/report/"
+                                                               "calenviroscreen-40",
+    "data/census.geojson": "census tracts of South San Francisco and San Bruno from the TIGER/Line shapefiles, "
+                           "https://www.census.gov/geographies/mapping-files/time-series/geo/tiger-line-file.html, as "
+                           "GeoJSON with the `geoid` values of data/tracts_with_combined_aqi.csv",
+}
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One processing script and the files it reads and writes.
+
+    Attributes:
+    name (str): Stage name.
+    script (str): Script path, relative to the repository root.
+    inputs (Tuple[str, ...]): Data files and folders the stage reads. The repository modules the script imports are
+        found by `script_modules` and need not be listed.
+    outputs (Tuple[str, ...]): Files and folders the stage writes. A path may be both an input and an output of a
+        stage that updates a file in place.
+    args (Tuple[str, ...]): Command line arguments of the script.
+    optional (Tuple[str, ...]): Inputs the script runs without when they do not exist.
+    """
+    name: str
+    script: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    args: Tuple[str, ...] = ()
+    optional: Tuple[str, ...] = ()
+
+
+STAGES: List[Stage] = [
+    Stage("clean_clarity", "code/preprocessing/clean_clarity.py",
+          inputs=("data/risesouthcity_april_hourly.csv",),
+          outputs=(STORE_CLARITY,)),
+    Stage("clean_purpleair", "code/preprocessing/clean_purpleair.py",
+          inputs=("data/Hourly ASDS 2018-2023 for South San Francisco San Bruno.csv",
+                  "data/Daily ASDS 2018-2023 for South San Francisco San Bruno.csv",
+                  "data/purpleair_additional_data.csv"),
+          outputs=(STORE_PURPLEAIR,), args=("--stream",), optional=("data/purpleair_additional_data.csv",)),
+    Stage("import_api_purpleair", "code/preprocessing/sensor_store.py",
+          inputs=("data/clean_api_purpleair.csv",),
+          outputs=(STORE_API_PURPLEAIR,), args=("data/clean_api_purpleair.csv", "api_purpleair")),
+    Stage("calculate_sensor_weights", "code/air_quality/calculate_sensor_weights.py",
+          inputs=(STORE_CLARITY, STORE_API_PURPLEAIR),
+          outputs=("data/sensor_weights.json",)),
+    Stage("combine_air_quality_data", "code/air_quality/combine_air_quality_data.py",
+          inputs=(STORE_CLARITY, STORE_API_PURPLEAIR, "data/census.geojson", "data/sensor_weights.json"),
+          outputs=("data/tracts_with_combined_aqi.geojson", "data/tracts_with_combined_aqi.csv")),
+    Stage("build_tract_rollup", "code/air_quality/build_tract_rollup.py",
+          inputs=(STORE_CLARITY, STORE_API_PURPLEAIR, "data/census.geojson"),
+          outputs=("data/tract_rollup.npz",)),
+    Stage("build_all_indicators", "code/preprocessing/build_all_indicators.py",
+          inputs=("data/smc_indicators", "data/calenviroscreen40resultsdatadictionary_F_2021.xlsx"),
+          outputs=("data/all_indicators.csv",),
+          args=("--calenviroscreen", "data/calenviroscreen40resultsdatadictionary_F_2021.xlsx")),
+    Stage("build_health_risk_index", "code/health/build_health_risk_index.py",
+          inputs=("data/all_indicators.csv",),
+          outputs=("data/health_risk_index.csv",)),
+    Stage("score_consistency", "code/predictability/score_consistency.py",
+          inputs=("data/combined_scores.csv", STORE_CLARITY, STORE_API_PURPLEAIR),
+          outputs=("data/combined_scores.csv",), optional=("data/combined_scores.csv",)),
+    Stage("score_predictability", "code/predictability/score_predictability.py",
+          inputs=("data/combined_scores.csv", STORE_CLARITY, STORE_API_PURPLEAIR),
+          outputs=("data/combined_scores.csv",)),
+    Stage("train_pred_model", "code/predictability/train_pred_model.py",
+          inputs=("data/combined_scores.csv",),
+          outputs=("data/rf_predictability_model.pkl",)),
+    Stage("build_dashboard_bundle", "code/dashboard/build_bundle.py",
+          inputs=("data/tracts_with_combined_aqi.geojson", "data/health_risk_index.csv", "data/combined_scores.csv",
+                  "data/rf_predictability_model.pkl", "data/tract_rollup.npz", "data/sensor_weights.json"),
+          outputs=("data/dashboard_bundle",), optional=("data/tract_rollup.npz", "data/sensor_weights.json")),
+]
+
+
+@dataclass
+class StageResult:
+    """
+    Outcome of one stage in a pipeline run.
+
+    Attributes:
+    name (str): Stage name.
+    status (str): "ran", "cached", "stale" (dry run), "unavailable" (an external input is missing), "failed" or
+        "skipped".
+    seconds (float): Wall time, including hashing.
+    message (str): Why the stage failed or was skipped.
+    """
+    name: str
+    status: str
+    seconds: float = 0.0
+    message: str = ""
+
+
+def _imported_names(path: Path) -> List[str]:
+    # Dotted names a module may import; for `from a import b`, both `a` and `a.b` (b may be a submodule)
+    names = []
+    for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"), filename=str(path))):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+            names.extend(f"{node.module}.{alias.name}" for alias in node.names)
+    return names
+
+
+def script_modules(script: str, root: Path = ROOT) -> List[str]:
+    """
+    Find the repository modules a script imports, directly or through other repository modules.
+
+    Imports are resolved as the script runs them: against the script's folder, then against `CODE_DIR`. Names that
+    resolve to neither (the standard library and installed packages) are left out.
+
+    Parameters:
+    script (str): Script path, relative to the root.
+    root (Path): Repository root.
+
+    Returns:
+    List[str]: Paths of the imported modules relative to the root, sorted, without the script itself.
+    """
+    bases = [(root / script).parent, root / CODE_DIR]
+    found: Set[Path] = set()
+    pending = [root / script]
+    while pending:
+        for name in _imported_names(pending.pop()):
+            parts = name.split(".")
+            for base in bases:
+                candidates = [base.joinpath(*parts).with_suffix(".py"), base.joinpath(*parts, "__init__.py")]
+                module = next((candidate for candidate in candidates if candidate.is_file()), None)
+                if module is not None:
+                    if module not in found:
+                        found.add(module)
+                        pending.append(module)
+                    break
+    found.discard(root / script)
+    return sorted(module.relative_to(root).as_posix() for module in found)
+
+
+def stage_dependencies(stages: Sequence[Stage]) -> Dict[str, Set[str]]:
+    """
+    Find the stages each stage waits for: every other stage writing one of its inputs. For a file the stage updates in
+    place, only the stages listed before it count, so stages updating the same file run in the listed order.
+
+    Parameters:
+    stages (Sequence[Stage]): Stages of the pipeline.
+
+    Returns:
+    Dict[str, Set[str]]: Names of the upstream stages of each stage.
+    """
+    writers: Dict[str, List[int]] = {}
+    for position, stage in enumerate(stages):
+        for output in stage.outputs:
+            writers.setdefault(output, []).append(position)
+
+    return {stage.name: {stages[writer].name for path in stage.inputs for writer in writers.get(path, [])
+                         if writer != position and (path not in stage.outputs or writer < position)}
+            for position, stage in enumerate(stages)}
+
+
+def stage_order(stages: Sequence[Stage]) -> List[str]:
+    """
+    Sort the stages so that every stage comes after its upstream stages, keeping the listed order otherwise.
+
+    Parameters:
+    stages (Sequence[Stage]): Stages of the pipeline.
+
+    Returns:
+    List[str]: Stage names in run order.
+    """
+    dependencies = stage_dependencies(stages)
+    order: List[str] = []
+    remaining = [stage.name for stage in stages]
+    while remaining:
+        ready = [name for name in remaining if dependencies[name] <= set(order)]
+        if not ready:
+            raise ValueError(f"Stages {', '.join(remaining)} depend on each other in a cycle.")
+        order.append(ready[0])
+        remaining.remove(ready[0])
+    return order
+
+
+def upstream_stages(stages: Sequence[Stage], names: Iterable[str]) -> Set[str]:
+    """
+    Select stages along with every stage they depend on, directly or not.
+
+    Parameters:
+    stages (Sequence[Stage]): Stages of the pipeline.
+    names (Iterable[str]): Names of the selected stages.
+
+    Returns:
+    Set[str]: The selected stages and their upstream stages.
+    """
+    dependencies = stage_dependencies(stages)
+    unknown = set(names) - set(dependencies)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}.")
+
+    selected: Set[str] = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies[name])
+    return selected
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], root: Path = ROOT, state_path: Optional[Path] = None,
+                 external: Optional[Dict[str, str]] = None):
+        """
+        Initialize the Pipeline class.
+
+        Parameters:
+        stages (Sequence[Stage]): Stages of the pipeline.
+        root (Path): Repository root.
+        state_path (Optional[Path]): JSON file of the stage hashes of the last successful runs; defaults to
+            `STATE_PATH` under the root.
+        external (Optional[Dict[str, str]]): Inputs that are not in the repository, with where to get them; defaults
+            to `EXTERNAL_INPUTS`.
+        """
+        self.stages = stages
+        self.root = root
+        self.external = EXTERNAL_INPUTS if external is None else external
+        self.state_path = state_path or root / STATE_PATH
+        self.by_name = {stage.name: stage for stage in stages}
+        self.dependencies = stage_dependencies(stages)
+        self.outputs = {path for stage in stages for path in stage.outputs}
+
+        # Per stage, the hash of what it was last run on, the hashes of the outputs it wrote and of the files it updated
+        # in place as it found them
+        self.recorded: Dict[str, Dict] = {}
+        known = None
+        if self.state_path.exists():
+            with open(self.state_path) as f:
+                state = json.load(f)
+            self.recorded, known = state["stages"], state["files"]
+        self.hashes = ContentHashes(root, known)
+
+    def save(self) -> None:
+        """
+        Write the stage hashes and the file hash cache to the state file.
+        """
+        # Stage threads add entries while this runs; copying a dict is atomic, iterating over it is not
+        state = {"stages": dict(self.recorded), "files": dict(self.hashes.known)}
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.state_path)
+
+    def stage_inputs(self, stage: Stage) -> Dict:
+        """
+        Identify everything a stage's outputs depend on: its script, the modules it imports, arguments and inputs.
+
+        An input the stage also writes is identified by the hashes its upstream stages recorded for it, since its
+        current content includes the stage's own last write. Without upstream stages, it is identified by its content,
+        unless that is what a stage of the pipeline last wrote, in which case the content the stage found before its own
+        last run is kept. A missing optional input is identified as None.
+
+        Parameters:
+        stage (Stage): Stage to identify.
+
+        Returns:
+        Dict: The script hash, the hash of each imported module, the arguments and the hash of each input.
+        """
+        parts = {"script": self.hashes.file(stage.script), "args": list(stage.args), "inputs": {},
+                 "modules": {path: self.hashes.file(path) for path in script_modules(stage.script, self.root)}}
+        for path in stage.inputs:
+            upstream = sorted(name for name in self.dependencies[stage.name] if path in self.by_name[name].outputs)
+            if path in stage.outputs and upstream:
+                parts["inputs"][path] = [self.recorded.get(name, {}).get("outputs", {}).get(path) for name in upstream]
+            elif not (self.root / path).exists():
+                parts["inputs"][path] = None
+            else:
+                digest = self.hashes.path(path)
+                written = {recorded.get("outputs", {}).get(path) for recorded in self.recorded.values()}
+                if path in stage.outputs and digest in written:
+                    digest = self.recorded.get(stage.name, {}).get("sources", {}).get(path, digest)
+                parts["inputs"][path] = digest
+        return parts
+
+    def stage_key(self, stage: Stage, inputs: Optional[Dict] = None) -> str:
+        """
+        Hash everything a stage's outputs depend on: its script, the modules it imports, arguments and inputs.
+
+        Parameters:
+        stage (Stage): Stage to hash.
+        inputs (Optional[Dict]): Output of `stage_inputs` for the stage, computed if None.
+
+        Returns:
+        str: Hexadecimal SHA-256 digest.
+        """
+        inputs = self.stage_inputs(stage) if inputs is None else inputs
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def is_current(self, stage: Stage, key: str) -> bool:
+        """
+        Check whether a stage's outputs were written from the same script, arguments and inputs and still exist.
+
+        Parameters:
+        stage (Stage): Stage to check.
+        key (str): Output of `stage_key`.
+
+        Returns:
+        bool: True if the stage can be skipped.
+        """
+        recorded = self.recorded.get(stage.name, {})
+        return recorded.get("key") == key and all((self.root / path).exists() for path in stage.outputs)
+
+    def missing_inputs(self, stage: Stage) -> List[str]:
+        """
+        List the script and required inputs of a stage that do not exist.
+
+        Parameters:
+        stage (Stage): Stage to check.
+
+        Returns:
+        List[str]: Missing paths.
+        """
+        return [path for path in (stage.script,) + stage.inputs
+                if path not in stage.optional and not (self.root / path).exists()]
+
+    def missing_result(self, stage: Stage, missing: Sequence[str], seconds: float = 0.0) -> StageResult:
+        """
+        Report a stage that cannot run because of missing files.
+
+        Parameters:
+        stage (Stage): Stage that cannot run.
+        missing (Sequence[str]): Missing paths, from `missing_inputs`.
+        seconds (float): Wall time spent on the stage.
+
+        Returns:
+        StageResult: "unavailable" with where to get each file if every missing path is an external input, "failed"
+        otherwise.
+        """
+        if all(path in self.external for path in missing):
+            message = "\n".join(f"missing {path}: {self.external[path]}" for path in missing)
+            return StageResult(stage.name, "unavailable", seconds, message)
+        return StageResult(stage.name, "failed", seconds, f"missing {', '.join(missing)}")
+
+    def run_stage(self, stage: Stage, force: bool = False, dry_run: bool = False,
+                  verbose: bool = False) -> StageResult:
+        """
+        Run one stage unless its outputs are current.
+
+        Parameters:
+        stage (Stage): Stage to run.
+        force (bool): Run the stage even if its outputs are current.
+        dry_run (bool): Report whether the stage would run without running it.
+        verbose (bool): Print the script's output.
+
+        Returns:
+        StageResult: What happened to the stage.
+        """
+        start = time.perf_counter()
+        missing = self.missing_inputs(stage)
+        if missing:
+            return self.missing_result(stage, missing, time.perf_counter() - start)
+
+        inputs = self.stage_inputs(stage)
+        key = self.stage_key(stage, inputs)
+        if not force and self.is_current(stage, key):
+            return StageResult(stage.name, "cached", time.perf_counter() - start)
+        if dry_run:
+            return StageResult(stage.name, "stale", time.perf_counter() - start)
+
+        process = subprocess.run([sys.executable, str(self.root / stage.script), *stage.args], cwd=self.root,
+                                 capture_output=True, text=True)
+        if verbose:
+            print(process.stdout + process.stderr, end="")
+        if process.returncode != 0:
+            # A failed stage may have written part of its outputs, so it must run again next time
+            self.recorded.pop(stage.name, None)
+            lines = (process.stderr or process.stdout).strip().splitlines()[-ERROR_LINES:]
+            return StageResult(stage.name, "failed", time.perf_counter() - start, "\n".join(lines))
+
+        outputs = {path: self.hashes.path(path) for path in stage.outputs if (self.root / path).exists()}
+        sources = {path: inputs["inputs"][path] for path in stage.inputs if path in stage.outputs}
+        self.recorded[stage.name] = {"key": key, "outputs": outputs, "sources": sources}
+        return StageResult(stage.name, "ran", time.perf_counter() - start)
+
+    def run(self, names: Optional[Iterable[str]] = None, force: bool = False, dry_run: bool = False,
+            workers: int = STAGE_WORKERS, verbose: bool = False) -> List[StageResult]:
+        """
+        Run the stages in dependency order, running independent stages at the same time.
+
+        Parameters:
+        names (Optional[Iterable[str]]): Stages to bring up to date, with their upstream stages; None for all stages.
+        force (bool): Rerun the named stages (all stages if `names` is None) even if they are current.
+        dry_run (bool): Report which stages would run without running them. Stages downstream of one that would run
+            are reported as stale.
+        workers (int): Stages run at the same time.
+        verbose (bool): Print the scripts' output.
+
+        Returns:
+        List[StageResult]: One result per selected stage, in the order they finished.
+        """
+        named = set(names) if names is not None else set(self.by_name)
+        selected = upstream_stages(self.stages, named)
+        pending = [name for name in stage_order(self.stages) if name in selected]
+        results: Dict[str, StageResult] = {}
+
+        def report(result: StageResult) -> None:
+            results[result.name] = result
+            print(f"  {result.status:<11} {result.name:<26} {result.seconds:7.2f}s")
+            if result.message:
+                print("\n".join(f"              {line}" for line in result.message.splitlines()))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while pending or running:
+                for name in list(pending):
+                    upstream = self.dependencies[name] & selected
+                    if not upstream <= set(results):
+                        continue
+                    pending.remove(name)
+
+                    stage = self.by_name[name]
+                    blocked = sorted(u for u in upstream if results[u].status in ("failed", "skipped"))
+
+                    # Outputs of unavailable stages are used as committed, when they are
+                    unavailable = {u for u in upstream if results[u].status == "unavailable"}
+                    needed = {path: sorted(u for u in unavailable if path in self.by_name[u].outputs)
+                              for path in self.missing_inputs(stage)}
+                    needed = {path: builders for path, builders in needed.items() if builders}
+                    if blocked:
+                        report(StageResult(name, "skipped", message=f"needs {', '.join(blocked)}"))
+                    elif needed:
+                        report(StageResult(name, "unavailable", message="\n".join(
+                            f"needs {path} from {', '.join(builders)}" for path, builders in needed.items())))
+                    elif dry_run and any(results[u].status == "stale" for u in upstream):
+                        # Outputs of stale stages may not exist yet, but files no stage writes must
+                        missing = [path for path in self.missing_inputs(stage) if path not in self.outputs]
+                        report(self.missing_result(stage, missing) if missing else StageResult(name, "stale"))
+                    else:
+                        running[pool.submit(self.run_stage, stage, force and name in named, dry_run, verbose)] = name
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    del running[future]
+                    report(future.result())
+                if not dry_run:
+                    self.save()
+
+        return [results[name] for name in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the dashboard's data files, rerunning only stale stages.")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", choices=[stage.name for stage in STAGES],
+                        help="Stages to bring up to date, along with the stages they depend on")
+    parser.add_argument("--force", action="store_true",
+                        help="Rerun the --only stages (every stage without --only) even if they are up to date")
+    parser.add_argument("--dry-run", action="store_true", help="List the stages that would run")
+    parser.add_argument("--workers", type=int, default=STAGE_WORKERS, help="Stages run at the same time")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of every script")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = Pipeline(STAGES).run(args.only, force=args.force, dry_run=args.dry_run, workers=args.workers,
+                                   verbose=args.verbose)
+
+    counts = {status: sum(result.status == status for result in results)
+              for status in ("ran", "cached", "stale", "unavailable", "failed", "skipped")}
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items() if count)
+    failed = counts["failed"] + counts["skipped"]
+    print(f"{'❌' if failed else '✅'} {len(results)} stages ({summary}) in {time.perf_counter() - start:.2f}s")
+    sys.exit(1 if failed else 0)
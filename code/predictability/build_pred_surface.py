@@ -0,0 +1,31 @@
+"""
+Predictability Surface Build
+
+This script precomputes the predictability model over a grid covering South San Francisco and San Bruno.
+
+It performs the following steps:
+- Loads the trained model, the monitor scores, and the census tract extent.
+- Evaluates the model at every grid node in vectorized batches.
+- Saves the grid with its georeferencing and the hashes of its inputs.
+
+The dashboard reads the result for instant address scoring and its predictability overlay. It also rebuilds the grid on its own when the model or monitor scores change, so this script is only needed to prepare it ahead of time.
+"""
+
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from predictability.surface import MODEL_PATH, MONITORS_PATH, SURFACE_PATH, ensure_surface, padded_bounds  # noqa: E402
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+tracts = gpd.read_file(ROOT / "data" / "tracts_with_combined_aqi.geojson")
+surface = ensure_surface(padded_bounds(tracts.total_bounds), path=str(ROOT / SURFACE_PATH),
+                         model_path=str(ROOT / MODEL_PATH), monitors_path=str(ROOT / MONITORS_PATH))
+
+rows, cols = surface.values.shape
+print(f"✅ Predictability surface ({rows} x {cols} grid) is up to date in {ROOT / SURFACE_PATH}")
@@ -0,0 +1,267 @@
+"""
+Consistency Scores
+
+Scores how well each monitor's next-day PM2.5 level can be predicted from its own past week (self-predictability), as
+in the consistency step of `predictability.ipynb`.
+
+It provides:
+- The notebook's daily series and PM2.5 level bins for Clarity (3 levels) and PurpleAir (7 levels) monitors.
+- 7-day windows of every monitor built from strided sliding-window views over the sorted readings, without a Python
+  loop over rows.
+- The notebook's stratified 5-fold evaluation of an XGBoost classifier, with the folds of every source trained at the
+  same time in a process pool and a fixed seed.
+- Per-monitor macro F1 averaged over the folds and scaled to 0-100, which is the `consistency` column of
+  `data/combined_scores.csv`.
+
+The notebook's LSTM experiment only feeds a comparison plot, so it is not part of this pipeline.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+
+# Days of PM2.5 in a window; the label is the level of the day after it
+WINDOW_SIZE = 7
+
+# PM2.5 level bins (µg/m³) of each source, as chosen in the notebook
+CLARITY_EDGES = [(0, 4.50), (4.51, 9.00), (9.01, 35.40)]
+PURPLEAIR_EDGES = [(0, 4.50), (4.51, 9.00), (9.01, 35.40), (35.41, 55.40), (55.41, 125.40), (125.41, 225.40),
+                   (255.41, 500.00)]
+
+# PurpleAir daily means above this are capped before the log transform (µg/m³)
+PURPLEAIR_CAP = 275
+
+# Cross-validation folds and the seed shared by the fold split and the classifier
+N_FOLDS = 5
+SEED = 42
+
+# Processes training folds at the same time
+FOLD_WORKERS = os.cpu_count() or 1
+
+
+def xgb_classifier(seed: int = SEED):
+    """
+    Create the notebook's XGBoost classifier, single-threaded so that folds can run in parallel processes.
+
+    Parameters:
+    seed (int): Random seed of the classifier.
+
+    Returns:
+    xgboost.XGBClassifier: Unfitted classifier.
+    """
+    import xgboost as xgb
+
+    return xgb.XGBClassifier(random_state=seed, eval_metric="mlogloss", n_jobs=1)
+
+
+def log_bin_edges(edges: Sequence[Tuple[float, float]]) -> List[float]:
+    """
+    Convert PM2.5 level bins to the log-scale bin edges the notebook cuts at.
+
+    Parameters:
+    edges (Sequence[Tuple[float, float]]): (lower, upper) PM2.5 bounds of each level.
+
+    Returns:
+    List[float]: log1p of every lower bound and of the last upper bound, rounded to two decimals.
+    """
+    return np.log1p([lower for lower, _ in edges] + [edges[-1][1]]).round(2).tolist()
+
+
+def daily_series(readings: pd.DataFrame, source: str) -> pd.DataFrame:
+    """
+    Prepare one source's readings as the notebook does before windowing.
+
+    Clarity readings are reduced to the first reading of each monitor and day, rounded to two decimals. PurpleAir API
+    readings are already daily and are capped at `PURPLEAIR_CAP`.
+
+    Parameters:
+    readings (pd.DataFrame): Readings with `location_id`, `location_name`, `time` and `pm2_5_24h_mean`.
+    source (str): "clarity" or "api_purpleair".
+
+    Returns:
+    pd.DataFrame: `location_id`, `location_name`, `time`, `log_pm` and `label` (PM2.5 level, -1 outside every bin),
+        sorted by monitor and time.
+    """
+    if source == "clarity":
+        readings = readings.sort_values(["location_name", "time"], kind="stable")
+        readings = readings.assign(pm2_5_24h_mean=readings["pm2_5_24h_mean"].round(2),
+                                   date=pd.to_datetime(readings["time"]).dt.floor("D"))
+        readings = readings.drop_duplicates(["location_name", "date"], keep="first")
+        edges = CLARITY_EDGES
+
+        # log(x + 1) rather than log1p, as in the notebook; the last-bit differences can move tree splits
+        log_pm = np.log(readings["pm2_5_24h_mean"].to_numpy(dtype=float) + 1)
+    else:
+        readings = readings.assign(pm2_5_24h_mean=readings["pm2_5_24h_mean"].clip(upper=PURPLEAIR_CAP))
+        edges = PURPLEAIR_EDGES
+        log_pm = np.log1p(readings["pm2_5_24h_mean"].to_numpy(dtype=float))
+
+    labels = pd.cut(log_pm, bins=log_bin_edges(edges), labels=False, include_lowest=True)
+
+    series = pd.DataFrame({
+        "location_id": readings["location_id"].to_numpy(),
+        "location_name": readings["location_name"].to_numpy(),
+        "time": pd.to_datetime(readings["time"]).to_numpy(),
+        "log_pm": log_pm,
+        "label": np.nan_to_num(labels, nan=-1).astype(int),
+    })
+    return series.sort_values(["location_id", "time"], kind="stable").reset_index(drop=True)
+
+
+@dataclass(frozen=True)
+class WindowSet:
+    """
+    Labelled 7-day windows of one source's monitors.
+
+    Attributes:
+    features (np.ndarray): Log PM2.5 of the window days, of shape (windows, WINDOW_SIZE).
+    labels (np.ndarray): PM2.5 level of the day after each window.
+    monitors (np.ndarray): Position of each window's monitor in `location_ids`.
+    location_ids (np.ndarray): Monitor ids, sorted as the notebook's one-hot columns are.
+    location_names (np.ndarray): Monitor name of each window.
+    n_classes (int): Number of PM2.5 levels.
+    """
+    features: np.ndarray
+    labels: np.ndarray
+    monitors: np.ndarray
+    location_ids: np.ndarray
+    location_names: np.ndarray
+    n_classes: int
+
+    @classmethod
+    def from_series(cls, series: pd.DataFrame, n_classes: int, window: int = WINDOW_SIZE) -> "WindowSet":
+        """
+        Cut every monitor's series into overlapping windows of consecutive readings.
+
+        Parameters:
+        series (pd.DataFrame): Output of `daily_series`.
+        n_classes (int): Number of PM2.5 levels.
+        window (int): Readings per window.
+
+        Returns:
+        WindowSet: One window per reading that has `window` readings of the same monitor before it and a level.
+        """
+        monitor_ids = series["location_id"].to_numpy()
+        log_pm = series["log_pm"].to_numpy(dtype=float)
+        labels = series["label"].to_numpy()
+
+        # A window starting at row i belongs to one monitor when row i + window (its label day) does too
+        starts = np.arange(max(len(series) - window, 0))
+        starts = starts[(monitor_ids[starts] == monitor_ids[starts + window]) & (labels[starts + window] >= 0)]
+
+        # Only monitors with windows get a one-hot column, as with the notebook's get_dummies
+        location_ids, monitors = np.unique(monitor_ids[starts], return_inverse=True)
+
+        views = np.lib.stride_tricks.sliding_window_view(log_pm, window)
+        return cls(features=views[starts], labels=labels[starts + window], monitors=monitors,
+                   location_ids=location_ids, location_names=series["location_name"].to_numpy()[starts],
+                   n_classes=n_classes)
+
+    def design(self) -> np.ndarray:
+        """
+        Build the classifier inputs in the notebook's column layout.
+
+        The notebook selects its inputs with `iloc[:, 2:-1]`, which skips the first window day along with the monitor
+        name, so the model sees days 2-7 followed by one-hot monitor columns.
+
+        Returns:
+        np.ndarray: Inputs of shape (windows, WINDOW_SIZE - 1 + monitors).
+        """
+        one_hot = np.zeros((len(self.labels), len(self.location_ids)))
+        one_hot[np.arange(len(self.labels)), self.monitors] = 1
+        return np.hstack([self.features[:, 1:], one_hot])
+
+
+def fold_scores(inputs: np.ndarray, labels: np.ndarray, names: np.ndarray, train: np.ndarray, validation: np.ndarray,
+                n_classes: int, make_classifier: Callable = xgb_classifier, seed: int = SEED) -> Dict[str, float]:
+    """
+    Train on one fold and score every monitor in its validation part.
+
+    Parameters:
+    inputs (np.ndarray): Classifier inputs (see `WindowSet.design`).
+    labels (np.ndarray): PM2.5 level of each window.
+    names (np.ndarray): Monitor name of each window.
+    train (np.ndarray): Training rows.
+    validation (np.ndarray): Validation rows.
+    n_classes (int): Number of PM2.5 levels.
+    make_classifier (Callable): Creates the classifier from a seed.
+    seed (int): Seed passed to `make_classifier`.
+
+    Returns:
+    Dict[str, float]: Macro F1 over all levels of each monitor's validation windows.
+    """
+    # XGBoost needs the training labels to be 0..k-1, so levels missing from the fold are skipped in the encoding
+    classes, encoded = np.unique(labels[train], return_inverse=True)
+    classifier = make_classifier(seed)
+    classifier.fit(inputs[train], encoded)
+    predicted = classes[np.asarray(classifier.predict(inputs[validation])).astype(int)]
+
+    truth = labels[validation]
+    fold_names = names[validation]
+    levels = list(range(n_classes))
+    return {
+        name: f1_score(truth[fold_names == name], predicted[fold_names == name], labels=levels, average="macro",
+                       zero_division=0)
+        for name in pd.unique(fold_names)
+    }
+
+
+def consistency_scores(window_sets: Sequence[WindowSet], workers: Optional[int] = FOLD_WORKERS,
+                       make_classifier: Callable = xgb_classifier, seed: int = SEED) -> pd.Series:
+    """
+    Score the consistency of every monitor, training the folds of all sources at the same time.
+
+    Parameters:
+    window_sets (Sequence[WindowSet]): Windows of each source; a model is trained per source and fold.
+    workers (Optional[int]): Processes training folds; 1 trains them in this process.
+    make_classifier (Callable): Creates the classifier from a seed; must be importable by worker processes.
+    seed (int): Seed of the fold split and the classifiers.
+
+    Returns:
+    pd.Series: Mean macro F1 over the folds, scaled to 0-100 and rounded to two decimals, indexed by `location_name`.
+    """
+    tasks = []
+    for windows in window_sets:
+        inputs = windows.design()
+        folds = StratifiedKFold(n_splits=N_FOLDS, shuffle=True, random_state=seed)
+        for train, validation in folds.split(inputs, windows.labels):
+            tasks.append((inputs, windows.labels, windows.location_names, train, validation, windows.n_classes,
+                          make_classifier, seed))
+
+    if workers == 1:
+        results = [fold_scores(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fold_scores, *zip(*tasks)))
+
+    scores = pd.DataFrame([(name, f1) for result in results for name, f1 in result.items()],
+                          columns=["location_name", "f1_macro"])
+    return (scores.groupby("location_name")["f1_macro"].mean() * 100).round(2).rename("consistency")
+
+
+def monitor_table(consistency: pd.Series, readings: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Lay out the scored monitors as the notebook saves them in `data/combined_scores.csv`.
+
+    Parameters:
+    consistency (pd.Series): Output of `consistency_scores`.
+    readings (Sequence[pd.DataFrame]): Readings of every source with `location_name`, `location_id`, `latitude` and
+        `longitude`.
+
+    Returns:
+    pd.DataFrame: `location_name`, `consistency`, `location_id`, `latitude` and `longitude`, one row per monitor,
+        from most to least consistent.
+    """
+    locations = pd.concat([r[["location_name", "location_id", "latitude", "longitude"]] for r in readings])
+    locations = locations.assign(location_id=locations["location_id"].astype(str).str.strip(),
+                                 latitude=locations["latitude"].abs(), longitude=-locations["longitude"].abs())
+
+    table = consistency.reset_index().sort_values("consistency", ascending=False, kind="stable")
+    table = table.merge(locations.drop_duplicates(["location_name", "location_id"]), on="location_name", how="left")
+    return table.drop_duplicates(subset=["location_id"]).reset_index(drop=True)
@@ -0,0 +1,188 @@
+"""
+Cross-Predictability Scores
+
+Scores how well each monitor's daily PM2.5 can be predicted from its nearest monitors, as in the cross-predictability
+step of `predictability.ipynb`.
+
+It provides:
+- The notebook's daily log PM2.5 series: the first Clarity reading of each day (rounded to two decimals) and the
+  PurpleAir daily means capped at 275 µg/m³.
+- `DailyMatrix`, one dense date x monitor float32 matrix with a validity mask, built once. Columns are stored
+  contiguously, so the feature block of a monitor is a gather of its neighbors' columns and a row mask.
+- Per-monitor KNN fits in a process pool, each worker receiving only its monitor's feature block.
+- The notebook's scoring: nearest monitors weighted by inverse distance, in-sample R² scaled to 0-100, and monitors
+  with too few shared days given the mean score of their nearest monitors.
+
+This replaces filtering the long table and merging it once per neighbor of every monitor.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsRegressor
+
+from predictability.neighbors import N_NEIGHBORS, MonitorIndex
+
+# PurpleAir daily means above this are capped before the log transform (µg/m³)
+PURPLEAIR_CAP = 275
+
+# Neighbors of the KNN regressor fitted per monitor (days, not monitors)
+KNN_NEIGHBORS = 5
+
+# Fewest shared days a monitor needs to be scored from its own fit
+MIN_DAYS = 10
+
+# Distance used in place of zero for co-located monitors (miles)
+MIN_DISTANCE = 1e-6
+
+# Processes fitting monitors at the same time
+SCORE_WORKERS = os.cpu_count() or 1
+
+
+def daily_log_pm(clarity: pd.DataFrame, purpleair: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce Clarity and PurpleAir readings to one log PM2.5 value per monitor and day.
+
+    Parameters:
+    clarity (pd.DataFrame): Clarity readings with `location_id`, `location_name`, `time` and `pm2_5_24h_mean`.
+    purpleair (pd.DataFrame): PurpleAir API readings with the same columns.
+
+    Returns:
+    pd.DataFrame: `location_id`, `date` (day precision) and `pm2_5_24h_mean_log`, one row per monitor and day.
+    """
+    clarity = clarity.sort_values(["location_name", "time"], kind="stable")
+    clarity = pd.DataFrame({
+        "location_id": clarity["location_id"].astype(str).str.strip(),
+        "date": pd.to_datetime(clarity["time"]).dt.floor("D"),
+        "pm2_5_24h_mean_log": np.log1p(clarity["pm2_5_24h_mean"].round(2)),
+    })
+
+    purpleair = pd.DataFrame({
+        "location_id": purpleair["location_id"].astype(str).str.strip(),
+        "date": pd.to_datetime(purpleair["time"]).dt.floor("D"),
+        "pm2_5_24h_mean_log": np.log1p(purpleair["pm2_5_24h_mean"].clip(upper=PURPLEAIR_CAP)),
+    })
+
+    # The first reading of each monitor and day is kept, as the notebook does for Clarity
+    daily = pd.concat([clarity, purpleair], ignore_index=True)
+    return daily.drop_duplicates(["location_id", "date"], keep="first").reset_index(drop=True)
+
+
+@dataclass(frozen=True)
+class DailyMatrix:
+    """
+    Daily log PM2.5 of many monitors on a shared calendar.
+
+    Attributes:
+    dates (np.ndarray): Days of the rows, in increasing order.
+    monitors (np.ndarray): `location_id` of the columns.
+    values (np.ndarray): Log PM2.5 of shape (dates, monitors) in column-major order, NaN where `valid` is False.
+    valid (np.ndarray): Whether each monitor has a reading on each day, in column-major order.
+    """
+    dates: np.ndarray
+    monitors: np.ndarray
+    values: np.ndarray
+    valid: np.ndarray
+
+    @classmethod
+    def from_daily(cls, daily: pd.DataFrame, monitors: Sequence[str]) -> "DailyMatrix":
+        """
+        Scatter one value per monitor and day into the matrix.
+
+        Parameters:
+        daily (pd.DataFrame): Output of `daily_log_pm`.
+        monitors (Sequence[str]): `location_id` of the columns, in order; readings of other monitors are left out.
+
+        Returns:
+        DailyMatrix: The matrix over every day with a reading from one of `monitors`.
+        """
+        monitors = np.asarray([str(monitor).strip() for monitor in monitors], dtype=object)
+        columns = pd.Index(monitors).get_indexer(daily["location_id"])
+        daily = daily[columns >= 0]
+        columns = columns[columns >= 0]
+
+        dates, rows = np.unique(daily["date"].to_numpy(dtype="datetime64[D]"), return_inverse=True)
+        values = np.full((len(dates), len(monitors)), np.nan, dtype=np.float32, order="F")
+        values[rows, columns] = daily["pm2_5_24h_mean_log"].to_numpy(dtype=np.float32)
+        return cls(dates=dates, monitors=monitors, values=values, valid=~np.isnan(values))
+
+    def block(self, target: int, neighbors: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gather the days on which a monitor and all its neighbors have readings.
+
+        Parameters:
+        target (int): Column of the monitor to predict.
+        neighbors (np.ndarray): Columns of its neighbors.
+        weights (np.ndarray): Factor applied to each neighbor's column.
+
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: Weighted neighbor values of shape (days, neighbors) and the monitor's values.
+        """
+        days = self.valid[:, target] & self.valid[:, neighbors].all(axis=1)
+        features = self.values[:, neighbors][days].astype(float) * weights
+        return features, self.values[days, target].astype(float)
+
+
+def fit_score(features: np.ndarray, target: np.ndarray) -> float:
+    """
+    Fit the notebook's KNN regressor on one monitor and score it on the same days.
+
+    Parameters:
+    features (np.ndarray): Weighted neighbor values of shape (days, neighbors).
+    target (np.ndarray): The monitor's values.
+
+    Returns:
+    float: In-sample R² scaled to 0-100, with negative R² counted as 0.
+    """
+    model = KNeighborsRegressor(n_neighbors=KNN_NEIGHBORS)
+    model.fit(features, target)
+    return max(0.0, model.score(features, target)) * 100
+
+
+def predictability_scores(monitors: pd.DataFrame, matrix: DailyMatrix, k: int = N_NEIGHBORS,
+                          workers: Optional[int] = SCORE_WORKERS) -> pd.Series:
+    """
+    Score how well each monitor is predicted by its nearest monitors.
+
+    Parameters:
+    monitors (pd.DataFrame): Monitors with `location_id`, `latitude` and `longitude`, in the order ties between equally
+        distant neighbors are broken.
+    matrix (DailyMatrix): Daily values whose columns are `monitors["location_id"]`, in the same order.
+    k (int): Nearest monitors used as features.
+    workers (Optional[int]): Processes fitting monitors; 1 fits them in this process.
+
+    Returns:
+    pd.Series: Predictability (0-100, two decimals) indexed by `location_id`, NaN for monitors that could be neither
+        fitted nor given their neighbors' mean.
+    """
+    location_ids = matrix.monitors
+    index = MonitorIndex(monitors["latitude"], monitors["longitude"], labels=location_ids)
+    located = index.positions
+    distances, neighbors = index.query(index.latitudes, index.longitudes, k=k, exclude=location_ids[located])
+    weights = 1 / np.maximum(distances, MIN_DISTANCE)
+
+    blocks = [matrix.block(target, neighbors[i], weights[i]) for i, target in enumerate(located)]
+    fitted = [i for i, (features, _) in enumerate(blocks) if len(features) >= MIN_DAYS]
+
+    if workers == 1 or len(fitted) < 2:
+        results = [fit_score(*blocks[i]) for i in fitted]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fit_score, *zip(*(blocks[i] for i in fitted)),
+                                    chunksize=max(1, len(fitted) // (4 * (workers or SCORE_WORKERS)))))
+
+    scores: Dict[str, float] = {location_ids[located[i]]: score for i, score in zip(fitted, results)}
+
+    # Monitors without enough shared days take the mean of their scored neighbors, in monitor order, so a monitor
+    # given a score this way can pass it on to the next one
+    for i, target in enumerate(located):
+        if location_ids[target] not in scores:
+            known = [scores[location_ids[n]] for n in neighbors[i] if location_ids[n] in scores]
+            if known:
+                scores[location_ids[target]] = float(np.mean(known))
+
+    return pd.Series(scores, dtype=float).reindex(location_ids).round(2).rename("predictability")
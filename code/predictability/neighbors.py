@@ -0,0 +1,182 @@
+"""
+Nearest Monitor Index
+
+Finds the air quality monitors closest to any location without computing the distance to every monitor.
+
+It provides:
+- A BallTree over monitor coordinates using the haversine metric.
+- Batched k-nearest queries for one or many locations at once, optionally excluding each location's own monitor.
+- Distances in miles on the WGS-84 ellipsoid, matching geopy's `geodesic(...).miles` to within 1e-6 miles.
+- The neighbor feature table used to train and query the predictability model, from coordinates or from a query result.
+
+Candidates are found on the sphere and then re-ranked with exact ellipsoidal distances, so results match a brute-force geodesic search, including ties resolved in monitor order.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pyproj import Geod
+
+# Mean Earth radius in miles, used for the spherical candidate search
+EARTH_RADIUS_MILES = 3958.7613
+
+METERS_PER_MILE = 1609.344
+
+# Over short distances the ratio of ellipsoidal to spherical distance varies by less than 0.7% with direction,
+# so every monitor within this factor of the k-th spherical distance is re-ranked with the exact distance
+CANDIDATE_MARGIN = 1.01
+
+# Number of nearest monitors used as features by the predictability model
+N_NEIGHBORS = 5
+
+# Feature columns of the predictability model, in training order
+FEATURE_COLUMNS: List[str] = [
+    f'neighbor_{i}_{name}'
+    for i in range(1, N_NEIGHBORS + 1)
+    for name in ('distance', 'predictability', 'consistency')
+]
+
+WGS84 = Geod(ellps="WGS84")
+
+
+def geodesic_miles(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Compute WGS-84 geodesic distances between pairs of points.
+
+    Parameters:
+    lat1, lon1 (array-like): Coordinates of the first points in degrees.
+    lat2, lon2 (array-like): Coordinates of the second points in degrees.
+
+    Returns:
+    np.ndarray: Distance between each pair of points in miles.
+    """
+    _, _, meters = WGS84.inv(
+        np.asarray(lon1, dtype=float), np.asarray(lat1, dtype=float),
+        np.asarray(lon2, dtype=float), np.asarray(lat2, dtype=float)
+    )
+    return np.asarray(meters) / METERS_PER_MILE
+
+
+class MonitorIndex:
+    def __init__(self, latitudes, longitudes, labels=None) -> None:
+        """
+        Initialize the MonitorIndex class.
+
+        Parameters:
+        latitudes (array-like): Monitor latitudes in degrees.
+        longitudes (array-like): Monitor longitudes in degrees.
+        labels (Optional[array-like]): Monitor identifiers (e.g. `location_id`) used to exclude monitors from a query.
+        Monitors with missing coordinates are left out of the index.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+
+        # Positions of indexed monitors in the input arrays
+        self.positions: np.ndarray = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        self.latitudes: np.ndarray = latitudes[self.positions]
+        self.longitudes: np.ndarray = longitudes[self.positions]
+        self.labels: Optional[np.ndarray] = None if labels is None else np.asarray(labels, dtype=object)[self.positions]
+
+        # Most monitors sharing one label, i.e. how many extra neighbors an exclusion can remove
+        self._max_label_count: int = 0 if labels is None else int(pd.Series(self.labels).value_counts().max())
+
+        # Imported here so that importing the feature helpers does not load scikit-learn
+        from sklearn.neighbors import BallTree
+
+        self._tree = BallTree(np.radians(np.column_stack([self.latitudes, self.longitudes])), metric="haversine")
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def query(self, latitudes, longitudes, k: int = N_NEIGHBORS, exclude=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest monitors to each location.
+
+        Parameters:
+        latitudes (array-like): Latitudes of the query locations in degrees.
+        longitudes (array-like): Longitudes of the query locations in degrees.
+        k (int): Number of monitors to return per location; capped at the number of eligible monitors.
+        exclude (Optional[array-like]): One label per location; monitors with that label are skipped for that location.
+
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: Distances in miles and positions of the monitors in the arrays the index was
+        built from, each of shape (locations, k) and sorted from nearest to farthest.
+        """
+        latitudes = np.atleast_1d(np.asarray(latitudes, dtype=float))
+        longitudes = np.atleast_1d(np.asarray(longitudes, dtype=float))
+        if exclude is not None and self.labels is None:
+            raise ValueError("The index was built without labels, so monitors cannot be excluded.")
+
+        # Excluded monitors can take up to `extra` of the spherical neighbors of a location
+        extra = 0 if exclude is None else self._max_label_count
+        k = min(k, len(self) - extra)
+
+        points = np.radians(np.column_stack([latitudes, longitudes]))
+
+        # Spherical search for the k-th neighbor, then gather everything that could be closer on the ellipsoid
+        spherical, _ = self._tree.query(points, k=k + extra)
+        candidates = self._tree.query_radius(points, r=spherical[:, -1] * CANDIDATE_MARGIN)
+
+        counts = np.array([len(c) for c in candidates])
+        rows = np.repeat(np.arange(len(points)), counts)
+        cols = np.concatenate(candidates)
+
+        if exclude is not None:
+            keep = self.labels[cols] != np.asarray(exclude, dtype=object)[rows]
+            rows, cols = rows[keep], cols[keep]
+            counts = np.bincount(rows, minlength=len(points))
+
+        distances = geodesic_miles(self.latitudes[cols], self.longitudes[cols], latitudes[rows], longitudes[rows])
+
+        # Sort candidates of each location by distance, breaking ties by monitor order, and keep the first k
+        order = np.lexsort((cols, distances, rows))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        take = order[(starts[:, None] + np.arange(k)).ravel()]
+
+        return distances[take].reshape(-1, k), self.positions[cols[take]].reshape(-1, k)
+
+
+def feature_table(monitors: pd.DataFrame, distances: np.ndarray, positions: np.ndarray) -> pd.DataFrame:
+    """
+    Build the predictability model features from the result of a `MonitorIndex.query`.
+
+    Parameters:
+    monitors (pd.DataFrame): Monitors with `predictability` and `consistency`, in the row order the index was built from.
+    distances (np.ndarray): Distances in miles to the nearest monitors, of shape (locations, k).
+    positions (np.ndarray): Positions of those monitors in `monitors`, of the same shape.
+
+    Returns:
+    pd.DataFrame: One row per location with the distance, predictability and consistency of its nearest monitors,
+    in the column order of `FEATURE_COLUMNS`.
+    """
+    predictability = monitors['predictability'].to_numpy(dtype=float)[positions]
+    consistency = monitors['consistency'].to_numpy(dtype=float)[positions]
+
+    features = {}
+    for i in range(positions.shape[1]):
+        features[f'neighbor_{i + 1}_distance'] = distances[:, i]
+        features[f'neighbor_{i + 1}_predictability'] = predictability[:, i]
+        features[f'neighbor_{i + 1}_consistency'] = consistency[:, i]
+
+    return pd.DataFrame(features)
+
+
+def neighbor_features(monitors: pd.DataFrame, index: MonitorIndex, latitudes, longitudes,
+                      exclude=None) -> pd.DataFrame:
+    """
+    Build the predictability model features for many locations in one batched query.
+
+    Parameters:
+    monitors (pd.DataFrame): Monitors with `predictability` and `consistency`, in the row order `index` was built from.
+    index (MonitorIndex): Spatial index over the monitors' coordinates.
+    latitudes (array-like): Latitudes of the locations to describe in degrees.
+    longitudes (array-like): Longitudes of the locations to describe in degrees.
+    exclude (Optional[array-like]): One label per location whose monitors are skipped, e.g. a monitor's own `location_id`.
+
+    Returns:
+    pd.DataFrame: One row per location with the distance, predictability and consistency of its nearest monitors,
+    in the column order of `FEATURE_COLUMNS`.
+    """
+    distances, positions = index.query(latitudes, longitudes, k=N_NEIGHBORS, exclude=exclude)
+    return feature_table(monitors, distances, positions)
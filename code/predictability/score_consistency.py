@@ -0,0 +1,68 @@
+"""
+Monitor Consistency Scoring
+
+This script recomputes the consistency (self-predictability) score of every monitor, replacing the XGBoost loop of
+`predictability.ipynb`.
+
+It performs the following steps:
+- Loads the Clarity and PurpleAir API readings from the sensor store and bins their daily PM2.5 into levels.
+- Cuts every monitor's readings into 7-day windows labelled with the level of the following day.
+- Trains the notebook's XGBoost classifier on stratified 5-fold splits of each source, every fold in its own process.
+- Writes the mean macro F1 of each monitor to the `consistency` column of `data/combined_scores.csv`, keeping its other
+  columns and rows; when the file does not exist yet, it is created with the notebook's monitor columns.
+
+Example:
+    python code/predictability/score_consistency.py --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from predictability.consistency import (FOLD_WORKERS, WindowSet, consistency_scores, daily_series,  # noqa: E402
+                                        monitor_table)
+from preprocessing.sensor_store import STORE_PATH, load_readings  # noqa: E402
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+READING_COLUMNS = ["location_id", "location_name", "time", "pm2_5_24h_mean", "latitude", "longitude"]
+
+# PM2.5 levels of each source's labels
+SOURCE_CLASSES = {"clarity": 3, "api_purpleair": 7}
+
+parser = argparse.ArgumentParser(description="Recompute the consistency score of every monitor.")
+parser.add_argument("--scores", default=str(ROOT / "data" / "combined_scores.csv"),
+                    help="Monitor scores CSV whose consistency column is rewritten")
+parser.add_argument("--store", default=STORE_PATH, help="Sensor store root")
+parser.add_argument("--workers", type=int, default=FOLD_WORKERS, help="Processes training folds")
+args = parser.parse_args()
+
+start = time.perf_counter()
+readings = {source: load_readings(source, columns=READING_COLUMNS, root=args.store) for source in SOURCE_CLASSES}
+window_sets = [WindowSet.from_series(daily_series(readings[source], source), n_classes)
+               for source, n_classes in SOURCE_CLASSES.items()]
+loaded = time.perf_counter()
+
+consistency = consistency_scores(window_sets, workers=args.workers)
+
+if os.path.exists(args.scores):
+    scores = pd.read_csv(args.scores, float_precision="round_trip")
+    scores["consistency"] = scores["location_name"].map(consistency).to_numpy()
+else:
+    # score_predictability.py fills the predictability column in afterwards
+    scores = monitor_table(consistency, list(readings.values())).assign(predictability=float("nan"))
+
+temporary = f"{args.scores}.tmp"
+scores.to_csv(temporary, index=False)
+os.replace(temporary, args.scores)
+
+print(f"✅ Scored {scores['consistency'].notna().sum()} of {len(scores)} monitors from "
+      f"{sum(len(windows.labels) for windows in window_sets)} windows (loaded in {loaded - start:.2f}s, "
+      f"scored in {time.perf_counter() - loaded:.2f}s) and saved to {args.scores}")
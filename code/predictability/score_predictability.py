@@ -0,0 +1,61 @@
+"""
+Monitor Predictability Scoring
+
+This script recomputes the predictability (cross-predictability) score of every monitor in `data/combined_scores.csv`,
+replacing the nearest-monitor loop of `predictability.ipynb`.
+
+It performs the following steps:
+- Loads the Clarity and PurpleAir API readings from the sensor store and reduces them to daily log PM2.5.
+- Builds the date x monitor matrix of those values once.
+- Finds the five nearest monitors of each monitor and fits one KNN regressor per monitor on their inverse-distance
+  weighted values, in parallel processes.
+- Gives monitors with fewer than ten shared days the mean score of their nearest monitors.
+- Writes the scores to the `predictability` column of `data/combined_scores.csv`, keeping its other columns and rows.
+
+Example:
+    python code/predictability/score_predictability.py --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from predictability.cross import SCORE_WORKERS, DailyMatrix, daily_log_pm, predictability_scores  # noqa: E402
+from preprocessing.sensor_store import STORE_PATH, load_readings  # noqa: E402
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+READING_COLUMNS = ["location_id", "location_name", "time", "pm2_5_24h_mean"]
+
+parser = argparse.ArgumentParser(description="Recompute the predictability score of every monitor.")
+parser.add_argument("--scores", default=str(ROOT / "data" / "combined_scores.csv"),
+                    help="Monitor scores CSV whose predictability column is rewritten")
+parser.add_argument("--store", default=STORE_PATH, help="Sensor store root")
+parser.add_argument("--workers", type=int, default=SCORE_WORKERS, help="Processes fitting monitors")
+args = parser.parse_args()
+
+start = time.perf_counter()
+scores = pd.read_csv(args.scores, float_precision="round_trip")
+monitors = scores.assign(location_id=scores["location_id"].astype(str).str.strip())
+
+daily = daily_log_pm(load_readings("clarity", columns=READING_COLUMNS, root=args.store),
+                     load_readings("api_purpleair", columns=READING_COLUMNS, root=args.store))
+matrix = DailyMatrix.from_daily(daily, monitors["location_id"])
+loaded = time.perf_counter()
+
+predictability = predictability_scores(monitors, matrix, workers=args.workers)
+scores["predictability"] = monitors["location_id"].map(predictability).to_numpy()
+
+temporary = f"{args.scores}.tmp"
+scores.to_csv(temporary, index=False)
+os.replace(temporary, args.scores)
+
+print(f"✅ Scored {scores['predictability'].notna().sum()} of {len(scores)} monitors over {len(matrix.dates)} days "
+      f"(loaded in {loaded - start:.2f}s, scored in {time.perf_counter() - loaded:.2f}s) and saved to {args.scores}")
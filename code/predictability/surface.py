@@ -0,0 +1,227 @@
+"""
+Predictability Surface
+
+Precomputes the predictability model over a regular latitude/longitude grid covering South San Francisco and San Bruno.
+
+It provides:
+- A vectorized, batched evaluation of the random forest at every grid node.
+- A compact NPZ artifact holding the grid values, its georeferencing, and the hashes and extent it was built from.
+- Constant-time lookups at any location, with optional bilinear interpolation.
+- Automatic rebuilds when the model, the monitor scores, the extent or the grid spacing change.
+
+Scoring an address becomes an array lookup instead of a neighbor search and a model call.
+"""
+
+import json
+import os
+import pickle
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fingerprint import file_hash
+from predictability.neighbors import MonitorIndex, neighbor_features
+
+# Default artifact and source paths (relative to the repository root)
+SURFACE_PATH = "data/predictability_surface.npz"
+MODEL_PATH = "data/rf_predictability_model.pkl"
+MONITORS_PATH = "data/combined_scores.csv"
+
+# Grid spacing in degrees (about 55 m north-south, 45 m east-west)
+GRID_STEP = 0.0005
+
+# Margin added around the tract bounds in degrees
+BOUNDS_PADDING = 0.005
+
+# Number of grid nodes passed to the model per predict call
+BATCH_SIZE = 20000
+
+
+@dataclass(frozen=True)
+class PredictabilitySurface:
+    """
+    Predicted predictability at the nodes of a regular grid.
+
+    Attributes:
+    values (np.ndarray): Predictions of shape (rows, cols); row 0 is the southern edge and column 0 the western edge.
+    south (float): Latitude of the first row in degrees.
+    west (float): Longitude of the first column in degrees.
+    step (float): Spacing between rows and between columns in degrees.
+    sources (Dict[str, Any]): What the grid was computed from: the hashes of the model and monitor files, and the
+        requested extent and spacing (see `surface_sources`).
+    """
+    values: np.ndarray
+    south: float
+    west: float
+    step: float
+    sources: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def bounds(self) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        """[[south, west], [north, east]] of the grid, as used by Folium overlays."""
+        rows, cols = self.values.shape
+        return ((self.south, self.west),
+                (self.south + (rows - 1) * self.step, self.west + (cols - 1) * self.step))
+
+    def lookup(self, latitudes, longitudes, interpolate: bool = True) -> np.ndarray:
+        """
+        Read the predicted predictability at one or more locations.
+
+        Parameters:
+        latitudes (array-like): Latitudes in degrees.
+        longitudes (array-like): Longitudes in degrees.
+        interpolate (bool): Bilinearly interpolate between the four surrounding nodes instead of using the nearest one.
+
+        Returns:
+        np.ndarray: Predicted predictability per location, NaN for locations outside the grid.
+        """
+        rows, cols = self.values.shape
+        y = (np.atleast_1d(np.asarray(latitudes, dtype=float)) - self.south) / self.step
+        x = (np.atleast_1d(np.asarray(longitudes, dtype=float)) - self.west) / self.step
+        inside = (y >= 0) & (y <= rows - 1) & (x >= 0) & (x <= cols - 1)
+
+        y = np.where(inside, y, 0)
+        x = np.where(inside, x, 0)
+
+        if interpolate:
+            i0 = np.minimum(np.floor(y).astype(int), rows - 2)
+            j0 = np.minimum(np.floor(x).astype(int), cols - 2)
+            fy = y - i0
+            fx = x - j0
+            v = self.values
+            result = ((1 - fy) * (1 - fx) * v[i0, j0] + (1 - fy) * fx * v[i0, j0 + 1] +
+                      fy * (1 - fx) * v[i0 + 1, j0] + fy * fx * v[i0 + 1, j0 + 1])
+        else:
+            result = self.values[np.rint(y).astype(int), np.rint(x).astype(int)].astype(float)
+
+        return np.where(inside, result, np.nan)
+
+    def save(self, path: str = SURFACE_PATH) -> None:
+        """
+        Write the surface to an uncompressed NPZ file.
+
+        Parameters:
+        path (str): Destination path.
+        """
+        np.savez(path, values=self.values, origin=np.array([self.south, self.west, self.step]),
+                 sources=np.array(json.dumps(self.sources, sort_keys=True)))
+
+    @classmethod
+    def load(cls, path: str = SURFACE_PATH) -> "PredictabilitySurface":
+        """
+        Read a surface written by `save`.
+
+        Parameters:
+        path (str): Path of the NPZ file.
+
+        Returns:
+        PredictabilitySurface: The stored surface.
+        """
+        with np.load(path) as artifact:
+            south, west, step = artifact["origin"].tolist()
+            return cls(values=artifact["values"], south=south, west=west, step=step,
+                       sources=json.loads(str(artifact["sources"])))
+
+
+def build_surface(model, monitors: pd.DataFrame, bounds, step: float = GRID_STEP,
+                  batch_size: int = BATCH_SIZE) -> PredictabilitySurface:
+    """
+    Evaluate the predictability model at every node of a regular grid.
+
+    Parameters:
+    model: Fitted regressor taking the columns produced by `neighbor_features`.
+    monitors (pd.DataFrame): Monitors with coordinates, `predictability` and `consistency`.
+    bounds (Tuple[float, float, float, float]): (west, south, east, north) extent to cover, in degrees.
+    step (float): Grid spacing in degrees.
+    batch_size (int): Number of grid nodes evaluated per model call.
+
+    Returns:
+    PredictabilitySurface: The computed grid, without source hashes.
+    """
+    west, south, east, north = bounds
+    lats = south + step * np.arange(int(np.ceil((north - south) / step)) + 1)
+    lons = west + step * np.arange(int(np.ceil((east - west) / step)) + 1)
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    flat_lat, flat_lon = grid_lat.ravel(), grid_lon.ravel()
+
+    index = MonitorIndex(monitors["latitude"], monitors["longitude"])
+    values = np.empty(flat_lat.size, dtype=np.float32)
+
+    for start in range(0, flat_lat.size, batch_size):
+        batch = slice(start, start + batch_size)
+        features = neighbor_features(monitors, index, flat_lat[batch], flat_lon[batch])
+        values[batch] = model.predict(features)
+
+    return PredictabilitySurface(values=values.reshape(grid_lat.shape), south=float(south), west=float(west),
+                                 step=float(step))
+
+
+def padded_bounds(total_bounds, padding: float = BOUNDS_PADDING) -> Tuple[float, float, float, float]:
+    """
+    Grow (west, south, east, north) bounds, e.g. a GeoDataFrame's `total_bounds`, by a margin on every side.
+
+    Parameters:
+    total_bounds (array-like): (west, south, east, north) in degrees.
+    padding (float): Margin in degrees.
+
+    Returns:
+    Tuple[float, float, float, float]: The padded bounds.
+    """
+    west, south, east, north = total_bounds
+    return (west - padding, south - padding, east + padding, north + padding)
+
+
+def surface_sources(bounds, step: float, model_path: str, monitors_path: str) -> Dict[str, Any]:
+    """
+    Describe everything a surface is computed from, to tell when a stored surface is stale.
+
+    Parameters:
+    bounds (Tuple[float, float, float, float]): (west, south, east, north) extent of the grid.
+    step (float): Grid spacing in degrees.
+    model_path (str): Path of the pickled predictability model.
+    monitors_path (str): Path of the monitor scores CSV.
+
+    Returns:
+    Dict[str, Any]: Hashes of the model and monitor files (keyed by role, so the paths may be given relative to any
+        directory), with the extent and spacing.
+    """
+    return {"model": file_hash(model_path), "monitors": file_hash(monitors_path),
+            "bounds": [float(value) for value in bounds], "step": float(step)}
+
+
+def ensure_surface(bounds, path: str = SURFACE_PATH, model_path: str = MODEL_PATH, monitors_path: str = MONITORS_PATH,
+                   model=None, monitors: pd.DataFrame = None, step: float = GRID_STEP) -> PredictabilitySurface:
+    """
+    Load the stored surface, rebuilding and saving it first if the model or monitor file, the extent or the grid
+    spacing changed since it was built.
+
+    Parameters:
+    bounds (Tuple[float, float, float, float]): (west, south, east, north) extent of the grid.
+    path (str): Path of the NPZ artifact.
+    model_path (str): Path of the pickled predictability model.
+    monitors_path (str): Path of the monitor scores CSV.
+    model: Already loaded model, to avoid unpickling it again.
+    monitors (pd.DataFrame): Already loaded monitor scores.
+    step (float): Grid spacing in degrees.
+
+    Returns:
+    PredictabilitySurface: A surface consistent with the current model and monitor files, extent and spacing.
+    """
+    sources = surface_sources(bounds, step, model_path, monitors_path)
+
+    if os.path.exists(path):
+        surface = PredictabilitySurface.load(path)
+        if surface.sources == sources:
+            return surface
+
+    if model is None:
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+    if monitors is None:
+        monitors = pd.read_csv(monitors_path)
+
+    surface = replace(build_surface(model, monitors, bounds, step), sources=sources)
+    surface.save(path)
+    return surface
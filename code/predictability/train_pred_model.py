@@ -1,13 +1,25 @@
 # train_pred_model.py
 
+import argparse
+import os
+import pickle
+from pathlib import Path
+
 import pandas as pd
-from geopy.distance import geodesic
 from sklearn.ensemble import RandomForestRegressor
-import pickle
+
+from neighbors import MonitorIndex, neighbor_features
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+parser = argparse.ArgumentParser(description="Train the model predicting predictability from the nearest monitors.")
+parser.add_argument("--scores", default=str(ROOT / "data" / "combined_scores.csv"), help="Monitor scores CSV")
+parser.add_argument("--output", default=str(ROOT / "data" / "rf_predictability_model.pkl"), help="Destination pickle")
+args = parser.parse_args()
 
 # === Load Data ===
-# print current working directory
-df = pd.read_csv("data/combined_scores.csv")
+df = pd.read_csv(args.scores)
 
 # Clean coordinates
 df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
@@ -15,29 +27,12 @@ df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
 df = df.dropna(subset=['latitude', 'longitude'])
 
 # === Build Training Data ===
-rows = []
-for idx, row in df.iterrows():
-    target_latlon = (row['latitude'], row['longitude'])
-    target_val = row['predictability']
-
-    # Exclude self, compute distances
-    neighbors = df[df['location_id'] != row['location_id']].copy()
-    neighbors['distance'] = neighbors.apply(
-        lambda n: geodesic((n['latitude'], n['longitude']), target_latlon).miles, axis=1
-    )
-    closest = neighbors.nsmallest(5, 'distance')
-
-    # Create feature vector
-    feature_row = {}
-    for i, n in enumerate(closest.itertuples(), start=1):
-        feature_row[f'neighbor_{i}_distance'] = n.distance
-        feature_row[f'neighbor_{i}_predictability'] = n.predictability
-        feature_row[f'neighbor_{i}_consistency'] = n.consistency
-
-    feature_row['target_predictability'] = target_val
-    rows.append(feature_row)
-
-train_df = pd.DataFrame(rows)
+# Features of every monitor come from its nearest other monitors, found in one batched spatial query
+df = df.reset_index(drop=True)
+index = MonitorIndex(df['latitude'], df['longitude'], labels=df['location_id'])
+
+train_df = neighbor_features(df, index, df['latitude'], df['longitude'], exclude=df['location_id'])
+train_df['target_predictability'] = df['predictability'].to_numpy()
 
 # === Train Model ===
 X = train_df.drop(columns=["target_predictability"])
@@ -47,7 +42,9 @@ model = RandomForestRegressor(n_estimators=100, random_state=42)
 model.fit(X, y)
 
 # === Save Model with Pickle ===
-with open("data/rf_predictability_model.pkl", "wb") as f:
+temporary = f"{args.output}.tmp"
+with open(temporary, "wb") as f:
     pickle.dump(model, f)
+os.replace(temporary, args.output)
 
-print("✅ Model trained and saved to rf_predictability_model.pkl")
+print(f"✅ Model trained and saved to {args.output}")
@@ -0,0 +1,109 @@
+"""
+PM2.5 Air Quality Index
+
+Converts PM2.5 concentrations (µg/m³) to EPA Air Quality Index values for whole arrays at once.
+
+It provides:
+- The EPA PM2.5 breakpoint table (2024 revision) as NumPy arrays.
+- EPA truncation of concentrations to one decimal place before the breakpoint lookup.
+- A vectorized breakpoint search and linear interpolation, rounding to the nearest integer.
+- A pandas wrapper that can replace `Series.apply` with the former per-row `calculate_pm2_5_aqi`.
+
+Missing, non-finite, negative and above-scale (over 500.4) concentrations have no AQI and map to NaN.
+"""
+
+import numpy as np
+import pandas as pd
+
+# EPA PM2.5 breakpoints: concentration low/high and index low/high per category
+BP_LO = np.array([0.0, 9.1, 35.5, 55.5, 125.5, 225.5])
+BP_HI = np.array([9.0, 35.4, 55.4, 125.4, 225.4, 500.4])
+I_LO = np.array([0, 51, 101, 151, 201, 301], dtype=float)
+I_HI = np.array([50, 100, 150, 200, 300, 500], dtype=float)
+SLOPE = (I_HI - I_LO) / (BP_HI - BP_LO)
+
+
+def truncate_pm2_5(concentrations) -> np.ndarray:
+    """
+    Truncate concentrations toward zero to one decimal place, as EPA requires before computing the AQI.
+
+    The result matches cutting the decimal representation of each value after its first decimal digit
+    (e.g. 35.49 -> 35.4, even though 35.49 * 10 is not exactly 354.9 in floating point). Below 1e-4 it deliberately
+    differs from the former `str()` cut, which read the mantissa of scientific notation (6.5e-06 as 6.5); such values
+    truncate to 0.0 here.
+
+    Parameters:
+    concentrations (array-like): PM2.5 concentrations.
+
+    Returns:
+    np.ndarray: Truncated concentrations as floats; NaN and infinite values are passed through.
+    """
+    values = np.asarray(concentrations, dtype=float)
+    magnitude = np.abs(values)
+
+    tenths = magnitude * 10
+    np.floor(tenths, out=tenths)
+
+    # |x| * 10 can round across an integer, so recheck values close to one (or too large to tell) exactly,
+    # making tenths the largest integer with tenths / 10 <= |x|
+    with np.errstate(invalid="ignore"):
+        fraction = magnitude * 10 - tenths
+        unsure = np.flatnonzero(~((fraction > 1e-6) & (fraction < 1 - 1e-6)) | (magnitude > 1e8))
+    candidate, exact = tenths[unsure], magnitude[unsure]
+    with np.errstate(invalid="ignore"):
+        candidate = np.where(candidate / 10 > exact, candidate - 1, candidate)
+        candidate = np.where((candidate + 1) / 10 <= exact, candidate + 1, candidate)
+    tenths[unsure] = candidate
+
+    tenths /= 10
+    np.copysign(tenths, values, out=tenths)
+    return tenths
+
+
+def pm2_5_aqi(concentrations, truncate: bool = True) -> np.ndarray:
+    """
+    Compute the PM2.5 AQI for many concentrations at once.
+
+    Parameters:
+    concentrations (array-like): PM2.5 concentrations in µg/m³ (hourly or 24-hour means).
+    truncate (bool): Truncate concentrations to one decimal place first, per EPA guidance.
+
+    Returns:
+    np.ndarray: AQI values as whole-number floats, NaN where the concentration is missing or off the scale.
+    """
+    values = truncate_pm2_5(concentrations) if truncate else np.asarray(concentrations, dtype=float)
+
+    # Breakpoint search: count the category lower bounds at or below each value (NaN stays in category 0)
+    category = np.zeros(values.shape, dtype=np.intp)
+    with np.errstate(invalid="ignore"):
+        for bp_lo in BP_LO[1:]:
+            category += values >= bp_lo
+        valid = (values >= 0) & (values <= BP_HI[category])
+
+    # Same operands as the EPA formula ((I_hi - I_lo) / (BP_hi - BP_lo)) * (C - BP_lo) + I_lo, so results match
+    # a scalar implementation bit for bit
+    aqi = values - BP_LO[category]
+    aqi *= SLOPE[category]
+    aqi += I_LO[category]
+
+    # np.rint rounds halves to even, like Python's round(); adding 0.0 turns -0.0 (from e.g. -0.05) into 0.0
+    np.rint(aqi, out=aqi)
+    aqi += 0.0
+    aqi[~valid] = np.nan
+    return aqi
+
+
+def pm2_5_aqi_series(concentrations: pd.Series, truncate: bool = True) -> pd.Series:
+    """
+    Compute the PM2.5 AQI for a pandas Series.
+
+    Parameters:
+    concentrations (pd.Series): PM2.5 concentrations in µg/m³.
+    truncate (bool): Truncate concentrations to one decimal place first, per EPA guidance.
+
+    Returns:
+    pd.Series: AQI values with the same index; integers if every value has an AQI, floats with NaN otherwise.
+    """
+    aqi = pd.Series(pm2_5_aqi(concentrations.to_numpy(dtype=float, na_value=np.nan), truncate=truncate),
+                    index=concentrations.index, name=concentrations.name)
+    return aqi if aqi.isna().any() else aqi.astype("int64")
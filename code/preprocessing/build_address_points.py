@@ -0,0 +1,57 @@
+"""
+Address Points Build
+
+This script prepares the address points behind the dashboard's offline geocoder from a local address point file (e.g.
+the San Mateo County address points).
+
+It performs the following steps:
+- Reads the address point file (any format GeoPandas reads: shapefile, GeoJSON, GeoPackage, ...).
+- Joins the configured columns into one street address per point.
+- Keeps the points in South San Francisco and San Bruno.
+- Saves the address, city, latitude and longitude of each point to `data/address_points.csv`.
+
+With the file in place, address searches are answered locally first, and the dashboard works without network access
+when started with `GEOCODER_OFFLINE=1`.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from dashboard.geocode import CITIES  # noqa: E402
+
+OUTPUT_PATH = Path(__file__).resolve().parents[2] / "data" / "address_points.csv"
+
+parser = argparse.ArgumentParser(description="Build the offline geocoder's address points from a local file.")
+parser.add_argument("path", help="Address point file with point geometry")
+parser.add_argument("--address-columns", nargs="+", default=["ADDRESS"],
+                    help="Columns joined (with spaces) into the street address, e.g. ADDNUM STNAME STTYPE")
+parser.add_argument("--city-column", default="CITY", help="Column holding the city name")
+parser.add_argument("--output", default=str(OUTPUT_PATH), help="Destination CSV")
+args = parser.parse_args()
+
+points = gpd.read_file(args.path).to_crs("EPSG:4326")
+
+# Street address from its parts, skipping empty ones
+parts = points[args.address_columns].astype("string").fillna("")
+address = parts.apply(lambda row: " ".join(part.strip() for part in row if part.strip()), axis=1)
+
+# Only the dashboard's cities, with their names spelled the way searches are tried
+cities = {city.lower(): city for city in CITIES}
+city = points[args.city_column].astype("string").str.strip().str.lower().map(cities)
+keep = city.notna() & (address != "") & points.geometry.notna()
+
+output = pd.DataFrame({
+    "address": address[keep],
+    "city": city[keep],
+    "latitude": points.geometry[keep].y.round(6),
+    "longitude": points.geometry[keep].x.round(6),
+}).drop_duplicates(["address", "city"])
+
+output.to_csv(args.output, index=False)
+print(f"✅ Saved {len(output)} address points to {args.output}")
@@ -0,0 +1,55 @@
+"""
+Health Indicators Build
+
+This script builds the table of health indicators per tract behind the Health Risk Index, replacing
+`health_preproc.ipynb`.
+
+It performs the following steps:
+- Hashes every San Mateo County indicator file in `data/smc_indicators/` and parses, in parallel, only those that are
+  new or changed since the last run.
+- Keeps the value of the latest period of each tract in South San Francisco and San Bruno.
+- Joins the CalEnviroScreen 4.0 results when given (`--calenviroscreen`).
+- Saves the wide table to `data/all_indicators.csv`, which `health/build_health_risk_index.py` reads. The Health Risk
+  Index needs the CalEnviroScreen columns, so a table without them is only written to another file (`--output`).
+
+Example:
+    python code/preprocessing/build_all_indicators.py --calenviroscreen calenviroscreen40resultsdatadictionary_F_2021.xlsx
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from preprocessing.smc_indicators import (CACHE_PATH, INDICATORS_DIR, OUTPUT_PATH, PARSE_WORKERS,  # noqa: E402
+                                          all_indicators, load_indicators, read_calenviroscreen)
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+parser = argparse.ArgumentParser(description="Build the health indicator table from the county indicator files.")
+parser.add_argument("--indicators", default=str(ROOT / INDICATORS_DIR), help="Folder of county indicator CSVs")
+parser.add_argument("--calenviroscreen", help="CalEnviroScreen 4.0 results (Excel workbook or CSV) to join")
+parser.add_argument("--output", default=str(ROOT / OUTPUT_PATH), help="Destination CSV")
+parser.add_argument("--workers", type=int, default=PARSE_WORKERS, help="Files parsed at the same time")
+parser.add_argument("--no-cache", action="store_true", help="Parse every file, ignoring the parsed file cache")
+args = parser.parse_args()
+
+if not args.calenviroscreen and Path(args.output).resolve() == ROOT / OUTPUT_PATH:
+    parser.error(f"without --calenviroscreen the table lacks the columns the Health Risk Index reads from "
+                 f"{OUTPUT_PATH}; pass --calenviroscreen, or --output to write the county indicators elsewhere")
+
+start = time.perf_counter()
+indicators = load_indicators(args.indicators, cache_path=None if args.no_cache else str(ROOT / CACHE_PATH),
+                             workers=args.workers)
+calenviroscreen = read_calenviroscreen(args.calenviroscreen) if args.calenviroscreen else None
+table = all_indicators(indicators, calenviroscreen)
+
+temporary = f"{args.output}.tmp"
+table.to_csv(temporary, index=False)
+os.replace(temporary, args.output)
+print(f"✅ Saved {table.shape[1] - 1} indicators for {len(table)} tracts to {args.output} "
+      f"in {time.perf_counter() - start:.2f}s")
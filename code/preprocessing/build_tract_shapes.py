@@ -0,0 +1,23 @@
+"""
+Tract Display Shapes Build
+
+This script prepares the simplified tract shapes drawn by the dashboard.
+
+It performs the following steps:
+- Loads the full-resolution tracts with combined AQI.
+- Simplifies them as one coverage and quantizes the coordinates to about 1 m.
+- Saves the shapes with only their tract ids, along with the hash of the source file.
+
+The dashboard also rebuilds the shapes on its own when the tract file changes, so this script is only needed to prepare them ahead of time.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from preprocessing.tract_shapes import SHAPES_PATH, TRACTS_PATH, build_display_shapes  # noqa: E402
+
+shapes = build_display_shapes(TRACTS_PATH, SHAPES_PATH)
+print(f"✅ Saved {len(shapes)} tract shapes to {SHAPES_PATH} ({os.path.getsize(SHAPES_PATH) / 1024:.0f} KB)")
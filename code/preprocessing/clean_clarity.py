@@ -10,13 +10,31 @@ It performs the following steps:
 - Calculates AQI based on daily PM2.5 concentrations.
 - Cleans and organizes the final dataset.
 
-The result is a daily air quality dataset exported as a clean CSV.
+The result is a daily air quality dataset written to the sensor store.
+
+Example:
+    python code/preprocessing/clean_clarity.py --input data/risesouthcity_april_hourly.csv
 """
 
+import argparse
+from pathlib import Path
+
 import pandas as pd
 
+from aqi import pm2_5_aqi_series
+from sensor_store import STORE_PATH, write_readings
+
+# Repository root, so the data is found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+parser = argparse.ArgumentParser(description="Clean hourly Clarity readings into the sensor store.")
+parser.add_argument("--input", default=str(ROOT / "data" / "risesouthcity_april_hourly.csv"),
+                    help="Hourly Clarity export")
+parser.add_argument("--store", default=STORE_PATH, help="Sensor store directory")
+args = parser.parse_args()
+
 # Load Clarity data
-clarity = pd.read_csv("data/risesouthcity_april_hourly.csv", parse_dates=["startOfPeriod"])
+clarity = pd.read_csv(args.input, parse_dates=["startOfPeriod"])
 
 # Convert to Pacific timezone and strip tz info
 clarity["startOfPeriod"] = pd.to_datetime(clarity["startOfPeriod"], utc=True)
@@ -51,30 +69,12 @@ daily_avg["pm2_5_24h_mean"] = daily_avg["pm2_5_24h_mean"].clip(lower=0)
 # Merge daily average back in
 clarity = pd.merge(clarity, daily_avg, on=["location_id", "date_only"], how="left")
 
-# AQI calculation function
-def calculate_pm2_5_aqi(C_p):
-    if pd.isna(C_p):
-        return None
-    breakpoints = [
-        (0.0,   9.0,   0,   50),
-        (9.1,   35.4,  51,  100),
-        (35.5,  55.4,  101, 150),
-        (55.5,  125.4, 151, 200),
-        (125.5, 225.4, 201, 300),
-        (225.5, 500.4, 301, 500)
-    ]
-    for BP_Lo, BP_Hi, I_Lo, I_Hi in breakpoints:
-        if BP_Lo <= C_p <= BP_Hi:
-            I_p = ((I_Hi - I_Lo) / (BP_Hi - BP_Lo)) * (C_p - BP_Lo) + I_Lo
-            return round(I_p)
-    return None
-
-# Apply AQI calculation
-clarity["pm2_5_24h_mean_aqi"] = clarity["pm2_5_24h_mean"].apply(calculate_pm2_5_aqi)
+# AQI calculation (concentrations truncated to one decimal place, as for PurpleAir)
+clarity["pm2_5_24h_mean_aqi"] = pm2_5_aqi_series(clarity["pm2_5_24h_mean"])
 
 # Keep and sort final columns
 clarity = clarity.sort_values("time")
 clarity = clarity[["time", "location_name", "location_id", "latitude", "longitude", "pm2_5_24h_mean", "pm2_5_24h_mean_aqi"]]
 
-# Export cleaned Clarity data
-clarity.to_csv("clean_clarity.csv", index=False)
\ No newline at end of file
+# Store cleaned Clarity data (rewrites only the months present here)
+write_readings(clarity, "clarity", root=args.store)
\ No newline at end of file
@@ -10,137 +10,321 @@ It performs the following steps:
 - Merges and combines data from different formats and sources.
 - Outputs a unified, time-sorted dataset for analysis or visualization.
 
-The final result is a cleaned CSV file with PM2.5, AQI, and environmental conditions per sensor.
+By default all inputs are processed in memory. With `--stream`, the exports are read in chunks and split by month
+into temporary Parquet files, and each month is then cleaned on its own, so memory stays flat for multi-GB exports.
+Every step depends only on readings from the same day, so both modes produce the same result.
+
+The PurpleAir API data (`data/purpleair_additional_data.csv`) is not part of the repository; without it, only the
+hourly and daily exports are cleaned.
+
+The final result is a cleaned dataset in the sensor store with PM2.5, AQI, and environmental conditions per sensor.
 """
 
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
 import pandas as pd
 
-# Load hourly, daily, and PurpleAir API data 
-hourly = pd.read_csv("purpleair_hourly_data.csv")
-daily = pd.read_csv("purpleair_daily_data.csv")
-additional = pd.read_csv("purpleair_additional_data.csv")
-
-# Process hourly data
-hourly = hourly.rename(columns={
-    'Datetime': 'time',
-    'Site_Name': 'location_name',
-    'Site_ID': 'location_id',
-    'Latitude': 'latitude',
-    'Longitude': 'longitude',
-    'PM2.5_EPA': 'pm2_5_1h_mean',
-    'Elevation': 'elevation',
-    'Temp': 'temp',
-    'RH': 'rh'
-})
-hourly['time'] = pd.to_datetime(hourly['time'])
-hourly['date_only'] = hourly['time'].dt.date  
-
-# Process daily data
-daily = daily.rename(columns={
-    'Datetime': 'daily_time',
-    'Site_Name': 'location_name',
-    'Site_ID': 'location_id',
-    'PM2.5_EPA': 'pm2_5_24h_mean'
-})
-daily['daily_time'] = pd.to_datetime(daily['daily_time'])
-daily['date_only'] = daily['daily_time'].dt.date
-daily = daily[['location_id', 'date_only', 'pm2_5_24h_mean']]
-
-# Merge data
-merged = pd.merge(hourly, daily, on=['location_id', 'date_only'], how='left')
-
-# Clamp negative PM2.5 values to zero
-merged['pm2_5_1h_mean'] = merged['pm2_5_1h_mean'].clip(lower=0)
-merged['pm2_5_24h_mean'] = merged['pm2_5_24h_mean'].clip(lower=0)
-
-# Column arrangement
-merged = merged[['time', 'location_name', 'location_id', 'latitude', 'longitude',
-                 'pm2_5_1h_mean', 'pm2_5_24h_mean', 'elevation', 'temp', 'rh']]
-
-# AQI calculation
-def calculate_pm2_5_aqi(C_p):
-    if pd.isna(C_p):
+from aqi import pm2_5_aqi_series
+from sensor_store import STORE_PATH, write_readings
+
+# Columns of the hourly/daily merge and of the final dataset
+MERGED_COLUMNS = ['time', 'location_name', 'location_id', 'latitude', 'longitude',
+                  'pm2_5_1h_mean', 'pm2_5_24h_mean', 'elevation', 'temp', 'rh']
+ADDITIONAL_COLUMNS = ['time', 'location_name', 'location_id', 'latitude', 'longitude',
+                      'pm2_5_1h_mean', 'pm2_5_1h_mean_aqi',
+                      'pm2_5_24h_mean', 'pm2_5_24h_mean_aqi',
+                      'temp', 'rh', 'pressure']
+FINAL_COLUMNS = ['time', 'location_name', 'location_id', 'latitude', 'longitude',
+                 'pm2_5_1h_mean', 'pm2_5_1h_mean_aqi',
+                 'pm2_5_24h_mean', 'pm2_5_24h_mean_aqi',
+                 'temp', 'rh', 'elevation', 'pressure']
+
+# Rows read from each CSV at a time in streaming mode
+CHUNK_SIZE = 500_000
+
+# Repository root, so the exports are found from any working directory
+ROOT = Path(__file__).resolve().parents[2]
+
+# Default exports, relative to the repository root
+HOURLY_EXPORT = "data/Hourly ASDS 2018-2023 for South San Francisco San Bruno.csv"
+DAILY_EXPORT = "data/Daily ASDS 2018-2023 for South San Francisco San Bruno.csv"
+ADDITIONAL_DATA = "data/purpleair_additional_data.csv"
+
+
+def prepare_hourly(hourly: pd.DataFrame) -> pd.DataFrame:
+    """Rename hourly export columns and parse timestamps."""
+    hourly = hourly.rename(columns={
+        'Datetime': 'time',
+        'Site_Name': 'location_name',
+        'Site_ID': 'location_id',
+        'Latitude': 'latitude',
+        'Longitude': 'longitude',
+        'PM2.5_EPA': 'pm2_5_1h_mean',
+        'Elevation': 'elevation',
+        'Temp': 'temp',
+        'RH': 'rh'
+    })
+    hourly['time'] = pd.to_datetime(hourly['time'])
+    return hourly
+
+
+def prepare_daily(daily: pd.DataFrame) -> pd.DataFrame:
+    """Rename daily export columns and parse timestamps."""
+    daily = daily.rename(columns={
+        'Datetime': 'daily_time',
+        'Site_Name': 'location_name',
+        'Site_ID': 'location_id',
+        'PM2.5_EPA': 'pm2_5_24h_mean'
+    })
+    daily['daily_time'] = pd.to_datetime(daily['daily_time'])
+    return daily
+
+
+def prepare_additional(additional: pd.DataFrame) -> pd.DataFrame:
+    """Rename PurpleAir API columns, convert timestamps to Pacific time, and clamp hourly PM2.5."""
+    additional = additional.rename(columns={
+        'time_stamp': 'time',
+        'sensor_name': 'location_name',
+        'sensor_index': 'location_id',
+        'pm2.5_atm': 'pm2_5_1h_mean',
+        'temperature': 'temp',
+        'humidity': 'rh'
+    })
+    additional['time'] = pd.to_datetime(additional['time'], utc=True)
+    additional['time'] = additional['time'].dt.tz_convert('US/Pacific').dt.tz_localize(None)
+
+    # Clamp hourly PM2.5
+    additional['pm2_5_1h_mean'] = additional['pm2_5_1h_mean'].clip(lower=0)
+    return additional
+
+
+def merge_hourly_daily(hourly: pd.DataFrame, daily: pd.DataFrame) -> pd.DataFrame:
+    """Attach daily means to hourly readings and compute AQI, for any set of whole days."""
+    hourly = hourly.copy()
+    hourly['date_only'] = hourly['time'].dt.date
+
+    daily = daily.copy()
+    daily['date_only'] = daily['daily_time'].dt.date
+    daily = daily[['location_id', 'date_only', 'pm2_5_24h_mean']]
+
+    # Merge data
+    merged = pd.merge(hourly, daily, on=['location_id', 'date_only'], how='left')
+
+    # Clamp negative PM2.5 values to zero
+    merged['pm2_5_1h_mean'] = merged['pm2_5_1h_mean'].clip(lower=0)
+    merged['pm2_5_24h_mean'] = merged['pm2_5_24h_mean'].clip(lower=0)
+
+    # Column arrangement
+    merged = merged.reindex(columns=MERGED_COLUMNS)
+
+    # Apply AQI calculations
+    merged['pm2_5_1h_mean_aqi'] = pm2_5_aqi_series(merged['pm2_5_1h_mean'])
+    merged['pm2_5_24h_mean_aqi'] = pm2_5_aqi_series(merged['pm2_5_24h_mean'])
+
+    # Sort
+    return merged.sort_values('time', kind='stable')
+
+
+def add_daily_means(additional: pd.DataFrame) -> pd.DataFrame:
+    """Compute 24-hour means and AQI for API readings, for any set of whole days."""
+    additional = additional.copy()
+
+    # Add date column for grouping
+    additional['date_only'] = additional['time'].dt.date
+
+    # Calculate 24h average per sensor per day
+    daily_avg = (
+        additional.groupby(['location_id', 'date_only'])['pm2_5_1h_mean']
+        .mean()
+        .reset_index()
+        .rename(columns={'pm2_5_1h_mean': 'pm2_5_24h_mean'})
+    )
+
+    # Clamp daily average
+    daily_avg['pm2_5_24h_mean'] = daily_avg['pm2_5_24h_mean'].clip(lower=0)
+
+    # Merge back into original hourly-level data
+    additional = pd.merge(additional, daily_avg, on=['location_id', 'date_only'], how='left')
+
+    # AQI Calculations
+    additional['pm2_5_1h_mean_aqi'] = pm2_5_aqi_series(additional['pm2_5_1h_mean'])
+    additional['pm2_5_24h_mean_aqi'] = pm2_5_aqi_series(additional['pm2_5_24h_mean'])
+
+    # Column arrangement and sort
+    additional = additional.reindex(columns=ADDITIONAL_COLUMNS)
+    return additional.sort_values('time', kind='stable')
+
+
+def combine(merged: pd.DataFrame, additional: pd.DataFrame) -> pd.DataFrame:
+    """Stack both datasets in time order (ties keep hourly export rows first) with the final column order."""
+    parts = [df for df in (merged, additional) if not df.empty]
+    if not parts:
+        return pd.DataFrame(columns=FINAL_COLUMNS)
+
+    final = pd.concat(parts, ignore_index=True)
+    final = final.sort_values('time', kind='stable')
+    return final.reindex(columns=FINAL_COLUMNS)
+
+
+def clean_in_memory(hourly_path: str, daily_path: str,
+                    additional_path: Optional[str]) -> Tuple[pd.DataFrame, int]:
+    """
+    Clean all three exports at once.
+
+    Parameters:
+    hourly_path (str): Path of the hourly PurpleAir export.
+    daily_path (str): Path of the daily PurpleAir export.
+    additional_path (Optional[str]): Path of the PurpleAir API data, or None to clean the exports only.
+
+    Returns:
+    Tuple[pd.DataFrame, int]: The combined, time-sorted dataset and the number of input rows read.
+    """
+    hourly = prepare_hourly(pd.read_csv(hourly_path))
+    daily = prepare_daily(pd.read_csv(daily_path))
+    rows = len(hourly) + len(daily)
+
+    additional = pd.DataFrame()
+    if additional_path is not None:
+        additional = prepare_additional(pd.read_csv(additional_path))
+        rows += len(additional)
+        additional = add_daily_means(additional)
+
+    return combine(merge_hourly_daily(hourly, daily), additional), rows
+
+
+def _month_keys(times: pd.Series) -> pd.Series:
+    # Rows without a timestamp go to their own partition, processed last like NaT sorts last
+    return times.dt.strftime('%Y-%m').fillna('NaT')
+
+
+def _spill_by_month(path: str, prepare, time_column: str, directory: str, chunksize: int) -> int:
+    # Split a CSV into per-month Parquet chunks without holding more than one chunk in memory
+    rows = 0
+    for number, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+        chunk = prepare(chunk)
+        rows += len(chunk)
+        for month, part in chunk.groupby(_month_keys(chunk[time_column]), sort=False):
+            month_directory = os.path.join(directory, month)
+            os.makedirs(month_directory, exist_ok=True)
+            part.to_parquet(os.path.join(month_directory, f"{number:06d}.parquet"), index=False)
+    return rows
+
+
+def _read_month(directory: str, month: str) -> pd.DataFrame:
+    month_directory = os.path.join(directory, month)
+    if not os.path.isdir(month_directory):
+        return pd.DataFrame()
+    # Chunk files are numbered, so reading them in name order keeps the export's row order
+    parts = [pd.read_parquet(os.path.join(month_directory, name)) for name in sorted(os.listdir(month_directory))]
+    return pd.concat(parts, ignore_index=True)
+
+
+def spill_exports(hourly_path: str, daily_path: str, additional_path: Optional[str], spill: str,
+                  chunksize: int = CHUNK_SIZE) -> int:
+    """
+    Read the exports in chunks and split them by month into Parquet files, the first pass of streaming mode.
+
+    Parameters:
+    hourly_path (str): Path of the hourly PurpleAir export.
+    daily_path (str): Path of the daily PurpleAir export.
+    additional_path (Optional[str]): Path of the PurpleAir API data, or None to spill the exports only.
+    spill (str): Scratch directory for the monthly files.
+    chunksize (int): Number of CSV rows read at a time.
+
+    Returns:
+    int: The number of input rows read.
+    """
+    rows = (_spill_by_month(hourly_path, prepare_hourly, 'time', os.path.join(spill, 'hourly'), chunksize) +
+            _spill_by_month(daily_path, prepare_daily, 'daily_time', os.path.join(spill, 'daily'), chunksize))
+    if additional_path is not None:
+        rows += _spill_by_month(additional_path, prepare_additional, 'time', os.path.join(spill, 'additional'),
+                                chunksize)
+    return rows
+
+
+def clean_spilled_months(spill: str) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Clean the exports split by `spill_exports` one month at a time, the second pass of streaming mode.
+
+    Parameters:
+    spill (str): Scratch directory written by `spill_exports`.
+
+    Yields:
+    Tuple[str, pd.DataFrame]: The month (YYYY-MM) and its cleaned rows in time order, in chronological order.
+    """
+    months = set()
+    for name in ('hourly', 'additional'):
+        if os.path.isdir(os.path.join(spill, name)):
+            months.update(os.listdir(os.path.join(spill, name)))
+
+    for month in sorted(months):
+        hourly = _read_month(os.path.join(spill, 'hourly'), month)
+        additional = _read_month(os.path.join(spill, 'additional'), month)
+
+        merged = pd.DataFrame()
+        if not hourly.empty:
+            daily = _read_month(os.path.join(spill, 'daily'), month)
+            if daily.empty:
+                daily = pd.DataFrame({'location_id': pd.Series(dtype=hourly['location_id'].dtype),
+                                      'daily_time': pd.Series(dtype='datetime64[ns]'),
+                                      'pm2_5_24h_mean': pd.Series(dtype=float)})
+            merged = merge_hourly_daily(hourly, daily)
+
+        if not additional.empty:
+            additional = add_daily_means(additional)
+
+        yield month, combine(merged, additional)
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, or None where it is not reported (Windows)."""
+    try:
+        import resource
+    except ImportError:
         return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean and combine PurpleAir exports into the sensor store.")
+    parser.add_argument("--hourly", default=str(ROOT / HOURLY_EXPORT), help="Hourly PurpleAir export")
+    parser.add_argument("--daily", default=str(ROOT / DAILY_EXPORT), help="Daily PurpleAir export")
+    parser.add_argument("--additional", default=str(ROOT / ADDITIONAL_DATA),
+                        help="PurpleAir API data, skipped if the file does not exist")
+    parser.add_argument("--stream", action="store_true", help="Process month by month with bounded memory")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="CSV rows read at a time with --stream")
+    parser.add_argument("--store", default=STORE_PATH, help="Sensor store directory")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    output_rows = 0
+
+    if not os.path.exists(args.additional):
+        print(f"⚠️ {args.additional} not found; cleaning the hourly and daily exports only")
+        args.additional = None
+
+    if args.stream:
+        with tempfile.TemporaryDirectory() as spill:
+            input_rows = spill_exports(args.hourly, args.daily, args.additional, spill, args.chunksize)
+            for month, final in clean_spilled_months(spill):
+                output_rows += len(final)
+                # Store each month as soon as it is done
+                write_readings(final, "purpleair", root=args.store)
+    else:
+        final, input_rows = clean_in_memory(args.hourly, args.daily, args.additional)
+        output_rows = len(final)
+        # Store final result (rewrites only the months present here)
+        write_readings(final, "purpleair", root=args.store)
 
-    C_p = float(str(C_p)[:str(C_p).find('.')+2]) if '.' in str(C_p) else float(C_p)
-
-    breakpoints = [
-        (0.0,   9.0,   0,   50),
-        (9.1,   35.4,  51,  100),
-        (35.5,  55.4,  101, 150),
-        (55.5,  125.4, 151, 200),
-        (125.5, 225.4, 201, 300),
-        (225.5, 500.4, 301, 500)
-    ]
-
-    for BP_Lo, BP_Hi, I_Lo, I_Hi in breakpoints:
-        if BP_Lo <= C_p <= BP_Hi:
-            I_p = ((I_Hi - I_Lo) / (BP_Hi - BP_Lo)) * (C_p - BP_Lo) + I_Lo
-            return round(I_p)
-
-    return None
-
-# Apply AQI calculations
-merged['pm2_5_1h_mean_aqi'] = merged['pm2_5_1h_mean'].apply(calculate_pm2_5_aqi)
-merged['pm2_5_24h_mean_aqi'] = merged['pm2_5_24h_mean'].apply(calculate_pm2_5_aqi)
-
-# Sort
-merged = merged.sort_values('time')
-
-# Process PurpleAir API data
-additional = additional.rename(columns={
-    'time_stamp': 'time',
-    'sensor_name': 'location_name',
-    'sensor_index': 'location_id',
-    'pm2.5_atm': 'pm2_5_1h_mean',
-    'temperature': 'temp',
-    'humidity': 'rh'
-})
-additional['time'] = pd.to_datetime(additional['time'], utc=True)
-additional['time'] = additional['time'].dt.tz_convert('US/Pacific').dt.tz_localize(None)
-
-# Clamp hourly PM2.5
-additional['pm2_5_1h_mean'] = additional['pm2_5_1h_mean'].clip(lower=0)
-
-# Add date column for grouping
-additional['date_only'] = additional['time'].dt.date
-
-# Calculate 24h average per sensor per day
-daily_avg = (
-    additional.groupby(['location_id', 'date_only'])['pm2_5_1h_mean']
-    .mean()
-    .reset_index()
-    .rename(columns={'pm2_5_1h_mean': 'pm2_5_24h_mean'})
-)
-
-# Clamp daily average
-daily_avg['pm2_5_24h_mean'] = daily_avg['pm2_5_24h_mean'].clip(lower=0)
-
-# Merge back into original hourly-level data
-additional = pd.merge(additional, daily_avg, on=['location_id', 'date_only'], how='left')
-
-# AQI Calculations
-additional['pm2_5_1h_mean_aqi'] = additional['pm2_5_1h_mean'].apply(calculate_pm2_5_aqi)
-additional['pm2_5_24h_mean_aqi'] = additional['pm2_5_24h_mean'].apply(calculate_pm2_5_aqi)
-
-# Column arrangement
-additional = additional[['time', 'location_name', 'location_id', 'latitude', 'longitude',
-                         'pm2_5_1h_mean', 'pm2_5_1h_mean_aqi',
-                         'pm2_5_24h_mean', 'pm2_5_24h_mean_aqi',
-                         'temp', 'rh', 'pressure']]
-
-# Sort
-additional = additional.sort_values('time')
-
-# Combine both datasets
-final = pd.concat([merged, additional], ignore_index=True)
-final = final.sort_values('time')
-
-# Reorder columns
-final = final[['time', 'location_name', 'location_id', 'latitude', 'longitude',
-               'pm2_5_1h_mean', 'pm2_5_1h_mean_aqi',
-               'pm2_5_24h_mean', 'pm2_5_24h_mean_aqi',
-               'temp', 'rh', 'elevation', 'pressure']]
-
-# Save final result
-final.to_csv("clean_purpleair.csv", index=False)
\ No newline at end of file
+    elapsed = time.perf_counter() - start
+    peak = peak_memory_mb()
+    print(f"✅ Cleaned {input_rows:,} input rows into {output_rows:,} readings in {elapsed:.1f} s "
+          f"({input_rows / elapsed:,.0f} rows/s)" + ("" if peak is None else f", peak memory {peak:,.0f} MB"))
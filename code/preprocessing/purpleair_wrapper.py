@@ -6,7 +6,11 @@ Provides a Python interface for interacting with the PurpleAir API.
 It includes:
 - Initialization with API key handling.
 - Methods to fetch latest sensor data by index.
-- Retrieval of historical PM2.5 data for multiple sensors.
+- Retrieval of historical PM2.5 data for multiple sensors, sequentially or with a pool of worker threads.
+- A pooled HTTP session, token-bucket limiters for the request rate and for the points each request is charged
+  (fields x rows returned), and retries with backoff on 429 and 5xx responses.
+- Splitting of long history requests into windows each average allows, with an optional on-disk checkpoint per
+  (sensor, window) so interrupted or repeated backfills only fetch what is missing.
 - Support for bounding box queries or filtering by sensor indices.
 - Formatting of API responses into pandas DataFrames.
 
@@ -15,18 +19,222 @@ Designed for clean integration of PurpleAir data into air quality pipelines and
 
 import requests
 import pandas as pd
+import hashlib
 import os
+import threading
 import time
-from typing import Optional, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Optional, List, Any, Dict, Tuple
+
+DEFAULT_BASE_URL = 'https://api.purpleair.com/v1/'
+
+# Status codes worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Points charged per field of each returned row; PurpleAir bills a few fields at a higher rate
+POINTS_PER_FIELD = 1
+
+# Seconds between two real-time (average 0) readings of a sensor
+REAL_TIME_INTERVAL = 120
+
+# Longest span of history (in days) requested at once for each average, per PurpleAir's looping API calls guide
+MAX_WINDOW_DAYS: Dict[int, int] = {
+    0: 2,
+    10: 3,
+    30: 7,
+    60: 14,
+    360: 90,
+    1440: 365,
+    10080: 1825,
+    43200: 7300,
+    525600: 36500,
+}
+
+
+def history_windows(start_timestamp: float, end_timestamp: float, average: int) -> List[Tuple[int, int]]:
+    """
+    Split a time range into consecutive windows no longer than the average allows.
+
+    Windows are aligned to multiples of the maximum window length since the UNIX epoch, so the same slots come up
+    on every run and stored windows can be reused; only the first and last windows are clipped to the range.
+
+    Parameters:
+    start_timestamp (float): Start of the range as a UNIX timestamp.
+    end_timestamp (float): End of the range as a UNIX timestamp.
+    average (int): The average in minutes, one of the keys of `MAX_WINDOW_DAYS`.
+
+    Returns:
+    List[Tuple[int, int]]: (start, end) UNIX timestamps of each window, in chronological order.
+    """
+    length = MAX_WINDOW_DAYS[average] * 86400
+    start, end = int(start_timestamp), int(end_timestamp)
+
+    windows = []
+    slot = start - start % length
+    while slot < end:
+        windows.append((max(start, slot), min(end, slot + length)))
+        slot += length
+    return windows
+
+
+class HistoryCheckpoints:
+    def __init__(self, root: str) -> None:
+        """
+        On-disk store of completed history windows, one CSV per (sensor, average, fields, window).
+
+        Files are laid out as `<root>/<sensor_index>/avg<average>_<fields hash>/<start>_<end>.csv` and written
+        atomically, so a file only exists once its window was fully fetched.
+
+        Parameters:
+        root (str): Directory holding the checkpoints. Created if needed.
+        """
+        self.root: str = root
+
+    def _directory(self, sensor_index: int, average: int, fields: List[str]) -> str:
+        fields_hash = hashlib.sha256(','.join(fields).encode()).hexdigest()[:12]
+        return os.path.join(self.root, str(sensor_index), f"avg{average}_{fields_hash}")
+
+    def load(self, sensor_index: int, average: int, fields: List[str], start: int, end: int) -> Optional[pd.DataFrame]:
+        """
+        Read a stored window covering [start, end], if there is one.
+
+        Parameters:
+        sensor_index (int): The sensor index.
+        average (int): The average in minutes.
+        fields (List[str]): The requested fields.
+        start (int): Window start as a UNIX timestamp.
+        end (int): Window end as a UNIX timestamp.
+
+        Returns:
+        Optional[pd.DataFrame]: The stored rows within the window, or None if the window was never fetched.
+        """
+        directory = self._directory(sensor_index, average, fields)
+        if not os.path.isdir(directory):
+            return None
+
+        for name in os.listdir(directory):
+            if not name.endswith('.csv'):
+                continue
+            stored_start, stored_end = (int(part) for part in name[:-len('.csv')].split('_'))
+
+            if stored_start <= start and stored_end >= end:
+                df = pd.read_csv(os.path.join(directory, name))
+
+                # A wider stored window holds rows outside the requested one
+                if (stored_start, stored_end) != (start, end) and 'time_stamp' in df.columns:
+                    df = df[(df['time_stamp'] >= start) & (df['time_stamp'] <= end)].reset_index(drop=True)
+                return df
+
+        return None
+
+    def save(self, df: pd.DataFrame, sensor_index: int, average: int, fields: List[str], start: int, end: int) -> None:
+        """
+        Store a fetched window, replacing shorter windows with the same start (e.g. a window that ended at "now").
+
+        Parameters:
+        df (pd.DataFrame): The rows returned for the window.
+        sensor_index (int): The sensor index.
+        average (int): The average in minutes.
+        fields (List[str]): The requested fields.
+        start (int): Window start as a UNIX timestamp.
+        end (int): Window end as a UNIX timestamp.
+        """
+        directory = self._directory(sensor_index, average, fields)
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, f"{start}_{end}.csv")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        df.to_csv(temporary, index=False)
+        os.replace(temporary, path)
+
+        for name in os.listdir(directory):
+            if name.startswith(f"{start}_") and name.endswith('.csv') and name != f"{start}_{end}.csv":
+                os.remove(os.path.join(directory, name))
+
+
+class RateLimiter:
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Token-bucket rate limiter shared by all threads making requests.
+
+        Parameters:
+        rate (float): Tokens added to the bucket per second.
+        capacity (float): Maximum number of tokens the bucket holds, i.e. the largest burst allowed.
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("Rate and capacity must be positive.")
+
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated: float = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        # Called with the lock held
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost: float = 1) -> None:
+        """
+        Block until `cost` tokens are available, then take them.
+
+        Parameters:
+        cost (float): Number of tokens the request uses (e.g. 1 per call, or the points it is charged).
+        """
+        if cost > self.capacity:
+            raise ValueError(f"Cost {cost} exceeds the bucket capacity {self.capacity}.")
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+
+                wait = (cost - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def charge(self, cost: float) -> None:
+        """
+        Take (or give back, if negative) tokens without waiting.
+
+        Used to settle the difference between what a request was expected to cost and what it did. The bucket may go
+        into debt, which the following `acquire` calls wait out.
+
+        Parameters:
+        cost (float): Number of tokens to take.
+        """
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - cost)
+
 
 class PurpleAirAPI:
-    def __init__(self, api_key: Optional[str] = None) -> None:
+    def __init__(self, api_key: Optional[str] = None, base_url: str = DEFAULT_BASE_URL,
+                 rate_limiter: Optional[RateLimiter] = None, max_retries: int = 5, backoff: float = 1.0,
+                 timeout: float = 30, pool_size: int = 10, points_limiter: Optional[RateLimiter] = None) -> None:
         """
         Initialize the PurpleAirAPI class.
 
         Parameters:
         api_key (Optional[str]): The API key for accessing the PurpleAir API. If None, the API will look for the key in the
         environment variable 'PURPLE_AIR_API_KEY'.
+        base_url (str): Root URL of the API, e.g. a local stand-in server for testing.
+        rate_limiter (Optional[RateLimiter]): Limiter applied to every request. If None, allows one request per second
+            with bursts of up to 5; tune it to the limits of your API key.
+        max_retries (int): Number of times a request is retried after a 429, a 5xx response, or a connection error.
+        backoff (float): Initial delay in seconds between retries, doubled after each attempt. A `Retry-After` header
+            takes precedence.
+        timeout (float): Timeout in seconds for each request.
+        pool_size (int): Maximum number of pooled connections kept open to the API.
+        points_limiter (Optional[RateLimiter]): Limiter charged the points of every request, `POINTS_PER_FIELD` per
+            field of each returned row, e.g. a bucket refilled at the rate your points budget allows. Requests wait
+            for their expected cost and the difference to the actual cost is settled from the response. If None,
+            points are not limited.
         """
         self.api_key: str = api_key or os.getenv('PURPLE_AIR_API_KEY')
         
@@ -35,11 +243,76 @@ class PurpleAirAPI:
             raise ValueError("API key is required. Please provide it as an argument or set the 'PURPLE_AIR_API_KEY' " \
                              "environment variable.")
 
-        self.base_url: str = 'https://api.purpleair.com/v1/'
+        self.base_url: str = base_url if base_url.endswith('/') else base_url + '/'
         self.headers: Dict[str, str] = {
             'X-API-Key': self.api_key
         }
 
+        self.rate_limiter: RateLimiter = rate_limiter or RateLimiter(rate=1.0, capacity=5)
+        self.points_limiter: Optional[RateLimiter] = points_limiter
+        self.max_retries: int = max_retries
+        self.backoff: float = backoff
+        self.timeout: float = timeout
+
+        # Reuse connections across requests and threads
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get(self, url: str, params: Dict[str, Any], rows: float = 1) -> Dict[str, Any]:
+        """
+        Send a rate-limited GET request, retrying with exponential backoff on transient failures.
+
+        Parameters:
+        url (str): The URL to request.
+        params (Dict[str, Any]): Query parameters, with the requested `fields`.
+        rows (float): Number of rows the response is expected to hold, to charge the points limiter up front.
+
+        Returns:
+        Dict[str, Any]: The decoded JSON response.
+        """
+        delay = self.backoff
+        expected = 0.0
+        if self.points_limiter:
+            # Waiting for more than the bucket holds would never end; the rest is charged as debt
+            expected = min(POINTS_PER_FIELD * len(params['fields'].split(',')) * rows, self.points_limiter.capacity)
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            if self.points_limiter:
+                self.points_limiter.acquire(expected)
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if self.points_limiter:
+                    self.points_limiter.charge(-expected)
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+                continue
+
+            if response.status_code == 200:
+                body = response.json()
+                if self.points_limiter:
+                    charged = POINTS_PER_FIELD * len(body.get('fields', [])) * len(body.get('data', []))
+                    self.points_limiter.charge(charged - expected)
+                return body
+
+            # Failed requests are not charged
+            if self.points_limiter:
+                self.points_limiter.charge(-expected)
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                raise Exception(f"Error fetching data: {response.status_code} - {response.text}")
+
+            # Honor the server's hint when it gives one
+            retry_after = response.headers.get('Retry-After')
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else delay)
+            delay *= 2
+
     def get_latest_data(self, sensor_index: int, fields: Optional[List[str]] = None) -> Any:
         """
         Get the latest data for a sensor index.
@@ -63,20 +336,14 @@ class PurpleAirAPI:
             raise ValueError(f"Sensor index must be a integer. Got {type(sensor_index)} instead.")
         
         url = url + str(sensor_index)
-        response = requests.get(url, headers=self.headers, params=params)
-        
-        # Check if the response is successful
-        if response.status_code == 200:
-            sensor_data = response.json()
+        sensor_data = self._get(url, params)
 
-            # Check if the response contains the expected data
-            if 'data' in sensor_data:
-                df = pd.DataFrame(sensor_data['data'], columns=sensor_data.get('fields', []))
-                df['sensor_index'] = sensor_index  # Add sensor index to the DataFrame
-            else:
-                raise Exception(f"Unexpected response format: {sensor_data}")
+        # Check if the response contains the expected data
+        if 'data' in sensor_data:
+            df = pd.DataFrame(sensor_data['data'], columns=sensor_data.get('fields', []))
+            df['sensor_index'] = sensor_index  # Add sensor index to the DataFrame
         else:
-            raise Exception(f"Error fetching data: {response.status_code} - {response.text}")
+            raise Exception(f"Unexpected response format: {sensor_data}")
 
         # Combine all data frames into one
         if df is not None:
@@ -85,7 +352,8 @@ class PurpleAirAPI:
             return pd.DataFrame()  # Return an empty DataFrame if no data is fetched
         
     def get_sensor_history(self, sensor_indices: List[int], fields: List[str], start_time: Optional[str] = None, 
-                           end_time: Optional[str] = None, average: Optional[int] = None) -> Any:
+                           end_time: Optional[str] = None, average: Optional[int] = None,
+                           max_workers: int = 1, checkpoint_dir: Optional[str] = None) -> Any:
         """
         Get the historical data for a list of sensor indices.
 
@@ -98,7 +366,13 @@ class PurpleAirAPI:
             0 (real-time), 10 (default if not specified), 30, 60, 360 (6 hour), 1440 (1 day), 
             10080 (1 week), 43200 (1 month), 525600 (1 year).
             The amount of data that can be returned in a single response depends on the average used. 
-            Time limits for each average are found in our looping API calls community article.
+            Longer ranges are split into windows within the limits in `MAX_WINDOW_DAYS`.
+        max_workers (int): Number of (sensor, window) requests made concurrently. 1 (default) fetches them one at a time.
+            Either way, requests go through the shared rate limiter and rows are ordered by sensor (as in
+            `sensor_indices`), then by window.
+        checkpoint_dir (Optional[str]): Directory where each completed (sensor, window) is stored. Windows already
+            stored there are read instead of fetched, so an interrupted backfill resumes where it stopped and a later
+            run with a newer `end_time` only fetches the new windows. If None, nothing is stored.
 
         Returns:
         Any: The historical data for the specified sensors.
@@ -125,45 +399,63 @@ class PurpleAirAPI:
                              "1440 (1 day), 10080 (1 week), 43200 (1 month), "
                              "525600 (1 year).")
 
-        # Check if the fields are provided
-        # If not, set default fields
-        params = {
-            'fields': ','.join(fields),
-            'start_timestamp': start_timestamp,
-            'end_timestamp': end_timestamp,
-            'average': average,
-        }
-        
-        data_frames = []
-
         for sensor_index in sensor_indices:
             if not isinstance(sensor_index, int):
                 raise ValueError(f"Sensor index must be an integer. Got {type(sensor_index)} instead.")
-            
-            # Replace the placeholder with the actual sensor index
+
+        checkpoints = HistoryCheckpoints(checkpoint_dir) if checkpoint_dir else None
+        windows = history_windows(start_timestamp, end_timestamp, average)
+        tasks = [(sensor_index, window) for sensor_index in sensor_indices for window in windows]
+
+        def fetch(task: Tuple[int, Tuple[int, int]]) -> pd.DataFrame:
+            sensor_index, (window_start, window_end) = task
+
+            if checkpoints:
+                df = checkpoints.load(sensor_index, average, fields, window_start, window_end)
+                if df is not None:
+                    return df
+
+            params = {
+                'fields': ','.join(fields),
+                'start_timestamp': window_start,
+                'end_timestamp': window_end,
+                'average': average,
+            }
             sensor_url = f"{self.base_url}sensors/{sensor_index}/history"
-            response = requests.get(sensor_url, headers=self.headers, params=params)
-            
-            # Check if the response is successful
-            if response.status_code == 200:
-                sensor_data = response.json()
-
-                # Check if the response contains the expected data
-                if 'data' in sensor_data:
-                    df = pd.DataFrame(sensor_data['data'], columns=sensor_data.get('fields', []))
-                    df['sensor_index'] = sensor_index  # Add sensor index to the DataFrame
-                    data_frames.append(df)
-                else:
-                    raise Exception(f"Unexpected response format: {sensor_data}")
+            interval = average * 60 if average else REAL_TIME_INTERVAL
+            sensor_data = self._get(sensor_url, params, rows=max((window_end - window_start) / interval, 1))
+
+            # Check if the response contains the expected data
+            if 'data' in sensor_data:
+                df = pd.DataFrame(sensor_data['data'], columns=sensor_data.get('fields', []))
+                df['sensor_index'] = sensor_index  # Add sensor index to the DataFrame
             else:
-                raise Exception(f"Error fetching data: {response.status_code} - {response.text}")
-            
-            # Add a delay to avoid hitting the API rate limit
-            time.sleep(5)  # Adjust the sleep time as needed
+                raise Exception(f"Unexpected response format: {sensor_data}")
+
+            if checkpoints:
+                checkpoints.save(df, sensor_index, average, fields, window_start, window_end)
+                # Read back so fetched and resumed windows come out with the same dtypes
+                return checkpoints.load(sensor_index, average, fields, window_start, window_end)
+            return df
+
+        # Results come back in task order regardless of which request finishes first
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                data_frames = list(executor.map(fetch, tasks))
+        else:
+            data_frames = [fetch(task) for task in tasks]
+
+        # Skip empty windows so they don't affect the combined dtypes
+        data_frames = [df for df in data_frames if not df.empty] or data_frames[:1]
 
         # Combine all data frames into one
         if data_frames:
-            return pd.concat(data_frames, ignore_index=True)
+            df = pd.concat(data_frames, ignore_index=True)
+
+            # A reading on the boundary between two windows can be returned by both
+            if 'time_stamp' in df.columns:
+                df = df.drop_duplicates(subset=['sensor_index', 'time_stamp'], ignore_index=True)
+            return df
         else:
             return pd.DataFrame()
         
@@ -207,19 +499,13 @@ class PurpleAirAPI:
             params['selat'] = se_lat
             params['selng'] = se_lng
 
-        response = requests.get(url, headers=self.headers, params=params)
-        
-        # Check if the response is successful
-        if response.status_code == 200:
-            sensor_data = response.json()
+        sensor_data = self._get(url, params, rows=len(sensor_indices.split(',')) if sensor_indices else 1)
 
-            # Check if the response contains the expected data
-            if 'data' in sensor_data:
-                df = pd.DataFrame(sensor_data['data'], columns=sensor_data.get('fields', []))
-            else:
-                raise Exception(f"Unexpected response format: {sensor_data}")
+        # Check if the response contains the expected data
+        if 'data' in sensor_data:
+            df = pd.DataFrame(sensor_data['data'], columns=sensor_data.get('fields', []))
         else:
-            raise Exception(f"Error fetching data: {response.status_code} - {response.text}")
+            raise Exception(f"Unexpected response format: {sensor_data}")
 
         # Combine all data frames into one
         if df is not None:
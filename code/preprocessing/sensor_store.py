@@ -0,0 +1,245 @@
+"""
+Sensor Reading Store
+
+Stores cleaned sensor readings in a Parquet dataset partitioned by source and month, replacing the full-rewrite
+`clean_*.csv` files.
+
+It provides:
+- Upserting writes: only the months present in new data are rewritten, and rows already stored for the same
+  location and time are replaced.
+- A loader with column projection and date-range filtering, which skips the months outside the range.
+- Typed columns, so readers no longer re-parse text and datetimes.
+- A helper (and command line entry point) to import an existing cleaned CSV. A source that is not stored yet is
+  imported from the committed `clean_<source>.csv` next to the store on first read, so a fresh checkout works as is.
+- Per-month partition signatures, so derived data can be refreshed for the months that changed.
+
+The dataset lives in `data/sensor_store/` with one `source=<name>/month=<YYYY-MM>/part-0.parquet` file per partition.
+"""
+
+import argparse
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Dataset root, anchored to the repository so scripts run from any directory share it
+STORE_PATH = str(Path(__file__).resolve().parents[2] / "data" / "sensor_store")
+
+# Sources written by the preprocessing scripts
+SOURCES = ("clarity", "purpleair", "api_purpleair")
+
+# Columns identifying one reading
+KEY_COLUMNS = ("location_id", "time")
+
+PARTITION_FILE = "part-0.parquet"
+
+# First line of a Git LFS pointer, left in place of a data file when LFS objects are not fetched
+LFS_POINTER = b"version https://git-lfs.github.com/spec/"
+
+
+def _source_path(source: str, root: str) -> str:
+    return os.path.join(root, f"source={source}")
+
+
+def _partition_path(source: str, month: str, root: str) -> str:
+    return os.path.join(_source_path(source, root), f"month={month}", PARTITION_FILE)
+
+
+def write_readings(df: pd.DataFrame, source: str, root: str = STORE_PATH,
+                   key: Sequence[str] = KEY_COLUMNS) -> List[str]:
+    """
+    Add readings to the store, replacing stored rows with the same key.
+
+    Parameters:
+    df (pd.DataFrame): Readings with a `time` column (datetime or parseable strings).
+    source (str): Source partition to write to, e.g. "clarity".
+    root (str): Dataset root directory.
+    key (Sequence[str]): Columns identifying a reading. Stored rows matching a new row on all of them are dropped;
+        rows within `df` are written as given.
+
+    Returns:
+    List[str]: The months (YYYY-MM) that were rewritten.
+
+    Raises:
+    ValueError: If a reading has no time, since it belongs to no month partition.
+    """
+    df = df.copy()
+    df["time"] = pd.to_datetime(df["time"])
+    missing = int(df["time"].isna().sum())
+    if missing:
+        raise ValueError(f"{missing} of {len(df)} {source} readings have no time; drop or fix them before writing.")
+    months = df["time"].dt.strftime("%Y-%m")
+
+    # One schema for every partition written from this frame
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    key = list(key)
+
+    written = []
+    for month, part in df.groupby(months, sort=True):
+        path = _partition_path(source, month, root)
+
+        if os.path.exists(path):
+            stored = pd.read_parquet(path)
+            replaced = pd.MultiIndex.from_frame(stored[key]).isin(pd.MultiIndex.from_frame(part[key]))
+            part = pd.concat([stored[~replaced], part], ignore_index=True)
+            schema = pa.unify_schemas([schema, pa.Schema.from_pandas(part, preserve_index=False)],
+                                      promote_options="permissive")
+
+        part = part.sort_values("time", kind="stable")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp"
+        part.to_parquet(temporary, index=False, schema=schema)
+        os.replace(temporary, path)
+        written.append(month)
+
+    return written
+
+
+def available_sources(root: str = STORE_PATH) -> List[str]:
+    """
+    List the sources present in the store.
+
+    Parameters:
+    root (str): Dataset root directory.
+
+    Returns:
+    List[str]: Source names, sorted.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("source="))
+
+
+def partition_signatures(source: str, root: str = STORE_PATH) -> Dict[str, Tuple[int, int]]:
+    """
+    Fingerprint the month partitions of a source by modification time and size, so derived data can be updated for
+    the changed months only.
+
+    Parameters:
+    source (str): Source name.
+    root (str): Dataset root directory.
+
+    Returns:
+    Dict[str, Tuple[int, int]]: (mtime_ns, size) per month (YYYY-MM); empty if the source is not stored.
+    """
+    path = _source_path(source, root)
+    if not os.path.isdir(path):
+        return {}
+
+    signatures = {}
+    for name in sorted(os.listdir(path)):
+        partition = os.path.join(path, name, PARTITION_FILE)
+        if name.startswith("month=") and os.path.exists(partition):
+            stat = os.stat(partition)
+            signatures[name.split("=", 1)[1]] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+def committed_csv(source: str, root: str = STORE_PATH) -> str:
+    """
+    Path of the committed cleaned CSV of a source, next to the store folder.
+
+    Parameters:
+    source (str): Source name.
+    root (str): Dataset root directory.
+
+    Returns:
+    str: Path of `clean_<source>.csv` in the folder containing `root`.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(root)), f"clean_{source}.csv")
+
+
+def _source_dataset(source: str, root: str) -> ds.Dataset:
+    path = _source_path(source, root)
+    if not os.path.isdir(path):
+        csv = committed_csv(source, root)
+        if not os.path.exists(csv):
+            raise FileNotFoundError(f"No readings stored for source '{source}' in {root}, and no {csv} to import.")
+        with open(csv, "rb") as f:
+            if f.read(len(LFS_POINTER)) == LFS_POINTER:
+                raise FileNotFoundError(f"{csv} is a Git LFS pointer; run `git lfs pull` to fetch it.")
+        import_csv(csv, source, root=root)
+
+    partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+
+    # Partitions written at different times may disagree on types (e.g. an all-null column)
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    schema = pa.unify_schemas(schemas + [pa.schema([("month", pa.string())])], promote_options="permissive")
+    return ds.dataset(path, format="parquet", partitioning=partitioning, schema=schema)
+
+
+def load_readings(sources: Union[str, Sequence[str], None] = None, columns: Optional[Sequence[str]] = None,
+                  start: Optional[str] = None, end: Optional[str] = None, root: str = STORE_PATH) -> pd.DataFrame:
+    """
+    Load readings from the store.
+
+    Parameters:
+    sources (Union[str, Sequence[str], None]): One source, several sources, or None for all of them. When more than
+        one source is read, a `source` column is added.
+    columns (Optional[Sequence[str]]): Columns to read. If None, reads all columns.
+    start (Optional[str]): Keep readings at or after this time (anything `pd.Timestamp` accepts).
+    end (Optional[str]): Keep readings at or before this time.
+    root (str): Dataset root directory.
+
+    Returns:
+    pd.DataFrame: The matching readings in time order per source. Only the months overlapping [start, end] are read.
+    """
+    single = isinstance(sources, str)
+    if sources is None:
+        sources = available_sources(root)
+    elif single:
+        sources = [sources]
+
+    # Month partitions prune whole files; the time filter trims the edge months
+    expression = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        expression = (ds.field("month") >= start.strftime("%Y-%m")) & (ds.field("time") >= start.to_datetime64())
+    if end is not None:
+        end = pd.Timestamp(end)
+        condition = (ds.field("month") <= end.strftime("%Y-%m")) & (ds.field("time") <= end.to_datetime64())
+        expression = condition if expression is None else expression & condition
+
+    frames = []
+    for source in sources:
+        dataset = _source_dataset(source, root)
+        names = [name for name in (columns or dataset.schema.names) if name != "month"]
+        df = dataset.to_table(columns=names, filter=expression).to_pandas()
+
+        if not single:
+            df.insert(0, "source", source)
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=list(columns or []))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def import_csv(path: str, source: str, root: str = STORE_PATH) -> List[str]:
+    """
+    Import a cleaned CSV (e.g. an existing `clean_clarity.csv`) into the store.
+
+    Parameters:
+    path (str): Path of the CSV, which must have a `time` column.
+    source (str): Source partition to write to.
+    root (str): Dataset root directory.
+
+    Returns:
+    List[str]: The months (YYYY-MM) that were written.
+    """
+    return write_readings(pd.read_csv(path, parse_dates=["time"]), source, root=root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a cleaned sensor CSV into the Parquet sensor store.")
+    parser.add_argument("csv", help="Path of the cleaned CSV, e.g. data/clean_clarity.csv")
+    parser.add_argument("source", choices=SOURCES, help="Source the readings belong to")
+    args = parser.parse_args()
+
+    months = import_csv(args.csv, args.source)
+    print(f"✅ Imported {args.csv} into {STORE_PATH} ({len(months)} months)")
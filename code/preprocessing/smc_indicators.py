@@ -0,0 +1,202 @@
+"""
+San Mateo County Health Indicators
+
+Reads the San Mateo County indicator exports in `data/smc_indicators/` (one long-format CSV per indicator) into the
+wide table of latest values per tract used to compute the Health Risk Index.
+
+It provides:
+- The tracts of South San Francisco and San Bruno that the indicators are kept for.
+- Parsing of each indicator file that reads only the location, period and value columns and skips breakout rows.
+- Selection of the latest period per tract from the years parsed out of every period at once (e.g. "2019-2023" is
+  2023).
+- A cache of the parsed files keyed by their hashes, so only new or changed files are parsed again, in parallel.
+- The wide `all_indicators` table, optionally joined with the CalEnviroScreen 4.0 results.
+
+This replaces the per-tract `find_max` loop of `health_preproc.ipynb` and gives the same table.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+from fingerprint import file_hash
+
+# Default source, cache and output paths (relative to the repository root)
+INDICATORS_DIR = "data/smc_indicators"
+CACHE_PATH = "data/smc_indicators_cache.json"
+OUTPUT_PATH = "data/all_indicators.csv"
+
+# Tracts of each city as listed by the county ("P" marks a tract only partly inside the city)
+SSF_TRACTS = [
+    "6001P", "6017", "6018P", "6018", "6019", "6019.01", "6019.02", "6020P", "6020.01", "6020.02", "6021", "6022",
+    "6022.02", "6022.01", "6023P", "6024P", "6024", "6025", "6026", "6026.02", "6038.01", "6038.02", "6039", "6040",
+    "6041.02P", "6041.03", "6041.04", "6042P",
+]
+SB_TRACTS = [
+    "6023P", "6030P", "6035P", "6036P", "6037", "6038P", "6039P", "6040", "6041.01P", "6041.02P", "6042P", "6046P",
+    "6135.01P",
+]
+OTHER_TRACTS = ["6016.01", "6027", "6140", "6016.03", "6016.05"]
+
+# Rows of the output table, in the notebook's order (tracts in both lists appear twice, as they always have)
+TRACTS = [tract.replace("P", "") for tract in SSF_TRACTS + SB_TRACTS + OTHER_TRACTS]
+
+# Columns read from each indicator file; everything else (long descriptions, confidence intervals, ...) is skipped
+LOCATION_COLUMN = "Location"
+VALUE_COLUMN = "Indicator Rate Value"
+PERIOD_COLUMN = "Period of Measure"
+BREAKOUT_COLUMN = "Breakout Category"
+COLUMNS = (LOCATION_COLUMN, VALUE_COLUMN, PERIOD_COLUMN, BREAKOUT_COLUMN)
+
+# CalEnviroScreen columns dropped before the join
+CES_DROP_COLUMNS = ["Census Tract", "California County", "ZIP", "Approximate Location", "Longitude", "Latitude"]
+
+# Files parsed at the same time
+PARSE_WORKERS = 8
+
+
+def tract_names(locations: pd.Series) -> pd.Series:
+    """
+    Convert 10-digit census tract codes (e.g. 6081601901) to the county's tract names (e.g. "6019.01").
+
+    Parameters:
+    locations (pd.Series): Tract codes as numbers or strings.
+
+    Returns:
+    pd.Series: Tract names, without the decimal part when it is "00".
+    """
+    codes = locations.astype("int64").astype(str)
+    number = codes.str[4:-2]
+    decimal = codes.str[-2:]
+    return number.where(decimal == "00", number + "." + decimal)
+
+
+def latest_values(path: str) -> Dict[str, float]:
+    """
+    Read one indicator file and keep the value of the latest period of each tract.
+
+    Parameters:
+    path (str): Indicator CSV exported from the county's indicator portal.
+
+    Returns:
+    Dict[str, float]: Indicator value per tract name (None where the value is missing).
+    """
+    rows = pd.read_csv(path, usecols=lambda column: column in COLUMNS, dtype={PERIOD_COLUMN: str})
+    if BREAKOUT_COLUMN in rows:
+        rows = rows[rows[BREAKOUT_COLUMN].isna()]
+    rows = rows.dropna(subset=[LOCATION_COLUMN])
+
+    # Year a period ends in ("2019-2023" -> 2023, "2022" -> 2022); the first row of the latest one wins
+    year = pd.to_numeric(rows[PERIOD_COLUMN].str.rsplit("-", n=1).str[-1], errors="coerce")
+    latest = (rows.assign(tract=tract_names(rows[LOCATION_COLUMN]), year=year)
+              .sort_values("year", ascending=False, kind="stable")
+              .drop_duplicates("tract"))
+    values = latest[VALUE_COLUMN].astype(float)
+    return dict(zip(latest["tract"], values.where(values.notna(), None)))
+
+
+def load_cache(path: str) -> Dict[str, Dict]:
+    """
+    Read the parsed indicator cache.
+
+    Parameters:
+    path (str): Path of the cache JSON.
+
+    Returns:
+    Dict[str, Dict]: Cached `source` hash and `values` per indicator file name; empty if there is no cache.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cache(cache: Dict[str, Dict], path: str) -> None:
+    """
+    Write the parsed indicator cache atomically.
+
+    Parameters:
+    cache (Dict[str, Dict]): Cached `source` hash and `values` per indicator file name.
+    path (str): Path of the cache JSON.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(cache, f)
+    os.replace(temporary, path)
+
+
+def load_indicators(directory: str = INDICATORS_DIR, tracts: Sequence[str] = TRACTS,
+                    cache_path: Optional[str] = CACHE_PATH, workers: int = PARSE_WORKERS) -> pd.DataFrame:
+    """
+    Build the wide table of latest indicator values per tract.
+
+    Parameters:
+    directory (str): Folder of indicator CSVs; each file's name (without extension) names its indicator.
+    tracts (Sequence[str]): Tract names of the output rows, in order.
+    cache_path (Optional[str]): Cache of parsed files; None parses every file.
+    workers (int): Files parsed at the same time.
+
+    Returns:
+    pd.DataFrame: `tract` and one column per indicator (in file name order), NaN where a tract has no value.
+    """
+    files = sorted(name for name in os.listdir(directory) if name.endswith(".csv"))
+    paths = [os.path.join(directory, name) for name in files]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths) or 1))) as pool:
+        sources = list(pool.map(file_hash, paths))
+
+        cache = load_cache(cache_path) if cache_path else {}
+        stale = [i for i, name in enumerate(files) if cache.get(name, {}).get("source") != sources[i]]
+        for i, values in zip(stale, pool.map(latest_values, [paths[i] for i in stale])):
+            cache[files[i]] = {"source": sources[i], "values": values}
+
+    if cache_path and (stale or set(cache) != set(files)):
+        save_cache({name: cache[name] for name in files}, cache_path)
+
+    table = pd.DataFrame({"tract": list(tracts)})
+    for name in files:
+        indicator = name.split(".")[0]
+        table[indicator] = table["tract"].map(cache[name]["values"]).astype(float)
+    return table
+
+
+def read_calenviroscreen(path: str, county: str = "San Mateo") -> pd.DataFrame:
+    """
+    Read the CalEnviroScreen 4.0 results for the tracts of one county.
+
+    Parameters:
+    path (str): CalEnviroScreen 4.0 results as the state's Excel workbook or a CSV export of its first sheet.
+    county (str): County whose tracts are kept.
+
+    Returns:
+    pd.DataFrame: `tract` and the CalEnviroScreen indicators, without the location columns.
+    """
+    if path.endswith((".xlsx", ".xls")):
+        results = pd.read_excel(path, sheet_name=0)
+    else:
+        results = pd.read_csv(path)
+
+    results = results[results["California County"] == county].copy()
+    results["tract"] = tract_names(results["Census Tract"])
+    return results.drop(columns=CES_DROP_COLUMNS)
+
+
+def all_indicators(indicators: pd.DataFrame, calenviroscreen: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Join the county indicators with the CalEnviroScreen results, as saved to `data/all_indicators.csv`.
+
+    Parameters:
+    indicators (pd.DataFrame): Output of `load_indicators`.
+    calenviroscreen (Optional[pd.DataFrame]): Output of `read_calenviroscreen`; None keeps the county indicators only.
+
+    Returns:
+    pd.DataFrame: One row per row of `indicators`, with the CalEnviroScreen columns appended.
+    """
+    if calenviroscreen is None:
+        return indicators
+    calenviroscreen = calenviroscreen[calenviroscreen["tract"].isin(set(indicators["tract"]))]
+    return pd.merge(indicators, calenviroscreen, on="tract", how="left")
+
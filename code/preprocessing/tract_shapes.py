@@ -0,0 +1,121 @@
+"""
+Tract Display Shapes
+
+Produces the lightweight tract geometry the dashboard draws, while the full geometry stays in the tract files used
+for spatial joins.
+
+It provides:
+- Topology-preserving simplification of the tract coverage, so neighboring tracts keep sharing their edges.
+- Coordinate quantization to a 0.00001 degree grid (about 1 m).
+- A compact GeoJSON artifact holding only the tract ids, tagged with the hash of the file it was built from.
+- Automatic rebuilds when the source tracts change.
+
+The dashboard embeds the tract polygons in every map it renders, so smaller shapes mean a smaller page on every rerun.
+"""
+
+import json
+import os
+from typing import Dict
+
+import geopandas as gpd
+import shapely
+from shapely.geometry import mapping
+
+from fingerprint import file_hash
+
+# Default artifact and source paths (relative to the repository root)
+SHAPES_PATH = "data/tracts_display.geojson"
+TRACTS_PATH = "data/tracts_with_combined_aqi.geojson"
+
+# Simplification tolerance in meters, below a pixel at the closest zoom the dashboard uses
+SIMPLIFY_TOLERANCE_M = 3.0
+
+# Coordinate grid in degrees (about 1.1 m north-south and 0.9 m east-west at this latitude)
+GRID_SIZE = 1e-5
+COORDINATE_DECIMALS = 5
+
+# Projected CRS for metric tolerances (UTM zone 10N covers the Bay Area)
+METRIC_CRS = "EPSG:32610"
+
+
+def simplify_tracts(tracts: gpd.GeoDataFrame, tolerance_m: float = SIMPLIFY_TOLERANCE_M,
+                    grid_size: float = GRID_SIZE) -> gpd.GeoSeries:
+    """
+    Simplify the tract polygons as one coverage and snap them to a coordinate grid.
+
+    Parameters:
+    tracts (gpd.GeoDataFrame): Tracts with polygon geometry.
+    tolerance_m (float): Simplification tolerance in meters.
+    grid_size (float): Grid the WGS84 coordinates are snapped to, in degrees.
+
+    Returns:
+    gpd.GeoSeries: Simplified geometry in EPSG:4326, aligned with `tracts`.
+    """
+    projected = tracts.geometry.to_crs(METRIC_CRS)
+
+    # Shared edges are simplified once, so the result has no gaps or overlaps between tracts
+    simplified = gpd.GeoSeries(shapely.coverage_simplify(projected.values, tolerance_m), index=tracts.index,
+                               crs=METRIC_CRS).to_crs("EPSG:4326")
+
+    # Shared vertices land on the same grid point, and set_precision keeps each polygon valid
+    return gpd.GeoSeries(shapely.set_precision(simplified.values, grid_size), index=tracts.index, crs="EPSG:4326")
+
+
+def _rounded(coordinates):
+    # Snapped coordinates can still print as e.g. -122.46376000000001; round them to the grid's decimals
+    if isinstance(coordinates[0], float):
+        return [round(value, COORDINATE_DECIMALS) for value in coordinates]
+    return [_rounded(part) for part in coordinates]
+
+
+def build_display_shapes(tracts_path: str = TRACTS_PATH, path: str = SHAPES_PATH) -> Dict[str, Dict]:
+    """
+    Write the display shapes of a tract file.
+
+    Parameters:
+    tracts_path (str): Path of the full-resolution tract GeoJSON.
+    path (str): Destination path.
+
+    Returns:
+    Dict[str, Dict]: GeoJSON geometry per tract id.
+    """
+    tracts = gpd.read_file(tracts_path)
+    shapes = {
+        geoid: {"type": geometry["type"], "coordinates": _rounded(geometry["coordinates"])}
+        for geoid, geometry in zip(tracts["geoid"].astype(str), map(mapping, simplify_tracts(tracts)))
+    }
+
+    collection = {
+        "type": "FeatureCollection",
+        "source": file_hash(tracts_path),
+        "features": [{"type": "Feature", "properties": {"geoid": geoid}, "geometry": geometry}
+                     for geoid, geometry in shapes.items()],
+    }
+
+    # No whitespace keeps the file compact
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(collection, f, separators=(",", ":"))
+    os.replace(temporary, path)
+    return shapes
+
+
+def ensure_display_shapes(tracts_path: str = TRACTS_PATH, path: str = SHAPES_PATH) -> Dict[str, Dict]:
+    """
+    Load the display shapes, rebuilding them first if the tract file changed since they were built.
+
+    Parameters:
+    tracts_path (str): Path of the full-resolution tract GeoJSON.
+    path (str): Path of the display shapes artifact.
+
+    Returns:
+    Dict[str, Dict]: GeoJSON geometry per tract id.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            collection = json.load(f)
+        if collection.get("source") == file_hash(tracts_path):
+            return {feature["properties"]["geoid"]: feature["geometry"] for feature in collection["features"]}
+
+    return build_display_shapes(tracts_path, path)
+
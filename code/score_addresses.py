@@ -0,0 +1,68 @@
+"""
+Batch Address Scoring
+
+This script scores a CSV of addresses or coordinates with the dashboard's data, for outreach lists too long to search
+one by one on the dashboard.
+
+It performs the following steps:
+- Reads the input CSV in batches. Rows need an address column, `latitude` and `longitude` columns, or both.
+- Geocodes the addresses of rows without coordinates (address points and the geocode cache first, then Nominatim from
+  parallel workers, spaced out to its rate limit).
+- Finds the census tract of every location and its composite risk score.
+- Finds the nearest monitors and predicts the predictability of a monitor at the location.
+- Appends each scored batch to the output CSV as soon as it is done.
+
+Example:
+    python code/score_addresses.py addresses.csv scored.csv --air-weight 70
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dashboard.geocode import (ADDRESS_POINTS_PATH, CACHE_PATH, GEOCODE_WORKERS, NOMINATIM_INTERVAL, GeocodeCache,
+                               Geocoder, OfflineGeocoder)
+from dashboard.risk import DEFAULT_AIR_WEIGHT
+from dashboard.scoring import BATCH_SIZE, AddressScorer
+
+# Repository root, so the dashboard's data is found from any working directory
+ROOT = Path(__file__).resolve().parents[1]
+
+parser = argparse.ArgumentParser(description="Score addresses or coordinates with tract risk and predicted predictability.")
+parser.add_argument("input", help="CSV with an address column and/or latitude and longitude columns")
+parser.add_argument("output", help="Destination CSV (overwritten)")
+parser.add_argument("--address-column", default="address", help="Column holding the addresses")
+parser.add_argument("--air-weight", type=int, default=DEFAULT_AIR_WEIGHT,
+                    help="Weight of air quality in the composite risk score, in percent")
+parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows scored at a time")
+parser.add_argument("--workers", type=int, default=GEOCODE_WORKERS, help="Parallel geocoding workers")
+parser.add_argument("--offline", action="store_true",
+                    help="Never call Nominatim; use only the address points and the geocode cache")
+args = parser.parse_args()
+
+if not 0 <= args.air_weight <= 100:
+    sys.exit("--air-weight must be between 0 and 100")
+
+address_points = ROOT / ADDRESS_POINTS_PATH
+geocoder = Geocoder(
+    GeocodeCache(str(ROOT / CACHE_PATH)),
+    OfflineGeocoder.from_file(str(address_points)) if address_points.exists() else None,
+    offline=args.offline,
+    min_interval=NOMINATIM_INTERVAL,
+)
+scorer = AddressScorer.from_files(str(ROOT), geocoder=geocoder, air_weight=args.air_weight)
+
+start = time.perf_counter()
+rows = located = 0
+temporary = f"{args.output}.tmp"
+for i, batch in enumerate(scorer.score_csv(args.input, address_column=args.address_column,
+                                           batch_size=args.batch_size, workers=args.workers)):
+    batch.to_csv(temporary, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    rows += len(batch)
+    located += int(batch["latitude"].notna().sum())
+    print(f"  {rows} rows scored ({rows / (time.perf_counter() - start):.0f} rows/s)", flush=True)
+os.replace(temporary, args.output)
+
+print(f"✅ Scored {rows} rows ({located} located) into {args.output}")
@@ -6,6 +6,7 @@ This Streamlit app visualizes air pollution and health risk in South San Francis
 It provides:
 - An interactive map showing composite risk scores by census tract, combining air quality and health risk.
 - Locations of air quality monitors with a predictability index.
+- Live NowCast AQI of PurpleAir sensors and tracts, when a PurpleAir API key is configured.
 - Address search with local risk and predictability estimates.
 - Additional figures and context about environmental and health analysis.
 
@@ -14,20 +15,24 @@ Users can adjust the weighting of air quality vs. health risk, search by address
 
 import pandas as pd  
 import streamlit as st  
-import geopandas as gpd 
 import branca.colormap as cm  
 import folium  
 from streamlit_folium import st_folium   
-from geopy.geocoders import Nominatim 
-from geopy.distance import geodesic
-import pickle
-from sklearn.ensemble import RandomForestRegressor
+
+from dashboard.data import AQI_PERIOD, get_dashboard_data, get_live_air_quality, range_risk
+from dashboard.geocode import get_geocoder
+from dashboard.layers import live_layer, monitor_layer, predictability_overlay
+from dashboard.risk import DEFAULT_AIR_WEIGHT, PRESET_AIR_WEIGHTS, style_function
+from predictability.neighbors import neighbor_features
 
 # Page Config
 st.set_page_config(page_title="Rise South City Community Dashboard", layout="wide")
 
-# Load predictability data for sensors
-pred_df = pd.read_csv("data/combined_scores.csv")
+# Load shared data (read from disk once per process, reloaded only when a source file changes)
+data = get_dashboard_data()
+
+# Predictability data for sensors
+pred_df = data.monitors
 
 # Tabs
 tab1, tab2 = st.tabs(["Risk Analysis", "Additional Information"])
@@ -61,6 +66,19 @@ translations = {
         "Predictability Score": "Índice de Predictibilidad",
         "Consistency Score": "Índice de Consistencia",
         "Address": "Dirección",
+        "Monitors": "Monitores",
+        "Predicted Predictability": "Predictibilidad Pronosticada",
+        "Show predictability surface": "Mostrar superficie de predictibilidad",
+        "Air Quality Date Range": "Rango de Fechas de la Calidad del Aire",
+        "The air quality part of the score uses the sensor readings from these days.": "La parte de calidad del aire del índice usa las lecturas de los monitores de estos días.",
+        "No air quality readings in this date range.": "No hay lecturas de calidad del aire en este rango de fechas.",
+        "Shade the map with the predicted predictability of a monitor placed at each location.": "Sombrear la mapa con la predictibilidad pronosticada de un monitor ubicado en cada lugar.",
+        "Show live air quality": "Mostrar calidad del aire en vivo",
+        "Shade tracts and sensors with the current NowCast AQI of PurpleAir sensors.": "Sombrear los tramos y monitores con el AQI NowCast actual de los monitores PurpleAir.",
+        "Live AQI (NowCast)": "AQI en Vivo (NowCast)",
+        "Sensors": "Monitores",
+        "Live readings updated at": "Lecturas en vivo actualizadas a las",
+        "No live AQI yet: the NowCast needs readings from 2 of the last 3 hours.": "Todavía no hay AQI en vivo: el NowCast necesita lecturas de 2 de las últimas 3 horas.",
         "Insights & Interpretation": "Conocimientos & Interpretación", """
     ### 🧪 Composite Risk Score
 
@@ -120,18 +138,33 @@ def t(message):
     else:
         return translations[language][message]
 
-# Risk Analysis Tab
-with tab1:
-    # Language selection
-    language = st.selectbox(
-        label=t("Select Language"),
-        options=["English", "Español"]
-    )
+# Figures are read from disk once per process
+@st.cache_resource(show_spinner=False)
+def load_figure(path):
+    with open(path, "rb") as f:
+        return f.read()
 
-    # Map Section
-    st.title(t("Neighborhood Risk Map"))
-    st.write(t("See how air quality and health risk vary across neighborhoods. Adjust the balance below to update the map."))
-    
+# Layers that stay the same whatever the controls: tiles, monitors and legends
+def base_map(color_scale):
+    m = folium.Map(location=list(data.map_center), zoom_start=12, tiles="cartodbpositron")
+
+    # Continuous color scale of the choropleth
+    risk_colormap = cm.linear.YlOrRd_09.scale(0, 1)
+    risk_colormap.caption = t("Composite Risk Score")
+    risk_colormap.add_to(m)
+
+    # All monitors as one GeoJSON layer, colored by predictability and clustered when zoomed out
+    monitor_layer(pred_df, color_scale, name=t("Monitors"), predictability_label=t("Predictability Score"),
+                  consistency_label=t("Consistency Score")).add_to(m)
+
+    # Add legend to map
+    color_scale.add_to(m)
+    return m
+
+# Map controls and the map rerun on their own, without the rest of the page. The base map renders identically on
+# every run, so the browser keeps it (and the current view) and only swaps the layers passed as feature groups.
+@st.fragment
+def risk_map():
     # Composite Risk Score Weights
     st.subheader(t("Adjust Map Risk Balance"))
 
@@ -146,52 +179,38 @@ with tab1:
         index=0
     )
 
-    if preset == opts[1]:
-        air_weight = 50
-    elif preset == opts[2]:
-        air_weight = 70
-    elif preset == opts[3]:
-        air_weight = 30
-    else:
+    if preset == opts[3]:
         air_weight = st.slider(
-            t("Air Quality Weight (%)"), 0, 100, 50,
+            t("Air Quality Weight (%)"), 0, 100, DEFAULT_AIR_WEIGHT,
             help=t("Slide right for more air quality, left for more health.")
         )
+    else:
+        air_weight = PRESET_AIR_WEIGHTS[opts.index(preset)]
 
     health_weight = 100 - air_weight
 
     st.write(f"**{t('Air Quality')}:** {air_weight}%   |   **{t('Health')}:** {health_weight}%")
     
-    # Load and process data for map
-    clarity = pd.read_csv("data/clean_clarity.csv")
-    purpleair = pd.read_csv("data/clean_purpleair.csv")
-    health_risk = pd.read_csv("data/health_risk_index.csv")
-    tracts = gpd.read_file("data/census.geojson")
-    geojson_path = "data/tracts_with_combined_aqi.geojson"
-    tracts_with_data = gpd.read_file(geojson_path)
-
-    # Merge health risk data into tracts GeoDataFrame
-    health_risk["geoid"] = "06081" + (health_risk["tract"] * 100).astype(int).astype(str)
-    tracts_with_data = tracts_with_data.merge(health_risk, on="geoid")
-
-    # Normalize air quality and compute composite risk score
-    tracts_with_data["air_norm"] = tracts_with_data["combined_aqi"] / tracts_with_data["combined_aqi"].max()
-    tracts_with_data["health_norm"] = tracts_with_data["Health Risk Index"]  # Already 0-1
-
-    air_frac = air_weight / 100
-    health_frac = health_weight / 100
-
-    tracts_with_data["risk_index"] = (
-        air_frac * tracts_with_data["air_norm"] +
-        health_frac * tracts_with_data["health_norm"]
-    )
+    # Air quality period: the stored scores by default, or any range of days covered by the daily tract rollup
+    risk_layer = data.risk
+    if data.rollup is not None:
+        first_day, last_day = data.rollup.days[0].item(), data.rollup.days[-1].item()
+        default_period = (min(max(AQI_PERIOD[0], first_day), last_day), max(min(AQI_PERIOD[1], last_day), first_day))
+        period = st.date_input(
+            t("Air Quality Date Range"), value=default_period, min_value=first_day, max_value=last_day,
+            help=t("The air quality part of the score uses the sensor readings from these days.")
+        )
+
+        # While the second date is being picked, keep the current map
+        if len(period) == 2 and tuple(period) != default_period:
+            risk_layer = range_risk(data, *period)
+            if not risk_layer.geoids:
+                st.warning(t("No air quality readings in this date range."))
 
-    # Drop any rows with missing data
-    tracts_with_data = tracts_with_data.dropna(subset=["risk_index"])
+    # Composite risk score payload for this balance (cached per weight, geometry serialised once)
+    risk_payload = risk_layer.payload(air_weight)
 
-    # Set map center based on tract centroids
-    center = tracts_with_data.geometry.centroid.unary_union.centroid
-    map_center = [center.y, center.x]
+    map_center = list(data.map_center)
 
     # Address Search
     st.subheader(t("Search by Address"))
@@ -199,20 +218,13 @@ with tab1:
     marker_coords = None
     zoom_level = 12
 
-    # Geocode address using Nominatim (cached for performance)
-    @st.cache_data(show_spinner=False)
-    def geocode_address(address):
-        geolocator = Nominatim(user_agent="rise-south-city", timeout=5)
+    if search_query:
+        # Geocode the address in both cities at once (local address points and cached results first)
         try:
-            return geolocator.geocode(address)
+            location = get_geocoder().geocode(search_query)
         except Exception as e:
             st.error(f"{t('Geocoding error')}: {e}")
-            return None
-        
-    if search_query:
-        # Try to geocode the address in both cities
-        location = (geocode_address(f"{search_query}, South San Francisco, CA") or
-                    geocode_address(f"{search_query}, San Bruno, CA"))
+            location = None
         if location:
             marker_coords = [location.latitude, location.longitude]
             map_center = marker_coords
@@ -220,25 +232,20 @@ with tab1:
         else:
             st.warning(t("Address not found. Please try again."))
 
+    # Create color scale for predictability index
+    min_val = pred_df['predictability'].min()
+    max_val = pred_df['predictability'].max()
+    color_scale = cm.linear.PuBuGn_09.scale(min_val, max_val).to_step(n=10)
+    color_scale.caption = t("Predictability Score")
+
     # Folium Map Creation 
-    m = folium.Map(location=map_center, zoom_start=zoom_level, tiles="cartodbpositron")
-
-    if tracts_with_data is not None and not tracts_with_data.empty:
-        # Choropleth layer using continuous color scale
-        risk_colormap = cm.linear.YlOrRd_09.scale(0, 1)
-        risk_colormap.caption = t("Composite Risk Score")
-
-        def style_function(feature):
-            risk = feature["properties"]["risk_index"]
-            return {
-                "fillOpacity": 0.8,
-                "weight": 0.5,
-                "color": "black",
-                "fillColor": risk_colormap(risk)
-            }
+    m = base_map(color_scale)
 
+    # Choropleth layer using continuous color scale
+    risk_group = folium.FeatureGroup(name=t("Composite Risk Score"))
+    if risk_payload["features"]:
         folium.GeoJson(
-            tracts_with_data,
+            risk_payload,
             name=t("Composite Risk Score"),
             style_function=style_function,
             tooltip=folium.GeoJsonTooltip(
@@ -247,77 +254,67 @@ with tab1:
                 localize=True,
                 sticky=True
             )
-        ).add_to(m)
-
-        risk_colormap.add_to(m)
-
-    # Load model for predictability
-    with open("data/rf_predictability_model.pkl", "rb") as f:
-        rf_model = pickle.load(f)
-
-    # Separate Clarity and PurpleAir monitors
-    clarity_locations = pred_df[~pred_df['location_id'].str.isnumeric()][['latitude', 'longitude', 'predictability', 'consistency']]
-    purpleair_locations = pred_df[pred_df['location_id'].str.isnumeric()][['latitude', 'longitude', 'predictability', 'consistency']]
-
-    # Create color scale for predictability index
-    min_val = pred_df['predictability'].min()
-    max_val = pred_df['predictability'].max()
-    color_scale = cm.linear.PuBuGn_09.scale(min_val, max_val).to_step(n=10)
-    color_scale.caption = t("Predictability Score")
-
-    # Function to add monitor markers to map
-    def add_monitors(df, label):
-        for _, row in df.iterrows():
-            predictability = round(row['predictability'], 0)
-            consistency = round(row['consistency'], 0) if not pd.isnull(row['consistency']) else "N/A"
-            color = color_scale(predictability)
-            folium.CircleMarker(
-                location=[row['latitude'], row['longitude']],
-                radius=5,
-                color=color,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.7,
-                tooltip=f"{label} Monitor<br>{t('Predictability Score')}: {int(predictability)}%<br>{t('Consistency Score')}: {int(consistency)}%"
-            ).add_to(m)
-
-    add_monitors(clarity_locations, "Clarity")
-    add_monitors(purpleair_locations, "PurpleAir")
-
-    # Add legend to map
-    color_scale.add_to(m)
+        ).add_to(risk_group)
+    layers = [risk_group]
+
+    # Optional heatmap of the precomputed predictability surface, sharing the monitor legend
+    if st.checkbox(t("Show predictability surface"),
+                   help=t("Shade the map with the predicted predictability of a monitor placed at each location.")):
+        surface_group = folium.FeatureGroup(name=t("Predicted Predictability"))
+        predictability_overlay(data.surface, color_scale, name=t("Predicted Predictability")).add_to(surface_group)
+        layers.append(surface_group)
+
+    # Live NowCast AQI, polled in the background when a PurpleAir API key is configured
+    live = get_live_air_quality()
+    if live is not None and st.checkbox(t("Show live air quality"),
+                                        help=t("Shade tracts and sensors with the current NowCast AQI of PurpleAir sensors.")):
+        live_sensors = live.sensors()
+        if live_sensors["aqi"].notna().any():
+            layers.append(live_layer(live_sensors, live.tract_aqi(), data.shapes, name=t("Live AQI (NowCast)"),
+                                     aqi_label=t("Live AQI (NowCast)"), sensors_label=t("Sensors")))
+            updated = pd.Timestamp(live.last_poll, unit="s", tz="UTC").tz_convert("America/Los_Angeles")
+            st.caption(f"{t('Live readings updated at')} {updated:%H:%M}")
+        else:
+            st.info(t("No live AQI yet: the NowCast needs readings from 2 of the last 3 hours."))
 
     # Add Red Pin for Search Result (if used)
     if marker_coords:
-        # Find 5 closest monitors
-        all_monitors = pred_df[['latitude', 'longitude', 'predictability', 'consistency']].copy()
-        all_monitors['distance'] = all_monitors.apply(
-            lambda row: geodesic((row['latitude'], row['longitude']), marker_coords).miles, axis=1
-        )
-        closest_monitors = all_monitors.nsmallest(5, 'distance')
-
-        if not closest_monitors.empty:
-            # Build feature row for model
-            feature_row = {}
-            for i, n_row in enumerate(closest_monitors.itertuples(), start=1):
-                feature_row[f'neighbor_{i}_distance'] = n_row.distance
-                feature_row[f'neighbor_{i}_predictability'] = n_row.predictability
-                feature_row[f'neighbor_{i}_consistency'] = n_row.consistency
+        # Read the precomputed surface; outside its extent, run the model on the 5 closest monitors
+        predicted_index = data.surface.lookup(marker_coords[0], marker_coords[1])[0]
 
-            feature_df = pd.DataFrame([feature_row])
+        if pd.isnull(predicted_index):
+            feature_df = neighbor_features(pred_df, data.monitor_index, [marker_coords[0]], [marker_coords[1]])
+            if not feature_df.empty:
+                predicted_index = data.model.predict(feature_df)[0]
 
-            # Predict using model
-            predicted_index = rf_model.predict(feature_df)[0]
+        if not pd.isnull(predicted_index):
             predicted_index = round(predicted_index, 0)
 
+            pin_group = folium.FeatureGroup(name=t("Address"))
             folium.Marker(
                 location=marker_coords,
                 tooltip=f"<b>{t('Address')}:</b> {search_query}<br><b>{t('Predicted Predictability')}:</b> {int(predicted_index)}%",
                 icon=folium.Icon(color="red", icon="map-pin", prefix="fa")
-            ).add_to(m)
+            ).add_to(pin_group)
+            layers.append(pin_group)
+
+    # Render Map in Streamlit; nothing is returned, so panning and zooming never rerun the app
+    st_folium(m, key="risk_map", feature_group_to_add=layers, center=map_center, zoom=zoom_level,
+              returned_objects=[], use_container_width=True, height=700)
+
+# Risk Analysis Tab
+with tab1:
+    # Language selection
+    language = st.selectbox(
+        label=t("Select Language"),
+        options=["English", "Español"]
+    )
+
+    # Map Section
+    st.title(t("Neighborhood Risk Map"))
+    st.write(t("See how air quality and health risk vary across neighborhoods. Adjust the balance below to update the map."))
 
-    # Render Map in Streamlit 
-    st_folium(m, use_container_width=True, height=700)
+    risk_map()
 
     # Insights & Interpretation 
     st.title(t("Insights & Interpretation"))
@@ -355,17 +352,18 @@ with tab1:
     """))
 
 
-# Additional Information Tab
+# Additional Information Tab (static; the map fragment never reruns it)
 with tab2:
     st.title(t("Additional Information"))
     st.write(t("This section provides additional figures and context for environmental and health analysis."))
 
     # Display air traffic and PM2.5 timeline figure
-    st.image('figures/air_traffic.png')
+    st.image(load_figure('figures/air_traffic.png'))
     st.info(t('PM2.5 and Airport Traffic Timeline: This visualization displays monthly passenger traffic at San Francisco International Airport (bottom, January 2018 to December 2024). The sharp drop in air travel during the early months of the COVID-19 pandemic (2020) aligned with a noticeable decline in PM2.5 levels, suggesting that reduced airport operations may have improved local air quality. As air traffic rebounded in 2021 and beyond, PM2.5 concentrations also rose, pointing to a potential connection between flight activity and pollution levels. However, a late-2020 spike in PM2.5 was likely driven by wildfires, underscoring that airport emissions are just one piece of a larger puzzle. This natural experiment — where travel volume changed drastically while other factors held steady — offers a rare opportunity to isolate the airport’s contribution to regional air pollution. For communities near SFO, who already face multiple environmental and socioeconomic stressors, understanding this relationship is vital. These insights can inform targeted air quality interventions, regulatory strategies, and long-term planning to reduce the cumulative burden of pollution.'))
     
     # Display sensor predictability and uninsured percentage figures
-    st.image(['figures/predictability/clarity_predictability.png', 'figures/predictability/clarity_corrs.png'])
+    st.image([load_figure('figures/predictability/clarity_predictability.png'),
+              load_figure('figures/predictability/clarity_corrs.png')])
     st.info(t("Sensor Predictability over Percentage Uninsured: The two figures above show sensor locations (Purple and Clarity, respectively), along with a predictability index for each sensor, correlations between sensor readings, and ACS estimates of percentage uninsured for the census tracts in which the sensors were located. The 'predictability index' here is simply the maximum correlation that a sensor had with any others, intended to illustrate possible sensor redundancies. In areas where sensors are highly redundant — that is, another sensor's data can be used to accurately predict hourly readings — there may be less of a need for more nearby sensors. This is overlaid on the percentage of uninsured residents in each tract to highlight areas where people may be most vulnerable to the health effects of air pollution. Those who are uninsured cannot easily access the treatments that would help them recover from, or maintain resilience to, poor air quality. Overall, the purpose of this figure is to show where additional air sensors are most needed. If an area has low health insurance coverage and low sensor redundancy, it might benefit from the placement of new sensors so that community members can take steps to protect their health."))
 
 # --- Footer ---
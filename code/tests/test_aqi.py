@@ -0,0 +1,67 @@
+"""
+Tests of the vectorized PM2.5 AQI (see `preprocessing/aqi.py`) against the former per-row `calculate_pm2_5_aqi`.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from preprocessing.aqi import pm2_5_aqi, pm2_5_aqi_series, truncate_pm2_5  # noqa: E402
+
+
+# The function formerly copied into clean_purpleair.py and clean_clarity.py, applied row by row
+def calculate_pm2_5_aqi(C_p):
+    if pd.isna(C_p):
+        return None
+
+    C_p = float(str(C_p)[:str(C_p).find('.')+2]) if '.' in str(C_p) else float(C_p)
+
+    breakpoints = [
+        (0.0,   9.0,   0,   50),
+        (9.1,   35.4,  51,  100),
+        (35.5,  55.4,  101, 150),
+        (55.5,  125.4, 151, 200),
+        (125.5, 225.4, 201, 300),
+        (225.5, 500.4, 301, 500)
+    ]
+
+    for BP_Lo, BP_Hi, I_Lo, I_Hi in breakpoints:
+        if BP_Lo <= C_p <= BP_Hi:
+            I_p = ((I_Hi - I_Lo) / (BP_Hi - BP_Lo)) * (C_p - BP_Lo) + I_Lo
+            return round(I_p)
+
+    return None
+
+
+def old_aqi(values: np.ndarray) -> np.ndarray:
+    return pd.Series(values).apply(calculate_pm2_5_aqi).to_numpy(dtype=float, na_value=np.nan)
+
+
+def test_randomized_parity_with_per_row_function():
+    rng = np.random.default_rng(0)
+    uniform = rng.uniform(1e-4, 600, 100_000)
+    rounded = np.concatenate([uniform[:20_000].round(1), uniform[20_000:40_000].round(2),
+                              uniform[40_000:60_000].round(3)])
+    near_edges = (np.array([9.0, 9.1, 35.4, 35.5, 55.4, 55.5, 125.4, 125.5, 225.4, 225.5, 500.4])[:, None]
+                  + np.array([-0.05, -0.01, -0.001, 0.0, 0.001, 0.01, 0.049, 0.05, 0.09])).ravel()
+    special = np.array([np.nan, np.inf, -np.inf, -1.0, -0.05, 35.49, 0.1 + 0.2, 1e6])
+    values = np.concatenate([[0.0, 500.5], uniform, rounded, near_edges, special])
+
+    np.testing.assert_array_equal(pm2_5_aqi(values), old_aqi(values))
+
+
+def test_tiny_concentrations_differ_deliberately():
+    # str(6.5e-06) is "6.5e-06", which the old slicing read as 6.5 (AQI 36); EPA truncation gives 0.0 (AQI 0)
+    values = np.array([6.5e-06, 9.9e-05])
+    assert old_aqi(values).tolist() == [36.0, 52.0]
+    assert truncate_pm2_5(values).tolist() == [0.0, 0.0]
+    assert pm2_5_aqi(values).tolist() == [0.0, 0.0]
+
+
+def test_series_dtypes_follow_apply():
+    assert pm2_5_aqi_series(pd.Series([4.0, 12.3])).dtype == "int64"
+    assert pm2_5_aqi_series(pd.Series([4.0, np.nan])).dtype == "float64"
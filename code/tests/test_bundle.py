@@ -0,0 +1,66 @@
+"""
+Tests of the versioned dashboard bundle (see `dashboard/bundle.py`) and the source hashes checked against it.
+"""
+
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box, mapping
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import fingerprint  # noqa: E402
+from dashboard.bundle import CURRENT_NAME, DashboardBundle, current_version, read_manifest, write_bundle  # noqa: E402
+from predictability.surface import PredictabilitySurface  # noqa: E402
+
+
+def build(path: Path, tmp_path: Path, model: str) -> str:
+    tracts = gpd.GeoDataFrame({"geoid": ["06081000100"], "air_norm": [0.5]}, geometry=[box(0, 0, 1, 1)],
+                              crs="EPSG:4326")
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(pickle.dumps(model))
+    surface = PredictabilitySurface(values=np.zeros((2, 2)), south=0.0, west=0.0, step=0.5)
+    return write_bundle(str(path), {"model.pkl": [1, 2, model]}, tracts, {"06081000100": mapping(box(0, 0, 1, 1))},
+                        pd.DataFrame({"monitor": ["a"]}), str(model_path), surface, None, (0.5, 0.5), (0.5, 0.5))
+
+
+def test_readers_keep_the_version_they_opened(tmp_path):
+    path = tmp_path / "bundle"
+    first = build(path, tmp_path, "first")
+    opened = DashboardBundle.open(str(path))
+    assert opened.path == first and read_manifest(str(path))["sources"] == {"model.pkl": [1, 2, "first"]}
+
+    # The previous version is kept for processes still reading it; older ones are removed
+    second = build(path, tmp_path, "second")
+    third = build(path, tmp_path, "third")
+    assert current_version(str(path)) == third
+    assert sorted(os.listdir(path)) == sorted([CURRENT_NAME, os.path.basename(second), os.path.basename(third)])
+
+    # The model and tract geometry of the removed first version are still those of the first build
+    assert opened.model() == "first"
+    assert opened.tract_geometries()["geoid"].tolist() == ["06081000100"]
+    assert DashboardBundle.open(str(path)).model() == "third"
+
+
+def test_missing_bundle(tmp_path):
+    assert read_manifest(str(tmp_path)) is None
+    assert current_version(str(tmp_path)) is None
+
+
+def test_content_hashes_skip_unchanged_files(tmp_path, monkeypatch):
+    (tmp_path / "scores.csv").write_text("monitor\n")
+    known = fingerprint.ContentHashes(tmp_path)
+    digest = known.file("scores.csv")
+
+    hashed = []
+    monkeypatch.setattr(fingerprint, "file_hash", lambda path: hashed.append(path) or "changed")
+    hashes = fingerprint.ContentHashes(tmp_path, known.known)
+    assert hashes.file("scores.csv") == digest and not hashed
+
+    (tmp_path / "scores.csv").write_text("monitor\nadded\n")
+    assert hashes.file("scores.csv") == "changed" and len(hashed) == 1
@@ -0,0 +1,29 @@
+"""
+Tests of the consistency scoring (see `predictability/consistency.py`) with the real XGBoost classifier.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+pytest.importorskip("xgboost")
+
+from predictability.consistency import fold_scores  # noqa: E402
+
+
+def test_fold_scores_skip_levels_missing_from_training():
+    # Levels 0, 1 and 3 of 4; XGBoost only accepts consecutive labels from 0
+    rng = np.random.default_rng(0)
+    labels = np.repeat([0, 1, 3], 100)
+    inputs = 10 * labels[:, None] + rng.normal(0, 0.1, (len(labels), 6))
+    names = np.where(np.arange(len(labels)) % 2, "a", "b")
+    train, validation = np.arange(0, len(labels), 2), np.arange(1, len(labels), 2)
+
+    scores = fold_scores(inputs, labels, names, train, validation, n_classes=4)
+
+    # Every validation window is predicted right; the absent level scores 0 in the macro average
+    assert scores == {"a": pytest.approx(0.75)}
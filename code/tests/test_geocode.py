@@ -0,0 +1,61 @@
+"""
+Tests of the address geocoder (see `dashboard/geocode.py`) with a stand-in for Nominatim.
+"""
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from dashboard.geocode import GeocodeCache, Geocoder  # noqa: E402
+
+
+class FakeNominatim:
+    def __init__(self, found):
+        self.found = found
+        self.queries = []
+
+    def geocode(self, query):
+        self.queries.append((query, time.time()))
+        if query not in self.found:
+            return None
+        return SimpleNamespace(latitude=37.65, longitude=-122.42, address=query)
+
+
+def geocoder(tmp_path, found, min_interval=0.0) -> Geocoder:
+    geocoder = Geocoder(GeocodeCache(str(tmp_path / "cache.sqlite")), min_interval=min_interval)
+    geocoder.nominatim = FakeNominatim(found)
+    return geocoder
+
+
+def test_second_city_is_queried_only_after_a_miss(tmp_path):
+    first = geocoder(tmp_path, {"1 Main St, South San Francisco, CA"})
+    assert first.geocode("1 Main St").address == "1 Main St, South San Francisco, CA"
+    assert [query for query, _ in first.nominatim.queries] == ["1 Main St, South San Francisco, CA"]
+
+    second = geocoder(tmp_path, {"2 Main St, San Bruno, CA"})
+    assert second.geocode("2 Main St").address == "2 Main St, San Bruno, CA"
+    assert [query for query, _ in second.nominatim.queries] == ["2 Main St, South San Francisco, CA",
+                                                                "2 Main St, San Bruno, CA"]
+
+    # Both cities are cached now, including the miss
+    assert second.geocode("2 Main St").address == "2 Main St, San Bruno, CA"
+    assert len(second.nominatim.queries) == 2
+
+
+def test_spacing_is_shared_through_the_cache(tmp_path, monkeypatch):
+    # Two caches on one database stand for two processes; with the clock stopped, each slot follows the last one
+    monkeypatch.setattr(time, "time", lambda: 1000.0)
+    first, second = GeocodeCache(str(tmp_path / "cache.sqlite")), GeocodeCache(str(tmp_path / "cache.sqlite"))
+    delays = [cache.reserve_request(0.2) for cache in (first, second, first, second)]
+    assert delays == pytest.approx([0.0, 0.2, 0.4, 0.6])
+
+    # The same service from a geocoder sharing the database waits for the reserved slots
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    geocoder(tmp_path, set(), min_interval=0.2).geocode("1 Main St")
+    assert sleeps == pytest.approx([0.8, 1.0])
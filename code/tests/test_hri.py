@@ -0,0 +1,71 @@
+"""
+Tests of the Health Risk Index (see `health/hri.py`) against the row-wise computation of `health.ipynb`.
+"""
+
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from health.hri import EQUITY_INDICATOR, RRI_WEIGHTS, HealthRiskIndex  # noqa: E402
+
+
+def notebook_hri(all_indicator_data: pd.DataFrame, rri_weights) -> pd.DataFrame:
+    # The cells of health.ipynb before the move to hri.py
+    all_indicator_data = all_indicator_data.copy()
+
+    def compute_rri(row):
+        rri = 0
+
+        for indicator, w in rri_weights.items():
+            if math.isnan(row[indicator]):
+                rri += w * all_indicator_data[indicator].mean()
+            else:
+                rri += w * row[indicator]
+
+        return rri
+
+    all_indicator_data['Respiratory Risk Index'] = all_indicator_data.apply(compute_rri, axis=1)
+
+    hei = all_indicator_data['Health Equity Index']
+    rri = all_indicator_data['Respiratory Risk Index']
+    hei = hei / hei.max()
+    rri = rri / rri.max()
+
+    all_indicator_data['Health Risk Index'] = 2 * hei * rri / (hei + rri)
+    return all_indicator_data
+
+
+@pytest.fixture
+def indicators() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    tracts = 40
+    data = {"tract": 6000 + np.arange(tracts) / 100, "County": "San Mateo"}
+    for indicator in [*RRI_WEIGHTS, EQUITY_INDICATOR, "Uninsured"]:
+        values = rng.uniform(1, 100, tracts)
+        values[rng.random(tracts) < 0.15] = np.nan
+        data[indicator] = values
+
+    # An indicator no tract reports, and which carries no weight
+    data["Drinking Water"] = np.nan
+    return pd.DataFrame(data)
+
+
+@pytest.mark.parametrize("weights", [RRI_WEIGHTS, {"Asthma": 1.0, "Uninsured": 0.25, "Lead": 0.0}])
+def test_matches_notebook(indicators, weights):
+    expected = notebook_hri(indicators, weights)
+    index = HealthRiskIndex(indicators)
+
+    np.testing.assert_allclose(index.rri(weights), expected["Respiratory Risk Index"], rtol=1e-12)
+    np.testing.assert_allclose(index.hri(weights), expected["Health Risk Index"], rtol=1e-12)
+    assert not np.isnan(index.rri(weights)).any()
+
+
+def test_unknown_indicator(indicators):
+    with pytest.raises(ValueError, match="Unknown indicators: Smoking"):
+        HealthRiskIndex(indicators).rri({"Smoking": 1.0})
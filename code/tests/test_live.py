@@ -0,0 +1,116 @@
+"""
+Tests of the live NowCast service (see `air_quality/live.py`), polling the local fake PurpleAir server.
+"""
+
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from air_quality.fake_purpleair import DEFAULT_BOUNDS, FakePurpleAir  # noqa: E402
+from air_quality.live import NOWCAST_HOURS, LiveAirQuality, NowCastBuffer, nowcast  # noqa: E402
+from preprocessing.purpleair_wrapper import PurpleAirAPI, RateLimiter  # noqa: E402
+
+# Start of an hour, in UNIX time
+HOUR = 3600
+T0 = 1_700_000_000 // HOUR * HOUR
+
+
+def test_nowcast_needs_two_of_the_three_latest_hours():
+    hourly = np.full((3, NOWCAST_HOURS), 10.0)
+    hourly[0, 1:3] = np.nan
+    hourly[1, 1] = np.nan
+    hourly[2, 0] = np.nan
+
+    result = nowcast(hourly)
+    assert np.isnan(result[0])
+    assert result[1] == pytest.approx(10.0)
+    assert result[2] == pytest.approx(10.0)
+
+
+def test_nowcast_weight_factor():
+    # Lowest / highest = 20 / 30, above the floor
+    hourly = np.full((2, NOWCAST_HOURS), np.nan)
+    hourly[0, :3] = [20.0, 25.0, 30.0]
+    w = 20 / 30
+    expected = (20 + w * 25 + w ** 2 * 30) / (1 + w + w ** 2)
+
+    # Lowest / highest = 0.1, floored at 0.5
+    hourly[1, :3] = [10.0, 100.0, 40.0]
+    floored = (10 + 0.5 * 100 + 0.25 * 40) / (1 + 0.5 + 0.25)
+
+    assert nowcast(hourly) == pytest.approx([expected, floored])
+
+
+def test_buffer_clears_reused_hours():
+    buffer = NowCastBuffer(hours=NOWCAST_HOURS)
+    buffer.add([1, 2], [10.0, 50.0], [T0, T0])
+    buffer.add([1, 2], [20.0, 60.0], [T0 + HOUR, T0 + HOUR])
+    assert buffer.snapshot()["nowcast"].notna().all()
+
+    # Hour T0 + 12h reuses the column of T0, which must not keep its sums
+    assert buffer.add([1], [30.0], [T0 + NOWCAST_HOURS * HOUR]) == 1
+    column = (T0 // HOUR) % NOWCAST_HOURS
+    assert buffer.sums[buffer.rows[1], column] == 30.0
+    assert buffer.counts[buffer.rows[2], column] == 0
+
+    # Readings older than the buffer are skipped, and once every hour rolled over there is no NowCast
+    assert buffer.add([3], [70.0], [T0]) == 0
+    buffer.advance(T0 + 3 * NOWCAST_HOURS * HOUR)
+    assert buffer.snapshot()["nowcast"].isna().all()
+    assert not buffer.counts.any()
+
+
+def test_buffer_grows_and_skips_repeated_readings():
+    buffer = NowCastBuffer()
+    sensors = np.arange(100)
+    assert buffer.add(sensors, np.full(100, 5.0), np.full(100, T0)) == 100
+    assert buffer.add(sensors, np.full(100, 9.0), np.full(100, T0)) == 0
+
+    snapshot = buffer.snapshot()
+    assert len(buffer) == 100
+    assert snapshot["sensor_index"].tolist() == sensors.tolist()
+    assert (snapshot["pm2_5"] == 5.0).all()
+
+
+@pytest.fixture
+def fake():
+    clock = [float(T0)]
+    server = FakePurpleAir(sensors=20, clock=lambda: clock[0])
+    server.clock_value = clock
+    server.url = server.start()
+    yield server
+    server.stop()
+
+
+def test_poll_against_fake_server(fake):
+    api = PurpleAirAPI(api_key="test", base_url=fake.url, rate_limiter=RateLimiter(rate=1000, capacity=1000))
+    tracts = gpd.GeoDataFrame({"geoid": ["06081000100"]}, geometry=[box(*DEFAULT_BOUNDS)], crs="EPSG:4326")
+    live = LiveAirQuality(api, DEFAULT_BOUNDS, tracts=tracts)
+
+    assert live.poll(now=fake.clock_value[0]) == 20
+    assert live.poll(now=fake.clock_value[0]) == 0
+    readings = [live.sensors()["pm2_5"].to_numpy()]
+    assert live.sensors()["nowcast"].isna().all()
+
+    # Two minutes later every sensor reports again; an hour later two of the three latest hours have readings
+    for step in (120, HOUR):
+        fake.clock_value[0] += step
+        assert live.poll(now=fake.clock_value[0]) == 20
+        readings.append(live.sensors()["pm2_5"].to_numpy())
+
+    hourly = np.full((20, NOWCAST_HOURS), np.nan)
+    hourly[:, 0], hourly[:, 1] = readings[2], (readings[0] + readings[1]) / 2
+    sensors = live.sensors()
+    assert sensors["nowcast"].to_numpy() == pytest.approx(nowcast(hourly).round(1))
+    assert sensors["aqi"].notna().all()
+    assert (sensors["geoid"] == "06081000100").all()
+
+    tract = live.tract_aqi()
+    assert tract["sensors"].tolist() == [20]
+    assert tract["aqi"].iloc[0] == sensors["aqi"].median()
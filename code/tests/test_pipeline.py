@@ -0,0 +1,98 @@
+"""
+Tests of the stage graph and caching of the data pipeline (see `pipeline.py`), with small scripts in a temporary root.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline import Pipeline, Stage, script_modules, stage_order  # noqa: E402
+
+# Appends a line naming the script to its output, after copying its first argument (if it exists) into it
+SCRIPT = """import os, sys
+source, output = sys.argv[1], sys.argv[2]
+text = open(source).read() if os.path.exists(source) else ""
+with open(output, "w") as f:
+    f.write(text + os.path.basename(sys.argv[0]) + "\\n")
+"""
+
+
+def script(root: Path, name: str) -> str:
+    (root / f"{name}.py").write_text(SCRIPT)
+    return f"{name}.py"
+
+
+def stage(root: Path, name: str, source: str, output: str, **kwargs) -> Stage:
+    return Stage(name, script(root, name), inputs=kwargs.pop("inputs", (source,)), outputs=(output,),
+                 args=(source, output), **kwargs)
+
+
+def pipeline(root: Path, stages, **kwargs) -> Pipeline:
+    return Pipeline(stages, root=root, state_path=root / "state.json", **kwargs)
+
+
+def statuses(results) -> dict:
+    return {result.name: result.status for result in results}
+
+
+def test_in_place_updates_run_once_per_outside_change(tmp_path):
+    (tmp_path / "scores.csv").write_text("monitor\n")
+    stages = [stage(tmp_path, "first", "scores.csv", "scores.csv", optional=("scores.csv",)),
+              stage(tmp_path, "second", "scores.csv", "scores.csv"),
+              stage(tmp_path, "report", "scores.csv", "report.txt")]
+
+    # Stages updating the same file run in the listed order instead of waiting on each other
+    assert stage_order(stages) == ["first", "second", "report"]
+
+    assert set(statuses(pipeline(tmp_path, stages).run()).values()) == {"ran"}
+    assert (tmp_path / "scores.csv").read_text() == "monitor\nfirst.py\nsecond.py\n"
+    assert set(statuses(pipeline(tmp_path, stages).run()).values()) == {"cached"}
+
+    (tmp_path / "scores.csv").write_text("monitor\nadded\n")
+    assert set(statuses(pipeline(tmp_path, stages).run()).values()) == {"ran"}
+    assert set(statuses(pipeline(tmp_path, stages).run()).values()) == {"cached"}
+
+
+@pytest.mark.parametrize("committed", [True, False])
+def test_missing_external_input(tmp_path, committed):
+    if committed:
+        (tmp_path / "tracts.csv").write_text("committed\n")
+    (tmp_path / "weights.txt").write_text("weights\n")
+    stages = [stage(tmp_path, "tracts", "census.geojson", "tracts.csv"),
+              stage(tmp_path, "bundle", "tracts.csv", "bundle.txt", inputs=("tracts.csv", "rollup.npz"),
+                    optional=("rollup.npz",)),
+              stage(tmp_path, "weights", "weights.txt", "weights.json")]
+    results = statuses(pipeline(tmp_path, stages, external={"census.geojson": "from the census"}).run())
+    assert results["tracts"] == "unavailable" and results["weights"] == "ran"
+
+    # The committed output of an unavailable stage is used as is
+    assert results["bundle"] == ("ran" if committed else "unavailable")
+    assert (tmp_path / "bundle.txt").exists() == committed
+
+
+def test_missing_unknown_input_fails(tmp_path):
+    stages = [stage(tmp_path, "clean", "export.csv", "store.csv"), stage(tmp_path, "use", "store.csv", "out.csv")]
+    assert statuses(pipeline(tmp_path, stages, external={}).run()) == {"clean": "failed", "use": "skipped"}
+
+
+def test_imported_modules_key_the_stage(tmp_path):
+    # The script imports a package module, which imports a module next to the script; neither is listed
+    (tmp_path / "code" / "lib").mkdir(parents=True)
+    (tmp_path / "code" / "lib" / "__init__.py").write_text("")
+    (tmp_path / "code" / "lib" / "rates.py").write_text("import os\nfrom helpers import scale\n")
+    (tmp_path / "code" / "helpers.py").write_text("scale = 1\n")
+    (tmp_path / "code" / "report.py").write_text("import sys\nfrom lib import rates\n" + SCRIPT)
+    (tmp_path / "scores.csv").write_text("monitor\n")
+    stages = [Stage("report", "code/report.py", inputs=("scores.csv",), outputs=("report.txt",),
+                    args=("scores.csv", "report.txt"))]
+
+    assert script_modules("code/report.py", tmp_path) == ["code/helpers.py", "code/lib/__init__.py",
+                                                          "code/lib/rates.py"]
+    assert statuses(pipeline(tmp_path, stages).run()) == {"report": "ran"}
+    assert statuses(pipeline(tmp_path, stages).run()) == {"report": "cached"}
+
+    (tmp_path / "code" / "helpers.py").write_text("scale = 2\n")
+    assert statuses(pipeline(tmp_path, stages).run()) == {"report": "ran"}
@@ -0,0 +1,92 @@
+"""
+Tests of the PurpleAir history fetching against the local fake server (see `air_quality/fake_purpleair.py`).
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from air_quality.fake_purpleair import FakePurpleAir  # noqa: E402
+from preprocessing.purpleair_wrapper import PurpleAirAPI, RateLimiter  # noqa: E402
+
+FIELDS = ["time_stamp", "pm2.5_atm"]
+SENSORS = [100003, 100000, 100002]
+
+# Seven days of 10-minute averages, split into three-day windows
+START, END = "2024-03-01T00:00:00Z", "2024-03-08T00:00:00Z"
+
+
+@pytest.fixture
+def fake():
+    server = FakePurpleAir(sensors=5)
+    server.url = server.start()
+    yield server
+    server.stop()
+
+
+def client(fake, **kwargs) -> PurpleAirAPI:
+    kwargs.setdefault("rate_limiter", RateLimiter(rate=1000, capacity=1000))
+    return PurpleAirAPI(api_key="test", base_url=fake.url, backoff=0.01, **kwargs)
+
+
+def test_concurrent_fetch_matches_sequential_order(fake):
+    sequential = client(fake).get_sensor_history(SENSORS, FIELDS, START, END, average=10)
+    concurrent = client(fake).get_sensor_history(SENSORS, FIELDS, START, END, average=10, max_workers=4)
+
+    pd.testing.assert_frame_equal(sequential, concurrent)
+    assert pd.unique(concurrent["sensor_index"]).tolist() == SENSORS
+    assert concurrent.groupby("sensor_index")["time_stamp"].apply(lambda t: t.is_monotonic_increasing).all()
+
+    # One row per 10 minutes over the week, with no duplicates at the window boundaries
+    assert len(concurrent) == len(SENSORS) * 7 * 24 * 6
+
+
+def test_retries_transient_errors(fake):
+    fake.error_status, fake.error_count = 503, 2
+    history = client(fake).get_sensor_history([100000], FIELDS, START, "2024-03-02T00:00:00Z", average=60)
+
+    assert len(history) == 24
+    assert fake.requests == 3
+
+
+def test_gives_up_after_max_retries(fake):
+    fake.error_status = 429
+    with pytest.raises(Exception, match="429"):
+        client(fake, max_retries=2).get_sensor_history([100000], FIELDS, START, END, average=60)
+    assert fake.requests == 3
+
+
+def test_charges_points_per_field_and_row(fake):
+    points = RateLimiter(rate=1e-9, capacity=1e6)
+    fake.error_status, fake.error_count = 503, 1
+    history = client(fake, points_limiter=points).get_sensor_history(SENSORS, FIELDS, START, END, average=10,
+                                                                     max_workers=2)
+
+    # The failed attempt is refunded; every returned value costs a point
+    assert points.capacity - points.tokens == pytest.approx(len(FIELDS) * len(history), abs=1e-3)
+
+
+def test_points_debt_delays_the_next_request():
+    limiter = RateLimiter(rate=100, capacity=10)
+    limiter.charge(15)
+
+    start = time.monotonic()
+    limiter.acquire(1)
+    assert time.monotonic() - start >= 0.05
+
+
+def test_checkpoints_resume_without_requests(fake, tmp_path):
+    first = client(fake).get_sensor_history(SENSORS, FIELDS, START, END, average=10, checkpoint_dir=str(tmp_path))
+    requests = fake.requests
+
+    # Every window is stored, so a failing server is never asked again
+    fake.error_status = 500
+    resumed = client(fake).get_sensor_history(SENSORS, FIELDS, START, END, average=10, checkpoint_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(first, resumed)
+    assert fake.requests == requests
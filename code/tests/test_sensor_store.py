@@ -0,0 +1,47 @@
+"""
+Tests of the Parquet sensor store (see `preprocessing/sensor_store.py`).
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from preprocessing.sensor_store import LFS_POINTER, available_sources, load_readings, write_readings  # noqa: E402
+
+READINGS = pd.DataFrame({
+    "location_id": ["a", "b", "a", "b"],
+    "time": pd.to_datetime(["2024-01-31 23:00", "2024-01-31 23:00", "2024-02-01 00:00", "2024-02-01 00:00"]),
+    "pm2_5": [4.0, 5.0, 6.0, 7.0],
+})
+
+
+def test_missing_source_is_imported_from_committed_csv(tmp_path):
+    READINGS.to_csv(tmp_path / "clean_clarity.csv", index=False)
+    store = str(tmp_path / "sensor_store")
+
+    readings = load_readings("clarity", start="2024-02-01", root=store)
+
+    assert readings["pm2_5"].tolist() == [6.0, 7.0]
+    assert available_sources(store) == ["clarity"]
+    assert (tmp_path / "sensor_store" / "source=clarity" / "month=2024-01").is_dir()
+
+
+def test_lfs_pointer_is_not_imported(tmp_path):
+    (tmp_path / "clean_clarity.csv").write_bytes(LFS_POINTER + b"v1\noid sha256:0\nsize 1\n")
+
+    with pytest.raises(FileNotFoundError, match="git lfs pull"):
+        load_readings("clarity", root=str(tmp_path / "sensor_store"))
+    assert available_sources(str(tmp_path / "sensor_store")) == []
+
+
+def test_readings_without_time_are_rejected(tmp_path):
+    readings = READINGS.assign(time=READINGS["time"].astype(object))
+    readings.loc[1, "time"] = None
+
+    with pytest.raises(ValueError, match="1 of 4 clarity readings have no time"):
+        write_readings(readings, "clarity", root=str(tmp_path))
+    assert available_sources(str(tmp_path)) == []
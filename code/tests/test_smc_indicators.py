@@ -0,0 +1,125 @@
+"""
+Tests of the county health indicator loader (see `preprocessing/smc_indicators.py`) against a port of the loop in
+`health_preproc.ipynb`.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from preprocessing.sensor_store import LFS_POINTER  # noqa: E402
+from preprocessing.smc_indicators import TRACTS, load_indicators  # noqa: E402
+
+INDICATORS_DIR = Path(__file__).resolve().parents[2] / "data" / "smc_indicators"
+
+# The committed indicator files, unless Git LFS left pointers in their place
+COMMITTED = INDICATORS_DIR.is_dir() and not any(path.read_bytes().startswith(LFS_POINTER)
+                                                for path in INDICATORS_DIR.glob("*.csv"))
+
+
+def notebook_indicators(directory) -> pd.DataFrame:
+    # The notebook's cells, reading the files in name order (it used the order of os.listdir)
+    def make_decimal(tract_str):
+        num = tract_str[4:-2]
+        decimal = tract_str[-2:]
+        if decimal != '00':
+            return num + '.' + decimal
+        else:
+            return num
+
+    def find_max(periods):
+        def extract_year(p):
+            if type(p) == str:
+                return int(p.split('-')[-1])
+            else:
+                return p
+
+        max_y = -1
+        max_i = -1
+
+        for i, p in enumerate(periods):
+            y = extract_year(p)
+
+            if max_y < 0 or max_y < y:
+                max_y = y
+                max_i = i
+
+        return periods[max_i]
+
+    def most_recent(group):
+        latest_measurement = find_max(group['Period of Measure'].unique())
+        latest = group[group['Period of Measure'] == latest_measurement]
+        return latest.iloc[0]
+
+    indicators = pd.DataFrame({'tract': TRACTS})
+    for indicator_file in sorted(os.listdir(directory)):
+        indicator = indicator_file.split('.')[0]
+
+        indicator_data = pd.read_csv(os.path.join(directory, indicator_file))
+        indicator_data['tract'] = indicator_data['Location'].astype(str).apply(make_decimal)
+
+        indicator_cleaned = indicator_data[indicator_data['tract'].isin(TRACTS)].copy()
+        # Newer pandas leaves the grouping column out of the groups, so it is taken from the index instead
+        indicator_cleaned = indicator_cleaned.groupby('tract').apply(most_recent)
+        indicator_cleaned = indicator_cleaned.drop(columns='tract', errors='ignore').reset_index()
+
+        indicator_cleaned[indicator] = indicator_cleaned['Indicator Rate Value']
+        indicator_only = indicator_cleaned[['tract', indicator]]
+
+        indicators = pd.merge(indicators, indicator_only, on='tract', how='left')
+    return indicators
+
+
+def indicator_file(path: Path, rows) -> None:
+    pd.DataFrame(rows, columns=["Indicator Name", "Location", "Indicator Rate Value", "Period of Measure",
+                                "Breakout Category"]).to_csv(path, index=False)
+
+
+@pytest.fixture
+def directory(tmp_path) -> Path:
+    # Periods spanning years and single years, ties on the latest period, breakout rows after the overall row,
+    # tracts outside the cities and tracts without a value
+    indicator_file(tmp_path / "Asthma.csv", [
+        ("Asthma", 6081601901, 10.5, "2015-2019", None),
+        ("Asthma", 6081601901, 11.0, "2018-2022", None),
+        ("Asthma", 6081601901, 14.0, "2018-2022", "Age 65+"),
+        ("Asthma", 6081602100, 8.25, "2021", None),
+        ("Asthma", 6081602100, 9.75, "2019-2020", None),
+        ("Asthma", 6081604000, None, "2022", None),
+        ("Asthma", 6081999900, 99.0, "2022", None),
+    ])
+    indicator_file(tmp_path / "Lead.csv", [
+        ("Lead", 6081602300, 3.0, "2016-2020", None),
+        ("Lead", 6081613501, 4.5, "2016-2020", None),
+        ("Lead", 6081613501, 5.0, "2017-2021", None),
+        ("Lead", 6081601700, 2.0, "2020", None),
+    ])
+    return tmp_path
+
+
+def test_matches_notebook(directory):
+    expected = notebook_indicators(directory)
+    table = load_indicators(str(directory), cache_path=None, workers=2)
+    pd.testing.assert_frame_equal(table, expected, check_dtype=False)
+    assert table.loc[table["tract"] == "6019.01", "Asthma"].tolist() == [11.0]
+
+
+def test_cache_gives_the_same_table(directory, tmp_path_factory):
+    cache = str(tmp_path_factory.mktemp("cache") / "cache.json")
+    first = load_indicators(str(directory), cache_path=cache)
+    indicator_file(directory / "Lead.csv", [("Lead", 6081602300, 7.0, "2021-2022", None)])
+
+    expected = notebook_indicators(directory)
+    pd.testing.assert_frame_equal(load_indicators(str(directory), cache_path=cache), expected, check_dtype=False)
+    assert not first.equals(expected)
+
+
+@pytest.mark.skipif(not COMMITTED, reason="county indicator files not fetched")
+def test_committed_files_match_notebook():
+    pd.testing.assert_frame_equal(load_indicators(str(INDICATORS_DIR), cache_path=None),
+                                  notebook_indicators(INDICATORS_DIR), check_dtype=False)
@@ -0,0 +1,91 @@
+"""
+Tests of the daily tract AQI rollup (see `air_quality/tract_rollup.py`) against medians computed with pandas.
+"""
+
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from air_quality.tract_rollup import (SOURCES, TractRollup, build_rollup, custom_windows,  # noqa: E402
+                                      month_windows, refresh_rollup, rolling_windows)
+from preprocessing.sensor_store import write_readings  # noqa: E402
+
+# Three side-by-side tracts; the third has no sensor
+TRACTS = gpd.GeoDataFrame({"geoid": ["06081000100", "06081000200", "06081000300"]},
+                          geometry=[box(x, 37.6, x + 0.01, 37.61) for x in (-122.43, -122.42, -122.41)],
+                          crs="EPSG:4326")
+
+
+def readings(seed: int, days: pd.DatetimeIndex) -> pd.DataFrame:
+    # Hourly readings of four sensors, two of them in the first tract and one outside every tract
+    rng = np.random.default_rng(seed)
+    sensors = pd.DataFrame({"location_id": ["a", "b", "c", "d"], "latitude": [37.605, 37.606, 37.605, 37.7],
+                            "longitude": [-122.425, -122.424, -122.415, -122.415]})
+    times = pd.date_range(days[0], days[-1] + pd.Timedelta(hours=23), freq="6h")
+    df = sensors.merge(pd.DataFrame({"time": times}), how="cross")
+    df["pm2_5_24h_mean_aqi"] = rng.integers(0, 180, len(df)).astype(float)
+    df.loc[rng.random(len(df)) < 0.1, "pm2_5_24h_mean_aqi"] = np.nan
+    return df
+
+
+def expected_medians(df: pd.DataFrame, start: str, end: str) -> pd.Series:
+    geoid = {"a": "06081000100", "b": "06081000100", "c": "06081000200"}
+    inside = df[df["location_id"].isin(geoid) & df["time"].between(start, pd.Timestamp(end) + pd.Timedelta(days=1),
+                                                                    inclusive="left")]
+    return inside.groupby(inside["location_id"].map(geoid))["pm2_5_24h_mean_aqi"].median()
+
+
+@pytest.fixture
+def store(tmp_path):
+    days = pd.date_range("2024-01-20", "2024-04-10")
+    data = {source: readings(seed, days) for seed, source in enumerate(SOURCES.values())}
+    for source, df in data.items():
+        write_readings(df, source, root=str(tmp_path / "store"))
+    return tmp_path, data
+
+
+def test_window_medians_match_pandas(store, tmp_path):
+    _, data = store
+    rollup = build_rollup({network: data[source] for network, source in SOURCES.items()}, TRACTS,
+                          lookup_path=str(tmp_path / "lookup.json"))
+
+    windows = pd.concat([month_windows(rollup.days), rolling_windows(rollup.days, 7),
+                         custom_windows([("2024-02-10", "2024-02-10"), ("2020-01-01", "2030-01-01"),
+                                         ("2030-01-01", "2030-02-01")])], ignore_index=True)
+    for network, source in SOURCES.items():
+        medians, counts = rollup.window_medians(network, windows["start"], windows["end"])
+        for column, window in enumerate(windows.itertuples()):
+            expected = expected_medians(data[source], window.start, window.end)
+            actual = pd.Series(medians[:, column], index=rollup.geoids).dropna()
+            pd.testing.assert_series_equal(actual, expected, check_names=False, check_index_type=False)
+        assert np.isnan(medians[2]).all() and not counts[2].any()
+
+
+def test_refresh_recounts_changed_months(store):
+    root, data = store
+    path, lookup = str(root / "rollup.npz"), str(root / "lookup.json")
+    refresh_rollup(TRACTS, path=path, root=str(root / "store"), lookup_path=lookup)
+
+    # Rewrite March of one network and drop its last days
+    march = data["clarity"]["time"].dt.month == 3
+    changed = data["clarity"][march].assign(pm2_5_24h_mean_aqi=lambda df: df["pm2_5_24h_mean_aqi"] + 7)
+    write_readings(changed, "clarity", root=str(root / "store"))
+    (root / "store" / "source=clarity" / "month=2024-04" / "part-0.parquet").unlink()
+
+    refreshed = refresh_rollup(TRACTS, path=path, root=str(root / "store"), lookup_path=lookup)
+    current = pd.concat([data["clarity"][data["clarity"]["time"].dt.month < 3], changed])
+    rebuilt = build_rollup({"clarity": current, "purpleair": data["api_purpleair"]}, TRACTS, lookup_path=lookup)
+
+    assert np.array_equal(refreshed.days, rebuilt.days)
+    for network in SOURCES:
+        assert np.array_equal(refreshed.cells[network], rebuilt.cells[network])
+
+    stored = TractRollup.load(path)
+    assert np.array_equal(stored.cells["clarity"], rebuilt.cells["clarity"])